@@ -0,0 +1,361 @@
+"""
+Goal: Simulate very large clusters by running processes as coroutines on one event loop
+
+Usage:
+    1. Subclass AsyncProcess and write start as a coroutine
+        (await self.get_one_msg(), await self.send_msg(...))
+    2. DistributedSystem.set_backend(AsyncBackend())
+    3. define_faults, process_input and wait_for_completion as usual,
+        processes run inside wait_for_completion
+
+Like base_process.Process, reliable sends carry a per-target sequence number and
+the sender's epoch, and receivers drop duplicates with a DuplicateWindow. Acks are
+per message rather than cumulative. A killed process has all of its tasks
+cancelled instead of exiting on its next send
+"""
+
+from distributed_systems.framework import (
+    ProcessFramework,
+    ProcessMetrics,
+    DistributedSystem,
+)
+from distributed_systems.base_process import DuplicateWindow, Msg, MsgType, Process
+from distributed_systems.failure_detector import FailureDetector
+
+from abc import ABC, abstractmethod
+from typing import List, Dict, Union
+import asyncio
+import random
+import traceback
+
+
+class AsyncProcess(ABC):
+    heartbeat_interval: float = 1.0
+
+    def __init__(self, id: int, runtime: "AsyncBackend"):
+        self._id: int = id
+        self._runtime: AsyncBackend = runtime
+        self._alive_status: bool = True
+        self._tasks: set = set()
+        self._inbox: asyncio.Queue = asyncio.Queue()
+
+        # Lets receivers tell a revived process apart from its previous instance
+        self._epoch: int = random.getrandbits(32)
+        self._next_seqs: Dict[int, int] = {}
+        # Unacked sends per target by sequence number, in send order
+        self._ack_futures: Dict[int, Dict[int, asyncio.Future]] = {}
+        self._duplicate_windows: Dict[int, DuplicateWindow] = {}
+        # Fed the loop time of every frame from a monitored process, any frame
+        # counts as a heartbeat
+        self._failure_detectors: Dict[int, FailureDetector] = {}
+        # Loop time of the last frame to each process, heartbeats are skipped
+        # while other traffic flows
+        self._last_sent_times: Dict[int, float] = {}
+
+        self.metrics: ProcessMetrics = DistributedSystem.get_process_metrics(id)
+        self.metrics.starts += 1
+
+    @property
+    def input(self):
+        return ProcessFramework.input
+
+    def get_id(self) -> int:
+        return self._id
+
+    def get_alive_status(self) -> bool:
+        return self._alive_status
+
+    @abstractmethod
+    async def start(self, msg: str = None):
+        raise NotImplementedError()
+
+    def _run_task(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            traceback.print_exception(task.exception())
+
+    def _check_alive(self):
+        if not self._alive_status:
+            raise asyncio.CancelledError()
+
+    def _send_frame(self, target: int, frame: Union[str, bytes]):
+        self.metrics.sent += 1
+        self._last_sent_times[target] = self._runtime.time()
+        if DistributedSystem.decide_msg_drop():
+            self.metrics.dropped += 1
+            print(f"[STATUS] Dropping message")
+            return
+        self._runtime.msg_to_process(target, frame)
+
+    def receive_msg(self, frame: Union[str, bytes]):
+        self.metrics.received += 1
+        msg: Msg = Process.codec.decode(frame)
+        failure_detector = self._failure_detectors.get(msg.src)
+        if failure_detector:
+            failure_detector.heartbeat(self._runtime.time())
+        if msg.type == MsgType.ACKNOWLEDGE:
+            if msg.epoch != self._epoch:
+                # Ack for an earlier instance of this process
+                return
+            ack_future = self._ack_futures.get(msg.src, {}).get(msg.ack)
+            if ack_future and not ack_future.done():
+                ack_future.set_result(None)
+        elif msg.type == MsgType.HEARTBEAT:
+            pass
+        elif msg.type == MsgType.REGULAR:
+            # Unverified sends carry no sequence number, deliver them as is
+            if msg.ack >= 0:
+                ack_msg = Msg(
+                    self._id, MsgType.ACKNOWLEDGE, ack_msg=msg.ack, epoch=msg.epoch
+                )
+                self._send_frame(msg.src, Process.codec.encode(ack_msg))
+                if not self._record_received(msg):
+                    # Duplicates are acked again but never reach the application
+                    return
+            self._inbox.put_nowait(msg)
+            if self._inbox.qsize() > self.metrics.inbox_high_water:
+                self.metrics.inbox_high_water = self._inbox.qsize()
+        else:
+            raise ValueError(f"Invalid message type: {msg.type}")
+
+    def _record_received(self, msg: Msg) -> bool:
+        """Returns False for a duplicate"""
+        duplicate_window = self._duplicate_windows.get(msg.src)
+        if duplicate_window is None or duplicate_window.epoch != msg.epoch:
+            duplicate_window = DuplicateWindow(msg.epoch, msg.base)
+            self._duplicate_windows[msg.src] = duplicate_window
+        duplicate_window.advance_to(msg.base)
+        return duplicate_window.record(msg.ack)
+
+    async def get_one_msg(self, timeout: float = None) -> Msg:
+        wait_start_time = self._runtime.time()
+        try:
+            if timeout is None:
+                return await self._inbox.get()
+            return await asyncio.wait_for(self._inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.metrics.blocked_time += self._runtime.time() - wait_start_time
+
+    async def send_msg(
+        self, target: int, msg: Msg, verify: bool = True, retry_time: float = 0.1
+    ):
+        self._check_alive()
+        msg.src = self._id
+        if not verify:
+            self._send_frame(target, Process.codec.encode(msg))
+            return
+        ack_futures = self._ack_futures.setdefault(target, {})
+        # Never run further ahead of the oldest unacked send than the
+        # receiver's duplicate window reaches
+        while ack_futures:
+            base = next(iter(ack_futures))
+            if self._next_seqs.get(target, 0) - base < DuplicateWindow.SIZE:
+                break
+            await asyncio.wait({ack_futures[base]})
+            self._check_alive()
+        seq = self._next_seqs.get(target, 0)
+        self._next_seqs[target] = seq + 1
+        msg.ack = seq
+        msg.epoch = self._epoch
+        msg.base = next(iter(ack_futures), seq)
+        msg_frame = Process.codec.encode(msg)
+        ack_future = asyncio.get_running_loop().create_future()
+        ack_futures[seq] = ack_future
+        sent_time = self._runtime.time()
+        try:
+            self._send_frame(target, msg_frame)
+            while True:
+                done, _ = await asyncio.wait({ack_future}, timeout=retry_time)
+                if done:
+                    self.metrics.ack_latency.record(self._runtime.time() - sent_time)
+                    return
+                self._check_alive()
+                self.metrics.retransmitted += 1
+                self._send_frame(target, msg_frame)
+        finally:
+            del ack_futures[seq]
+
+    def new_process(self, process_id: int, process_def: type, msg: str = None):
+        self._check_alive()
+        self._runtime.start_process(process_id, process_def, msg)
+
+    def save_checkpoint(self, name: str, state):
+        self._check_alive()
+        DistributedSystem.save_checkpoint(self._id, name, state)
+
+    def load_checkpoint(self, name: str):
+        """Last state saved under name by this process id, None if there is none"""
+        return DistributedSystem.load_checkpoint(self._id, name)
+
+    def complete(self):
+        print(f"[STATUS] Process {self._id} complete")
+        self._runtime.process_completion(self._id)
+
+    def stop_tasks(self):
+        self._alive_status = False
+        for task in list(self._tasks):
+            task.cancel()
+
+    def shutdown(self, premature: bool = False):
+        self.stop_tasks()
+        if premature:
+            print(f"[STATUS] Process {self._id} experienced hardware failure")
+        self._runtime.process_shutdown(self._id, self)
+
+    async def _keep_process_alive_continuously(
+        self,
+        process_id: int,
+        process_def: type,
+        startup_msg: str = None,
+        wait_time: float = 5,
+    ):
+        # One timer per suspicion time rather than one wakeup per heartbeat
+        failure_detector = DistributedSystem.create_failure_detector(
+            wait_time, self.heartbeat_interval
+        )
+        failure_detector.reset(self._runtime.time())
+        self._failure_detectors[process_id] = failure_detector
+        # Ends once monitoring stops or a newer call monitors process_id
+        while (
+            self._alive_status
+            and self._failure_detectors.get(process_id) is failure_detector
+        ):
+            suspicion_time = failure_detector.get_suspicion_time()
+            if suspicion_time > self._runtime.time():
+                await asyncio.sleep(suspicion_time - self._runtime.time())
+            else:
+                print(f"[STATUS] Process {self._id} reviving process {process_id}")
+                self.new_process(process_id, process_def, startup_msg)
+                failure_detector.reset(self._runtime.time())
+
+    def keep_process_alive(
+        self,
+        process_id: int,
+        process_def: type,
+        startup_msg: str = None,
+        wait_time: float = 5,
+    ):
+        """
+        Revives process_id once the job's failure detector suspects it, by default
+        after nothing was heard from it for wait_time seconds
+        """
+        self._run_task(
+            self._keep_process_alive_continuously(
+                process_id, process_def, startup_msg, wait_time
+            )
+        )
+
+    def stop_keeping_process_alive(self, process_id: int):
+        """Stops reviving process_id, e.g. once it reported its work done"""
+        self._failure_detectors.pop(process_id, None)
+
+    async def _send_heartbeats_continuously(self, process_id: int):
+        # Heartbeats never change, so encode once
+        heartbeat = Process.codec.encode(Msg(self._id, msg_type=MsgType.HEARTBEAT))
+        while self._alive_status:
+            last_sent_time = self._last_sent_times.get(process_id)
+            if last_sent_time is None or (
+                self._runtime.time() - last_sent_time >= self.heartbeat_interval / 2
+            ):
+                self.metrics.heartbeats += 1
+                self._send_frame(process_id, heartbeat)
+            await asyncio.sleep(self.heartbeat_interval)
+
+    def send_heartbeats_to_process(self, process_id: int):
+        self._run_task(self._send_heartbeats_continuously(process_id))
+
+
+class AsyncBackend:
+    def __init__(self):
+        self._processes: Dict[int, AsyncProcess] = {}
+        self._running_process_ids: set = set()
+        self._process_defs: List[type] = []
+        self._loop: asyncio.AbstractEventLoop = None
+        self._all_complete: asyncio.Event = None
+
+    def initialize_process(self, process_id: int, process_def: type) -> AsyncProcess:
+        self._running_process_ids.add(process_id)
+        process_instance: AsyncProcess = process_def(process_id, self)
+        print(f"[STATUS] Starting process {process_id}")
+        if process_id in self._processes:
+            print(f"[WARNING] Restarting healthy process {process_id}")
+            # Messages only reach the new instance, the old one would never hear
+            # heartbeats again and keep reviving its neighbours
+            self._processes[process_id].stop_tasks()
+        self._processes[process_id] = process_instance
+        return process_instance
+
+    def start_process(self, process_id: int, process_def: type, msg: str = None):
+        process_instance = self.initialize_process(process_id, process_def)
+        process_instance._run_task(process_instance.start(msg))
+
+    def time(self) -> float:
+        return self._loop.time()
+
+    def msg_to_process(self, target_id: int, frame: Union[str, bytes]):
+        # Deliver on a later loop iteration, like a network would
+        self._loop.call_soon(self._deliver, target_id, frame)
+
+    def _deliver(self, target_id: int, frame: Union[str, bytes]):
+        process = self._processes.get(target_id)
+        if process is not None and process.get_alive_status():
+            process.receive_msg(frame)
+
+    def process_completion(self, id: int):
+        self._running_process_ids.discard(id)
+        if len(self._running_process_ids) == 0:
+            self._all_complete.set()
+
+    def process_shutdown(self, id: int, process: AsyncProcess = None):
+        self.process_completion(id)
+        if process is None or self._processes.get(id) is process:
+            self._processes.pop(id, None)
+
+    async def _shut_down_processes(self):
+        process_kill_count = 0
+        while process_kill_count < DistributedSystem._max_process_kill_count:
+            await asyncio.sleep(DistributedSystem._process_kill_wait_time)
+            try:
+                process = random.choice(list(self._processes.values()))
+            except IndexError:
+                return
+            process.shutdown(premature=True)
+            process_kill_count += 1
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._all_complete = asyncio.Event()
+        processes: List[AsyncProcess] = []
+        for process_id in range(len(self._process_defs)):
+            processes.append(
+                self.initialize_process(process_id, self._process_defs[process_id])
+            )
+        for process in processes:
+            process._run_task(process.start())
+        if DistributedSystem._max_process_kill_count > 0:
+            killer = asyncio.create_task(self._shut_down_processes())
+        else:
+            killer = None
+        if len(self._running_process_ids) > 0:
+            await self._all_complete.wait()
+        print("[STATUS] No running processes, initiating shutdown")
+        if killer:
+            killer.cancel()
+        for process in list(self._processes.values()):
+            process.shutdown()
+
+    def process_input(self, input, process_defs: List[type]):
+        ProcessFramework.set_input(input)
+        self._process_defs = list(process_defs)
+
+    def wait_for_completion(self):
+        asyncio.run(self._run())
+        print("[STATUS] Distributed system shutdown complete")
+        return ProcessFramework.output
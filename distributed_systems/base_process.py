@@ -1,10 +1,23 @@
-from distributed_systems.framework import ProcessFramework
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.failure_detector import FailureDetector
+from distributed_systems.timer_wheel import Timer, TimerWheel
 
-from threading import Lock, Thread, Event
-from queue import Queue
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import Future, CancelledError
+from functools import partial
+from threading import Lock, Thread
+from queue import SimpleQueue
+from typing import Callable, Union
 import queue
 from enum import Enum
+import base64
 import json
+import operator
+import pickle
+import random
+import struct
+import sys
 import time
 
 
@@ -12,158 +25,868 @@ class MsgType(Enum):
     REGULAR = "regular"
     HEARTBEAT = "heartbeat"
     ACKNOWLEDGE = "acknowledge"
+    BATCH = "batch"
+    COLLECTIVE = "collective"
 
 
 class Msg:
+    """
+    Content is str or bytes. Decoded messages keep their content as a memoryview
+    into the received frame (payload) and only build the str/bytes on access
+
+    Reliable delivery fields:
+        ack -> sequence number (REGULAR) or cumulative ack (ACKNOWLEDGE)
+        epoch -> sender incarnation (REGULAR) or incarnation being acked (ACKNOWLEDGE)
+        base -> every sequence number below base is already acked (REGULAR)
+    """
+
     def __init__(
         self,
         src: int = -1,
         msg_type: MsgType = MsgType.REGULAR,
-        msg_content: str = None,
+        msg_content: Union[str, bytes] = None,
         ack_msg: int = -1,
+        epoch: int = 0,
+        base: int = 0,
     ):
         self.src: int = src
         self.type: MsgType = msg_type
-        self.content: str = msg_content
+        self._content: Union[str, bytes] = msg_content
+        self._payload: memoryview = None
+        self._payload_is_bytes: bool = False
         self.ack: int = ack_msg
+        self.epoch: int = epoch
+        self.base: int = base
+
+    @property
+    def content(self) -> Union[str, bytes]:
+        if self._content is None and self._payload is not None:
+            if self._payload_is_bytes:
+                self._content = self._payload.tobytes()
+            else:
+                self._content = str(self._payload, "utf-8")
+        return self._content
+
+    @content.setter
+    def content(self, msg_content: Union[str, bytes]):
+        self._content = msg_content
+        self._payload = None
+
+    @property
+    def payload(self) -> memoryview:
+        if self._payload is None:
+            if self._content is None:
+                return None
+            if isinstance(self._content, str):
+                return memoryview(self._content.encode("utf-8"))
+            return memoryview(self._content)
+        return self._payload
 
     @staticmethod
-    def build_msg(msg_content: str = None):
+    def build_msg(msg_content: Union[str, bytes] = None):
         return Msg(msg_type=MsgType.REGULAR, msg_content=msg_content, ack_msg=-1)
 
-    def to_json(self):
-        self.type = self.type.value
-        return json.dumps(vars(self))
+    def to_json(self) -> str:
+        return JsonCodec().encode(self)
 
     @staticmethod
     def from_json(json_str: str):
-        json_dict = json.loads(json_str)
+        return JsonCodec().decode(json_str)
+
+
+class MsgCodec(ABC):
+    @abstractmethod
+    def encode(self, msg: Msg) -> Union[str, bytes]:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def decode(self, raw_msg: Union[str, bytes]) -> Msg:
+        raise NotImplementedError()
+
+
+class BinaryCodec(MsgCodec):
+    """
+    Frame: 18 byte header followed by the raw payload
+        src (int32) | type (uint8) | flags (uint8) | ack (int32) | epoch (uint32) | base (int32) | payload
+    Heartbeats and acks carry no payload, so they are just the packed header
+    """
+
+    _HEADER = struct.Struct("!iBBiIi")
+    _HAS_CONTENT = 1
+    _CONTENT_IS_BYTES = 2
+
+    _TYPE_CODES = {
+        MsgType.REGULAR: 0,
+        MsgType.HEARTBEAT: 1,
+        MsgType.ACKNOWLEDGE: 2,
+        MsgType.BATCH: 3,
+        MsgType.COLLECTIVE: 4,
+    }
+    _TYPES = [
+        MsgType.REGULAR,
+        MsgType.HEARTBEAT,
+        MsgType.ACKNOWLEDGE,
+        MsgType.BATCH,
+        MsgType.COLLECTIVE,
+    ]
+
+    def encode(self, msg: Msg) -> bytes:
+        content = msg._content
+        if content is None and msg._payload is None:
+            return BinaryCodec._HEADER.pack(
+                msg.src,
+                BinaryCodec._TYPE_CODES[msg.type],
+                0,
+                msg.ack,
+                msg.epoch,
+                msg.base,
+            )
+        if msg._payload is not None:
+            payload = msg._payload
+            flags = BinaryCodec._HAS_CONTENT
+            if msg._payload_is_bytes:
+                flags |= BinaryCodec._CONTENT_IS_BYTES
+        elif isinstance(content, str):
+            payload = content.encode("utf-8")
+            flags = BinaryCodec._HAS_CONTENT
+        else:
+            payload = content
+            flags = BinaryCodec._HAS_CONTENT | BinaryCodec._CONTENT_IS_BYTES
+        header = BinaryCodec._HEADER.pack(
+            msg.src,
+            BinaryCodec._TYPE_CODES[msg.type],
+            flags,
+            msg.ack,
+            msg.epoch,
+            msg.base,
+        )
+        return header + payload
+
+    def decode(self, raw_msg: bytes) -> Msg:
+        src, type_code, flags, ack, epoch, base = BinaryCodec._HEADER.unpack_from(
+            raw_msg
+        )
+        msg = Msg(src, BinaryCodec._TYPES[type_code], None, ack, epoch, base)
+        if flags & BinaryCodec._HAS_CONTENT:
+            msg._payload = memoryview(raw_msg)[BinaryCodec._HEADER.size :]
+            msg._payload_is_bytes = bool(flags & BinaryCodec._CONTENT_IS_BYTES)
+        return msg
+
+
+class JsonCodec(MsgCodec):
+    """Human readable frames for debugging, bytes content is base64 encoded"""
+
+    def encode(self, msg: Msg) -> str:
+        content = msg.content
+        json_dict = {
+            "src": msg.src,
+            "type": msg.type.value,
+            "content": content,
+            "ack": msg.ack,
+            "epoch": msg.epoch,
+            "base": msg.base,
+        }
+        if isinstance(content, bytes):
+            json_dict["content"] = base64.b64encode(content).decode("ascii")
+            json_dict["content_is_bytes"] = True
+        return json.dumps(json_dict)
+
+    def decode(self, raw_msg: Union[str, bytes, memoryview]) -> Msg:
+        if isinstance(raw_msg, memoryview):
+            raw_msg = raw_msg.tobytes()
+        json_dict = json.loads(raw_msg)
+        content = json_dict["content"]
+        if json_dict.get("content_is_bytes"):
+            content = base64.b64decode(content)
         return Msg(
             json_dict["src"],
             MsgType(json_dict["type"]),
-            json_dict["content"],
+            content,
             json_dict["ack"],
+            json_dict.get("epoch", 0),
+            json_dict.get("base", 0),
         )
 
 
+class RttEstimator:
+    """Retransmission timeout from smoothed round trip times (Jacobson/Karels, RFC 6298)"""
+
+    MIN_TIMEOUT = 0.02
+    MAX_TIMEOUT = 1.0
+
+    def __init__(self):
+        self.srtt: float = None
+        self.rttvar: float = None
+
+    def add_sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+
+    def get_timeout(self, default_timeout: float) -> float:
+        if self.srtt is None:
+            return default_timeout
+        timeout = self.srtt + 4 * self.rttvar
+        return min(max(timeout, RttEstimator.MIN_TIMEOUT), RttEstimator.MAX_TIMEOUT)
+
+
+class _PendingSend:
+    def __init__(
+        self, target: int, frame: Union[str, bytes], timeout: float, future: Future
+    ):
+        self.target: int = target
+        self.frame: Union[str, bytes] = frame
+        self.future: Future = future
+        self.timeout: float = timeout
+        self.sent_time: float = time.monotonic()
+        self.last_sent_time: float = self.sent_time
+        self.retransmit_count: int = 0
+        self.timer: Timer = None
+
+
+class _PeerSendState:
+    def __init__(self):
+        self.next_seq: int = 0
+        # Unacked sends by sequence number, in send order
+        self.pending: dict[int, _PendingSend] = {}
+        # Sends waiting for room in the receiver's duplicate window
+        self.backlog: deque[tuple[Msg, Future, float]] = deque()
+        self.rtt_estimator: RttEstimator = RttEstimator()
+
+    def get_base(self) -> int:
+        return next(iter(self.pending), self.next_seq)
+
+    def window_full(self) -> bool:
+        return self.next_seq - self.get_base() >= DuplicateWindow.SIZE
+
+
+class DuplicateWindow:
+    """
+    Sequence numbers received from one sender incarnation, in O(1) memory
+
+    Every sequence number below watermark was received. Bit i of bitmap marks
+    watermark + i as received. Senders never run more than SIZE sequence numbers
+    ahead of their oldest unacked message, so the window never overflows
+    """
+
+    SIZE = 256
+
+    def __init__(self, epoch: int, base: int):
+        self.epoch: int = epoch
+        self.watermark: int = base
+        self.bitmap: int = 0
+
+    def _compact(self):
+        while self.bitmap & 1:
+            self.bitmap >>= 1
+            self.watermark += 1
+
+    def advance_to(self, base: int):
+        if base <= self.watermark:
+            return
+        self.bitmap >>= base - self.watermark
+        self.watermark = base
+        self._compact()
+
+    def record(self, seq: int) -> bool:
+        """Returns False for a duplicate"""
+        offset = seq - self.watermark
+        if offset < 0:
+            return False
+        if offset >= DuplicateWindow.SIZE:
+            # Only a misbehaving sender gets here, slide rather than grow
+            self.advance_to(seq - DuplicateWindow.SIZE + 1)
+            offset = seq - self.watermark
+        seq_bit = 1 << offset
+        if self.bitmap & seq_bit:
+            return False
+        self.bitmap |= seq_bit
+        self._compact()
+        return True
+
+    def get_sack(self) -> list[int]:
+        sack = []
+        bitmap = self.bitmap
+        seq = self.watermark
+        while bitmap:
+            if bitmap & 1:
+                sack.append(seq)
+            bitmap >>= 1
+            seq += 1
+        return sack
+
+
+_BATCH_ENTRY_LEN = struct.Struct("!I")
+# Queued behind every message once a process stops, wakes get_one_msg for good
+_SHUTDOWN = object()
+
+
+def _pack_batch(frames: list) -> bytes:
+    parts = []
+    for frame in frames:
+        if isinstance(frame, str):
+            frame = frame.encode("utf-8")
+        parts.append(_BATCH_ENTRY_LEN.pack(len(frame)))
+        parts.append(frame)
+    return b"".join(parts)
+
+
+def _unpack_batch(payload: memoryview) -> list[memoryview]:
+    frames = []
+    offset = 0
+    while offset < len(payload):
+        (frame_len,) = _BATCH_ENTRY_LEN.unpack_from(payload, offset)
+        offset += _BATCH_ENTRY_LEN.size
+        frames.append(payload[offset : offset + frame_len])
+        offset += frame_len
+    return frames
+
+
+def _get_tree_children(rel_rank: int, size: int) -> list[int]:
+    """
+    Children of rel_rank in a binomial tree over relative ranks 0..size-1 rooted
+    at 0, smallest first. Child rel_rank + step roots the contiguous subtree
+    [rel_rank + step, rel_rank + 2 * step), so the tree is log2(size) deep
+    """
+    children = []
+    # Subtrees of a non root node must fit under its lowest set bit
+    step_limit = rel_rank & -rel_rank if rel_rank else size
+    step = 1
+    while step < step_limit and rel_rank + step < size:
+        children.append(rel_rank + step)
+        step <<= 1
+    return children
+
+
+def _get_tree_parent(rel_rank: int) -> int:
+    return rel_rank - (rel_rank & -rel_rank)
+
+
 class Process(ProcessFramework):
+    """
+    Collectives (broadcast, scatter, gather, reduce, allreduce):
+        - Every process in ranks must make the same collective calls on the
+          same ranks in the same order, like an MPI communicator
+        - Values are pickled and sent reliably over a binomial tree, so a
+          collective takes log2(len(ranks)) rounds and survives dropped messages
+        - Collective messages never reach get_one_msg, and a revived process
+          cannot rejoin collectives its previous instance was part of
+    """
+
+    codec: MsgCodec = BinaryCodec()
+
+    coalesce_acks: bool = True
+    batch_window: float = 0.0
+    max_batch_size: int = 64
+    max_unacked_count: int = 32
+    heartbeat_interval: float = 1.0
+
+    @classmethod
+    def set_codec(cls, codec: MsgCodec):
+        """Every process must use the same codec, so set it before process_input"""
+        cls.codec = codec
+
+    @classmethod
+    def define_transport(
+        cls,
+        coalesce_acks: bool = True,
+        batch_window: float = 0.0,
+        max_batch_size: int = 64,
+        max_unacked_count: int = 32,
+    ):
+        """
+        coalesce_acks -> send one cumulative ack per sender once the inbox drains
+            or max_unacked_count messages arrived, instead of one ack per message
+        batch_window -> seconds reliable messages to the same target wait to share
+            a frame, 0 sends every message on its own
+        """
+        cls.coalesce_acks = coalesce_acks
+        cls.batch_window = batch_window
+        cls.max_batch_size = max_batch_size
+        cls.max_unacked_count = max_unacked_count
+
     def __init__(self, id: int):
         super().__init__(id)
-        self.general_inbox: Queue[Msg] = Queue()
-        self.focused_inbox: Queue[Msg] = Queue()
+        # Regular messages only, control messages are handled on delivery
+        self.inbox: SimpleQueue[Msg] = SimpleQueue()
+        self.collective_inbox: SimpleQueue[Msg] = SimpleQueue()
+        # Collective calls made so far per ranks tuple, and received collective
+        # values not asked for yet by (collective key, src)
+        self._collective_counts: dict[tuple, int] = {}
+        self._collective_values: dict[tuple, object] = {}
 
-        self._next_msg_id: int = 0
-        self._next_msg_id_lock: Lock = Lock()
-        self._ack_events: dict[int, Event] = {}
-        self._ack_events_lock: Lock = Lock()
+        # Lets receivers tell a revived process apart from its previous instance
+        self._epoch: int = random.getrandbits(32)
+        self._peer_send_states: dict[int, _PeerSendState] = {}
+        self._send_lock: Lock = Lock()
+        # Only touched by this process's dispatcher thread
+        self._duplicate_windows: dict[int, DuplicateWindow] = {}
+        self._unacked_srcs: set[int] = set()
+        self._unacked_count: int = 0
 
-        self._processed_msgs: set[str] = set()
-        self._processed_msgs_lock: Lock = Lock()
+        self._batches: dict[int, list] = {}
+        self._batches_lock: Lock = Lock()
 
-        self._heartbeat_events: dict[int, Event] = {}
-        self._heartbeat_events_lock: Lock = Lock()
+        # Any frame counts as a heartbeat, so liveness rides on regular traffic
+        self._last_sent_times: dict[int, float] = {}
+        self._failure_detectors: dict[int, FailureDetector] = {}
+        self._heartbeat_targets: set[int] = set()
+        self._heartbeat_frame: bytes = self.codec.encode(
+            Msg(self.get_id(), msg_type=MsgType.HEARTBEAT)
+        )
 
-        Thread(target=self._keep_checking_msgs).start()
+    def read_msg(self, msg: Union[str, bytes]):
+        msg: Msg = self.codec.decode(msg)
+        # Stamped on arrival, a backed up inbox must not look like a dead sender
+        failure_detector = self._failure_detectors.get(msg.src)
+        if failure_detector:
+            failure_detector.heartbeat(time.monotonic())
+        if msg.type == MsgType.BATCH:
+            for frame in _unpack_batch(msg.payload):
+                self._handle_msg(self.codec.decode(frame))
+        else:
+            self._handle_msg(msg)
+        # One ack covers everything received from a sender so far, but a busy
+        # dispatcher must not hold acks back long enough to trigger retransmits
+        if self._unacked_srcs and (
+            not self.coalesce_acks or self._unacked_count >= self.max_unacked_count
+        ):
+            self._acknowledge_unacked_msgs()
 
-    def read_msg(self, msg: str):
-        self.general_inbox.put(Msg.from_json(msg))
+    def flush_reads(self):
+        self._acknowledge_unacked_msgs()
 
-    def _acknowledge_msg(self, msg: Msg):
-        ack_msg = Msg(self.get_id(), msg_type=MsgType.ACKNOWLEDGE, ack_msg=msg.ack)
-        self.send_msg(msg.src, ack_msg, verify=False)
-        unique_msg_id = f"{msg.src}~{msg.ack}"
-        with self._processed_msgs_lock:
-            if unique_msg_id not in self._processed_msgs:
-                self._processed_msgs.add(unique_msg_id)
+    def _handle_msg(self, msg: Msg):
+        if msg.type == MsgType.ACKNOWLEDGE:
+            self._ack_received(msg)
+        elif msg.type == MsgType.HEARTBEAT:
+            # Already recorded on arrival
+            pass
+        elif msg.type == MsgType.REGULAR or msg.type == MsgType.COLLECTIVE:
+            # Unverified sends carry no sequence number, deliver them as is
+            reliable = msg.ack >= 0
+            # Duplicates are acked again but never reach the application
+            if not reliable or self._record_received(msg):
+                if msg.type == MsgType.COLLECTIVE:
+                    self.collective_inbox.put(msg)
+                else:
+                    self.inbox.put(msg)
+                    inbox_depth = self.inbox.qsize()
+                    if inbox_depth > self.metrics.inbox_high_water:
+                        self.metrics.inbox_high_water = inbox_depth
+            if reliable:
+                self._unacked_srcs.add(msg.src)
+                self._unacked_count += 1
+        else:
+            raise ValueError(f"Invalid message type: {msg.type}")
 
-    def _keep_checking_msgs(self):
-        while self.get_alive_status():
-            try:
-                msg: Msg = self.general_inbox.get(timeout=0.1)
-            except queue.Empty:
-                continue
-            if msg.type == MsgType.ACKNOWLEDGE:
-                with self._ack_events_lock:
-                    if msg.ack in self._ack_events:
-                        self._ack_events[msg.ack].set()
-            elif msg.type == MsgType.HEARTBEAT:
-                with self._heartbeat_events_lock:
-                    if msg.src in self._heartbeat_events:
-                        self._heartbeat_events[msg.src].set()
-            elif msg.type == MsgType.REGULAR:
-                self._acknowledge_msg(msg)
-                self.focused_inbox.put(msg)
-            else:
-                raise ValueError(f"Invalid message type: {msg.type}")
+    def _record_received(self, msg: Msg) -> bool:
+        """Returns False for a duplicate"""
+        duplicate_window = self._duplicate_windows.get(msg.src)
+        if duplicate_window is None or duplicate_window.epoch != msg.epoch:
+            duplicate_window = DuplicateWindow(msg.epoch, msg.base)
+            self._duplicate_windows[msg.src] = duplicate_window
+        duplicate_window.advance_to(msg.base)
+        return duplicate_window.record(msg.ack)
+
+    def _acknowledge_msgs(self, src: int):
+        duplicate_window = self._duplicate_windows[src]
+        # The whole bitmap fits in SIZE / 8 bytes, so every received message is acked
+        sack_content = None
+        if duplicate_window.bitmap:
+            sack_content = duplicate_window.bitmap.to_bytes(DuplicateWindow.SIZE // 8)
+        ack_msg = Msg(
+            self.get_id(),
+            MsgType.ACKNOWLEDGE,
+            sack_content,
+            duplicate_window.watermark,
+            duplicate_window.epoch,
+        )
+        self._send_frame(src, self.codec.encode(ack_msg))
+
+    def _acknowledge_unacked_msgs(self):
+        for src in self._unacked_srcs:
+            self._acknowledge_msgs(src)
+        self._unacked_srcs.clear()
+        self._unacked_count = 0
 
-    def _keep_process_alive_continuously(
+    def _check_process_alive(
         self,
         process_id: int,
         process_def: type,
-        startup_msg: str = None,
-        wait_time: float = 5,
+        startup_msg: str,
+        failure_detector: FailureDetector,
     ):
-        with self._heartbeat_events_lock:
-            process_event = Event()
-            self._heartbeat_events[process_id] = process_event
-        while self.get_alive_status():
-            got_heartbeat = process_event.wait(wait_time)
-            if got_heartbeat:
-                process_event.clear()
-            else:
-                if not self.get_alive_status():
-                    break
-                print(f"[STATUS] Process {self.get_id()} reviving process {process_id}")
-                self.new_process(process_id, process_def, startup_msg)
+        """Runs on the timer wheel, once per suspicion time of a monitored process"""
+        if not self.get_alive_status():
+            return
+        if self._failure_detectors.get(process_id) is not failure_detector:
+            # No longer monitored, or monitored again by a newer check
+            return
+        now = time.monotonic()
+        suspicion_time = failure_detector.get_suspicion_time()
+        revive = suspicion_time <= now
+        if revive:
+            failure_detector.reset(now)
+            suspicion_time = failure_detector.get_suspicion_time()
+        TimerWheel.get_shared().schedule(
+            suspicion_time - now,
+            partial(
+                self._check_process_alive,
+                process_id,
+                process_def,
+                startup_msg,
+                failure_detector,
+            ),
+        )
+        if revive:
+            print(f"[STATUS] Process {self.get_id()} reviving process {process_id}")
+            # Starting a process runs user code and may block, keep it off the
+            # wheel. Threads made on the wheel would also inherit its daemon flag
+            Thread(
+                target=self.new_process,
+                args=[process_id, process_def, startup_msg],
+                daemon=False,
+            ).start()
 
     def keep_process_alive(
-        self, process_id: int, process_def: type, startup_msg: str = None
+        self,
+        process_id: int,
+        process_def: type,
+        startup_msg: str = None,
+        wait_time: float = 5,
     ):
-        Thread(
-            target=self._keep_process_alive_continuously,
-            args=[process_id, process_def, startup_msg],
-        ).start()
-
-    def _send_heartbeats_continuously(self, process_id: int, wait_time: float = 1):
-        while self.get_alive_status():
-            self.send_msg(
-                target=process_id, msg=Msg(msg_type=MsgType.HEARTBEAT), verify=False
-            )
-            time.sleep(wait_time)
+        """
+        Revives process_id once the job's failure detector suspects it, by default
+        after nothing was heard from it for wait_time seconds
+        """
+        failure_detector = DistributedSystem.create_failure_detector(
+            wait_time, self.heartbeat_interval
+        )
+        failure_detector.reset(time.monotonic())
+        self._failure_detectors[process_id] = failure_detector
+        TimerWheel.get_shared().schedule(
+            failure_detector.get_suspicion_time() - time.monotonic(),
+            partial(
+                self._check_process_alive,
+                process_id,
+                process_def,
+                startup_msg,
+                failure_detector,
+            ),
+        )
+
+    def stop_keeping_process_alive(self, process_id: int):
+        """Stops reviving process_id, e.g. once it reported its work done"""
+        self._failure_detectors.pop(process_id, None)
+
+    def _send_heartbeats(self):
+        """Runs on the timer wheel, heartbeats only the targets nothing else went to"""
+        if not self.get_alive_status():
+            return
+        now = time.monotonic()
+        for process_id in list(self._heartbeat_targets):
+            last_sent_time = self._last_sent_times.get(process_id, 0)
+            if now - last_sent_time >= self.heartbeat_interval / 2:
+                self.metrics.heartbeats += 1
+                self._send_frame(process_id, self._heartbeat_frame)
+        TimerWheel.get_shared().schedule(self.heartbeat_interval, self._send_heartbeats)
 
     def send_heartbeats_to_process(self, process_id: int):
-        Thread(target=self._send_heartbeats_continuously, args=[process_id]).start()
+        """At most one heartbeat per heartbeat_interval, none while other traffic flows"""
+        first_target = not self._heartbeat_targets
+        self._heartbeat_targets.add(process_id)
+        self.metrics.heartbeats += 1
+        self._send_frame(process_id, self._heartbeat_frame)
+        if first_target:
+            TimerWheel.get_shared().schedule(
+                self.heartbeat_interval, self._send_heartbeats
+            )
+
+    def _send_frame(self, target: int, msg_frame: Union[str, bytes]):
+        self._last_sent_times[target] = time.monotonic()
+        super().send_msg(target, msg_frame)
 
     def get_one_msg(self, timeout=None):
+        wait_start_time = time.monotonic()
         try:
-            return self.focused_inbox.get(timeout=timeout)
+            msg = self.inbox.get(timeout=timeout)
         except queue.Empty:
             return None
+        finally:
+            self.metrics.blocked_time += time.monotonic() - wait_start_time
+        if msg is _SHUTDOWN:
+            # Leave it for any other thread waiting on this inbox
+            self.inbox.put(_SHUTDOWN)
+            sys.exit()
+        return msg
 
-    def _wait_on_msg_id(self) -> int:
-        with self._next_msg_id_lock:
-            next_msg_id = self._next_msg_id
-            self._next_msg_id += 1
-        return next_msg_id
+    def stop(self):
+        super().stop()
+        self.inbox.put(_SHUTDOWN)
+        self.collective_inbox.put(_SHUTDOWN)
 
-    def send_msg(self, target: int, msg: Msg, verify=True, retry_time: float = 0.1):
+    def _start_collective(self, ranks: list, root: int) -> tuple:
+        """(collective key, group size, this process's rank relative to root)"""
+        group = tuple(ranks)
+        call_idx = self._collective_counts.get(group, 0)
+        self._collective_counts[group] = call_idx + 1
+        # hash of a tuple of ints is the same in every OS process
+        key = (hash(group), call_idx)
+        rank = ranks.index(self.get_id())
+        root_rank = 0 if root is None else ranks.index(root)
+        return key, len(ranks), (rank - root_rank) % len(ranks)
+
+    def _get_process_id(self, ranks: list, root: int, rel_rank: int) -> int:
+        root_rank = 0 if root is None else ranks.index(root)
+        return ranks[(root_rank + rel_rank) % len(ranks)]
+
+    def _send_collective(self, target: int, key: tuple, value):
+        """Not waited on, the ack layer retransmits in the background"""
+        self.send_msg_async(
+            target,
+            Msg(msg_type=MsgType.COLLECTIVE, msg_content=pickle.dumps((key, value))),
+        )
+
+    def _receive_collective(self, key: tuple, src: int):
+        while (key, src) not in self._collective_values:
+            msg = self.collective_inbox.get()
+            if msg is _SHUTDOWN:
+                self.collective_inbox.put(_SHUTDOWN)
+                sys.exit()
+            # Peers ahead of this process may already be on a later collective
+            msg_key, value = pickle.loads(msg.content)
+            self._collective_values[(msg_key, msg.src)] = value
+        return self._collective_values.pop((key, src))
+
+    def broadcast(self, value, ranks: list, root: int = None):
+        """root's value on every process in ranks, root defaults to ranks[0]"""
+        key, size, rel_rank = self._start_collective(ranks, root)
+        if rel_rank:
+            parent_id = self._get_process_id(ranks, root, _get_tree_parent(rel_rank))
+            value = self._receive_collective(key, parent_id)
+        for child in _get_tree_children(rel_rank, size):
+            self._send_collective(self._get_process_id(ranks, root, child), key, value)
+        return value
+
+    def scatter(self, values: list, ranks: list, root: int = None):
+        """values[i] from root on ranks[i], values is only read on root"""
+        key, size, rel_rank = self._start_collective(ranks, root)
+        if rel_rank:
+            parent_id = self._get_process_id(ranks, root, _get_tree_parent(rel_rank))
+            # Values of this process's subtree, by relative rank
+            subtree_values = self._receive_collective(key, parent_id)
+        else:
+            root_rank = ranks.index(self.get_id())
+            subtree_values = values[root_rank:] + values[:root_rank]
+        for child in _get_tree_children(rel_rank, size):
+            child_step = child - rel_rank
+            self._send_collective(
+                self._get_process_id(ranks, root, child),
+                key,
+                subtree_values[child_step : 2 * child_step],
+            )
+        return subtree_values[0]
+
+    def reduce(self, value, ranks: list, op: Callable = operator.add, root: int = None):
+        """
+        op folded over every value in ranks, on root and None elsewhere. op must
+        be associative, values are folded in ranks order starting from root
+        """
+        key, size, rel_rank = self._start_collective(ranks, root)
+        for child in _get_tree_children(rel_rank, size):
+            child_value = self._receive_collective(
+                key, self._get_process_id(ranks, root, child)
+            )
+            value = op(value, child_value)
+        if rel_rank:
+            parent_id = self._get_process_id(ranks, root, _get_tree_parent(rel_rank))
+            self._send_collective(parent_id, key, value)
+            return None
+        return value
+
+    def gather(self, value, ranks: list, root: int = None) -> list:
+        """Values of ranks in ranks order on root, None elsewhere"""
+        rel_values = self.reduce([value], ranks, operator.add, root)
+        if rel_values is None:
+            return None
+        root_rank = ranks.index(self.get_id())
+        return (
+            rel_values[len(ranks) - root_rank :] + rel_values[: len(ranks) - root_rank]
+        )
+
+    def allreduce(self, value, ranks: list, op: Callable = operator.add):
+        """reduce onto ranks[0], then broadcast the result back, 2 * log2 rounds"""
+        return self.broadcast(self.reduce(value, ranks, op), ranks)
+
+    def _ack_received(self, ack_msg: Msg):
+        if ack_msg.epoch != self._epoch:
+            # Ack for an earlier instance of this process
+            return
+        sack = []
+        if ack_msg.payload is not None:
+            sack_window = DuplicateWindow(ack_msg.epoch, ack_msg.ack)
+            sack_window.bitmap = int.from_bytes(ack_msg.payload)
+            sack = sack_window.get_sack()
+        acked_sends: list[_PendingSend] = []
+        with self._send_lock:
+            send_state = self._peer_send_states.get(ack_msg.src)
+            if send_state is None:
+                return
+            while send_state.pending:
+                seq = next(iter(send_state.pending))
+                if seq >= ack_msg.ack:
+                    break
+                acked_sends.append(send_state.pending.pop(seq))
+            for seq in sack:
+                pending_send = send_state.pending.pop(seq, None)
+                if pending_send:
+                    acked_sends.append(pending_send)
+            # Fast retransmit: anything still pending below a selectively acked
+            # message was most likely dropped, resend without waiting for its timer
+            lost_frames = []
+            if sack:
+                now = time.monotonic()
+                min_resend_gap = send_state.rtt_estimator.get_timeout(0) / 2
+                for seq, pending_send in send_state.pending.items():
+                    if seq > sack[-1]:
+                        break
+                    if now - pending_send.last_sent_time > min_resend_gap:
+                        pending_send.last_sent_time = now
+                        pending_send.retransmit_count += 1
+                        self.metrics.retransmitted += 1
+                        lost_frames.append(pending_send.frame)
+            for pending_send in acked_sends:
+                pending_send.timer.cancel()
+            # Karn's rule: an ack for a retransmitted message is an ambiguous sample
+            rtt_samples = [
+                pending_send.sent_time
+                for pending_send in acked_sends
+                if pending_send.retransmit_count == 0
+            ]
+            if rtt_samples:
+                send_state.rtt_estimator.add_sample(time.monotonic() - max(rtt_samples))
+            ready_frames = []
+            while send_state.backlog and not send_state.window_full():
+                msg, future, retry_time = send_state.backlog.popleft()
+                ready_frames.append(
+                    self._start_send(ack_msg.src, send_state, msg, future, retry_time)
+                )
+        ack_time = time.monotonic()
+        for pending_send in acked_sends:
+            self.metrics.ack_latency.record(ack_time - pending_send.sent_time)
+            pending_send.future.set_result(None)
+        for msg_frame in lost_frames + ready_frames:
+            self._transmit(ack_msg.src, msg_frame)
+
+    def _retransmit(self, target: int, seq: int):
+        with self._send_lock:
+            send_state = self._peer_send_states[target]
+            pending_send = send_state.pending.get(seq)
+            if pending_send is None:
+                return
+            if not self.get_alive_status():
+                del send_state.pending[seq]
+                pending_send.future.cancel()
+                while send_state.backlog:
+                    send_state.backlog.popleft()[1].cancel()
+                return
+            pending_send.retransmit_count += 1
+            self.metrics.retransmitted += 1
+            pending_send.last_sent_time = time.monotonic()
+            pending_send.timeout = min(
+                pending_send.timeout * 2, RttEstimator.MAX_TIMEOUT
+            )
+            pending_send.timer = TimerWheel.get_shared().schedule(
+                pending_send.timeout, partial(self._retransmit, target, seq)
+            )
+        self._transmit(target, pending_send.frame)
+
+    def _transmit(self, target: int, msg_frame: Union[str, bytes]):
+        if self.batch_window <= 0:
+            self._send_frame(target, msg_frame)
+            return
+        with self._batches_lock:
+            batch = self._batches.get(target)
+            if batch is None:
+                batch = []
+                self._batches[target] = batch
+                TimerWheel.get_shared().schedule(
+                    self.batch_window, partial(self._flush_batch, target)
+                )
+            batch.append(msg_frame)
+            batch_full = len(batch) >= self.max_batch_size
+        if batch_full:
+            self._flush_batch(target)
+
+    def _flush_batch(self, target: int):
+        with self._batches_lock:
+            batch = self._batches.pop(target, None)
+        if not batch:
+            return
+        if len(batch) == 1:
+            self._send_frame(target, batch[0])
+            return
+        batch_msg = Msg(self.get_id(), MsgType.BATCH, _pack_batch(batch))
+        self._send_frame(target, self.codec.encode(batch_msg))
+
+    def _start_send(
+        self,
+        target: int,
+        send_state: _PeerSendState,
+        msg: Msg,
+        future: Future,
+        retry_time: float,
+    ) -> Union[str, bytes]:
+        """Assigns the next sequence number to msg, caller holds _send_lock"""
+        msg.base = send_state.get_base()
+        seq = send_state.next_seq
+        send_state.next_seq += 1
+        msg.ack = seq
+        msg_frame = self.codec.encode(msg)
+        timeout = send_state.rtt_estimator.get_timeout(retry_time)
+        pending_send = _PendingSend(target, msg_frame, timeout, future)
+        pending_send.timer = TimerWheel.get_shared().schedule(
+            timeout, partial(self._retransmit, target, seq)
+        )
+        send_state.pending[seq] = pending_send
+        return msg_frame
+
+    def send_msg_async(self, target: int, msg: Msg, retry_time: float = 0.1) -> Future:
+        """
+        Reliable send that does not block. Returns a future resolved on ack, or
+        cancelled if this process dies first. Retransmits with exponential
+        backoff from a timeout estimated per target, retry_time is the timeout
+        until the first round trip to target is measured. At most
+        DuplicateWindow.SIZE sends per target are in flight, the rest wait
+        """
+        if not self.get_alive_status():
+            sys.exit()
         msg.src = self.get_id()
+        msg.epoch = self._epoch
+        future = Future()
+        with self._send_lock:
+            send_state = self._peer_send_states.get(target)
+            if send_state is None:
+                send_state = _PeerSendState()
+                self._peer_send_states[target] = send_state
+            if send_state.backlog or send_state.window_full():
+                send_state.backlog.append((msg, future, retry_time))
+                return future
+            msg_frame = self._start_send(target, send_state, msg, future, retry_time)
+        self._transmit(target, msg_frame)
+        return future
+
+    def send_msg(self, target: int, msg: Msg, verify=True, retry_time: float = 0.1):
         if verify:
-            msg_id = self._wait_on_msg_id()
-            msg.ack = msg_id
-            msg_string = msg.to_json()
-            super().send_msg(target, msg_string)
-            with self._ack_events_lock:
-                process_event = Event()
-                self._ack_events[msg_id] = process_event
-            while self.get_alive_status():
-                got_ack = process_event.wait(timeout=retry_time)
-                if got_ack:
-                    with self._ack_events_lock:
-                        del self._ack_events[msg_id]
-                    return
-                else:
-                    super().send_msg(target, msg_string)
+            try:
+                self.send_msg_async(target, msg, retry_time).result()
+            except CancelledError:
+                pass
         else:
-            msg_string = msg.to_json()
-            super().send_msg(target, msg_string)
+            msg.src = self.get_id()
+            msg_frame = self.codec.encode(msg)
+            self._send_frame(target, msg_frame)
@@ -0,0 +1,77 @@
+"""
+Goal: Count messages delivered by count_words and tfidf at 10% drop with
+per-message acks, coalesced cumulative acks, and coalesced acks plus batching
+
+count_words and tfidf send one message per mapper and reducer, so a stream of
+many small reliable messages between two processes is included for comparison
+"""
+
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.base_process import Msg, Process
+from distributed_systems.counting import count_words
+from distributed_systems.tfidf import tfidf
+
+import contextlib
+import io
+import os
+import random
+
+MSG_DROP_PROP = 0.1
+TRIAL_COUNT = 5
+
+TRANSPORTS = {
+    "per-message acks": dict(coalesce_acks=False),
+    "coalesced acks": dict(coalesce_acks=True),
+    "coalesced acks + batching": dict(coalesce_acks=True, batch_window=0.005),
+}
+
+
+class Streamer(Process):
+    def start(self, msg: str = None):
+        if self.get_id() == 0:
+            self.new_process(1, Streamer, "RECEIVER")
+            futures = [
+                self.send_msg_async(1, Msg.build_msg(f"{msg_idx}"))
+                for msg_idx in range(len(self.input))
+            ]
+            for future in futures:
+                future.result()
+        self.complete()
+
+
+def run_job(initializer: type, system_input) -> int:
+    DistributedSystem.reset()
+    DistributedSystem.define_faults(msg_drop_prop=MSG_DROP_PROP)
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(system_input, [initializer])
+        DistributedSystem.wait_for_completion()
+    return DistributedSystem.get_delivered_msg_count()
+
+
+if __name__ == "__main__":
+    words = [random.choice(["cat", "dog", "bird"]) for _ in range(2000)]
+    raw_data_dir = os.path.join(os.path.dirname(tfidf.__file__), "raw_data")
+    file_paths = [
+        os.path.join(raw_data_dir, file_name)
+        for file_name in sorted(os.listdir(raw_data_dir))
+    ]
+    jobs = {
+        "count_words": (count_words.Initializer, words),
+        "tfidf": (tfidf.Initializer, file_paths),
+        "stream": (Streamer, words[:500]),
+    }
+    print(f"[RESULT] delivered messages, mean of {TRIAL_COUNT} runs")
+    for job_name, (initializer, system_input) in jobs.items():
+        baseline = None
+        for transport_name, transport in TRANSPORTS.items():
+            Process.define_transport(**transport)
+            msg_count = (
+                sum(run_job(initializer, system_input) for _ in range(TRIAL_COUNT))
+                / TRIAL_COUNT
+            )
+            baseline = baseline or msg_count
+            print(
+                f"[RESULT] {job_name:11} | {transport_name:25} | {msg_count:7.1f} | "
+                f"{100 * (1 - msg_count / baseline):5.1f}% fewer"
+            )
+    Process.define_transport()
@@ -0,0 +1,93 @@
+"""
+Goal: Measure allreduce latency against process count, tree against a central collector
+
+The tree allreduce reduces over a binomial tree and broadcasts back, so each
+process handles at most log2(N) messages per call. The central one has every
+process send to process 0, which replies to each, so process 0 handles 2(N - 1).
+Threads share the GIL, so the multiprocess backend is where the tree's
+parallel fan-in shows
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, Process
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+
+import contextlib
+import io
+import os
+import statistics
+import sys
+import time
+
+CALL_COUNT = 50
+
+
+class TreeAllreducer(Process):
+    def start(self, msg: str = None):
+        ranks = list(range(TreeAllreducer.process_count))
+        call_times = []
+        for call_idx in range(CALL_COUNT):
+            start_time = time.perf_counter()
+            total = self.allreduce(call_idx, ranks)
+            call_times.append(time.perf_counter() - start_time)
+            assert total == call_idx * len(ranks)
+        if self.get_id() == 0:
+            ProcessFramework.output = call_times
+        self.complete()
+
+
+class CentralAllreducer(Process):
+    def start(self, msg: str = None):
+        process_count = TreeAllreducer.process_count
+        call_times = []
+        for call_idx in range(CALL_COUNT):
+            start_time = time.perf_counter()
+            if self.get_id() == 0:
+                total = call_idx
+                for _ in range(process_count - 1):
+                    total += int(self.get_one_msg().content)
+                for process_id in range(1, process_count):
+                    self.send_msg_async(process_id, Msg.build_msg(f"{total}"))
+            else:
+                self.send_msg(0, Msg.build_msg(f"{call_idx}"))
+                total = int(self.get_one_msg().content)
+            call_times.append(time.perf_counter() - start_time)
+            assert total == call_idx * process_count
+        if self.get_id() == 0:
+            ProcessFramework.output = call_times
+        self.complete()
+
+
+def run(process_def: type, process_count: int, backend=None) -> list:
+    """Call latencies seen by process 0"""
+    TreeAllreducer.process_count = process_count
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(backend)
+    DistributedSystem.define_faults(msg_drop_prop=0.0, max_process_kill_count=0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(None, [process_def] * process_count)
+        call_times = DistributedSystem.wait_for_completion()
+    DistributedSystem.set_backend(None)
+    return call_times
+
+
+if __name__ == "__main__":
+    process_counts = [int(arg) for arg in sys.argv[1:]] or [2, 4, 8, 16, 32, 64]
+    print(f"[RESULT] cores: {os.cpu_count()}, {CALL_COUNT} calls, median at process 0")
+    print("[RESULT] backend   | processes | tree (ms) | central (ms)")
+    for backend_name, backend_def in [
+        ("threads", None),
+        ("processes", MultiprocessBackend),
+    ]:
+        for process_count in process_counts:
+            latencies = [
+                statistics.median(
+                    run(process_def, process_count, backend_def and backend_def())
+                )
+                * 1e3
+                for process_def in [TreeAllreducer, CentralAllreducer]
+            ]
+            print(
+                f"[RESULT] {backend_name:9} | {process_count:9} | {latencies[0]:9.2f} | "
+                f"{latencies[1]:12.2f}"
+            )
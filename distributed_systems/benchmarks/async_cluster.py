@@ -0,0 +1,56 @@
+"""
+Goal: Measure wall time and memory of large simulated clusters on the asyncio runtime
+
+Every node heartbeats its successor, watches its predecessor and reliably sends
+its id to node 0, which sums them up
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg
+from distributed_systems.async_process import AsyncProcess, AsyncBackend
+
+import contextlib
+import io
+import resource
+import sys
+import time
+
+
+class Node(AsyncProcess):
+    async def start(self, msg: str = None):
+        node_count = self.input
+        self.send_heartbeats_to_process((self.get_id() + 1) % node_count)
+        self.keep_process_alive((self.get_id() - 1) % node_count, Node)
+        if self.get_id() != 0:
+            await self.send_msg(0, Msg.build_msg(f"{self.get_id()}"))
+            self.complete()
+            return
+        id_sum = 0
+        for _ in range(node_count - 1):
+            msg = await self.get_one_msg()
+            id_sum += int(msg.content)
+        ProcessFramework.output = id_sum
+        self.complete()
+
+
+def run(node_count: int) -> float:
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(AsyncBackend())
+    DistributedSystem.define_faults(msg_drop_prop=0.1)
+    start_time = time.time()
+    # Status lines for every node would dominate the runtime
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(node_count, [Node] * node_count)
+        output = DistributedSystem.wait_for_completion()
+    runtime = time.time() - start_time
+    assert output == node_count * (node_count - 1) // 2
+    return runtime
+
+
+if __name__ == "__main__":
+    node_counts = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 20000]
+    print("[RESULT] nodes | runtime (s) | peak RSS (MB)")
+    for node_count in node_counts:
+        runtime = run(node_count)
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(f"[RESULT] {node_count:5} | {runtime:11.2f} | {peak_rss_mb:.0f}")
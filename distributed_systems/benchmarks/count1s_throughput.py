@@ -0,0 +1,59 @@
+"""
+Goal: Measure count1s throughput against worker count on the multiprocess backend
+
+Workers count their windows of the shared input with NumPy and add up their
+sums through the reduction tree, so nothing serializes the windows
+"""
+
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+from distributed_systems.shared_input import SharedInput
+from distributed_systems.counting import count1s
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+import numpy as np
+
+INPUT_SIZE = 1 << 28
+
+
+def run(shared_input: SharedInput, worker_count: int) -> tuple:
+    """(seconds, output)"""
+    count1s.WORKER_COUNT = worker_count
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(MultiprocessBackend())
+    DistributedSystem.define_faults(msg_drop_prop=0.0, max_process_kill_count=0)
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(
+            shared_input, [count1s.Manager] + [count1s.Worker] * worker_count
+        )
+        output = DistributedSystem.wait_for_completion()
+    runtime = time.time() - start_time
+    DistributedSystem.set_backend(None)
+    return runtime, output
+
+
+if __name__ == "__main__":
+    worker_counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 4, 8]
+    data = np.random.default_rng(0).choice(
+        np.frombuffer(b"01", dtype=np.uint8), INPUT_SIZE
+    )
+    correct_count = int(np.count_nonzero(data == count1s.ONE))
+    results = []
+    with SharedInput.from_bytes(data) as shared_input:
+        for worker_count in worker_counts:
+            runtime, output = run(shared_input, worker_count)
+            assert output == correct_count
+            results.append((worker_count, runtime))
+    print(f"[RESULT] cores: {os.cpu_count()}, input: {INPUT_SIZE >> 20} MB")
+    print("[RESULT] workers | time (s) | MB/s")
+    for worker_count, runtime in results:
+        print(
+            f"[RESULT] {worker_count:7} | {runtime:8.2f} | "
+            f"{(INPUT_SIZE >> 20) / runtime:.0f}"
+        )
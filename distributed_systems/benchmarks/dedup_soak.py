@@ -0,0 +1,108 @@
+"""
+Goal: Show duplicate suppression keeps memory flat over millions of messages
+
+1. Feed millions of reordered and duplicated sequence numbers to one DuplicateWindow
+2. Stream reliable messages between two processes at 10% drop and check the
+    receiver sees each exactly once while its memory stays flat
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import DuplicateWindow, Msg, Process
+
+import contextlib
+import io
+import os
+import random
+import sys
+import tracemalloc
+
+WINDOW_MSG_COUNT = 5_000_000
+STREAM_MSG_COUNT = 300_000
+SAMPLE_COUNT = 5
+
+
+def get_rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def soak_window():
+    tracemalloc.start()
+    duplicate_window = DuplicateWindow(epoch=0, base=0)
+    delivered_count = 0
+    samples = []
+    # Every sequence number arrives once, some arrive again, slightly out of order
+    batch = []
+    for seq in range(WINDOW_MSG_COUNT):
+        batch.append(seq)
+        if random.random() < 0.1:
+            batch.append(seq)
+        if len(batch) >= 32:
+            random.shuffle(batch)
+            for batch_seq in batch:
+                delivered_count += duplicate_window.record(batch_seq)
+            batch.clear()
+        if (seq + 1) % (WINDOW_MSG_COUNT // SAMPLE_COUNT) == 0:
+            samples.append(tracemalloc.get_traced_memory()[0] / 1024)
+    for batch_seq in batch:
+        delivered_count += duplicate_window.record(batch_seq)
+    tracemalloc.stop()
+    assert delivered_count == WINDOW_MSG_COUNT
+    print(f"[RESULT] window: {WINDOW_MSG_COUNT} messages, each delivered once")
+    print(
+        f"[RESULT] window traced KB per {WINDOW_MSG_COUNT // SAMPLE_COUNT}: {samples}"
+    )
+
+
+class Streamer(Process):
+    rss_samples = []
+
+    def start(self, msg: str = None):
+        if self.get_id() == 0:
+            futures = []
+            for msg_idx in range(STREAM_MSG_COUNT):
+                futures.append(self.send_msg_async(1, Msg.build_msg(f"{msg_idx}")))
+                if len(futures) >= 1000:
+                    for future in futures:
+                        future.result()
+                    futures.clear()
+            for future in futures:
+                future.result()
+            self.complete()
+            return
+        seen_count = 0
+        next_msg_idx = 0
+        while seen_count < STREAM_MSG_COUNT:
+            msg = self.get_one_msg()
+            seen_count += 1
+            # Sender waits on every 1000, so each chunk arrives exactly once in any order
+            assert int(msg.content) // 1000 >= next_msg_idx // 1000
+            next_msg_idx = max(next_msg_idx, int(msg.content))
+            if seen_count % (STREAM_MSG_COUNT // SAMPLE_COUNT) == 0:
+                Streamer.rss_samples.append(round(get_rss_mb(), 1))
+        # Anything else arriving now would be a duplicate
+        assert self.get_one_msg(timeout=1) is None
+        ProcessFramework.output = seen_count
+        self.complete()
+
+
+def soak_stream():
+    DistributedSystem.define_faults(msg_drop_prop=0.1)
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(None, [Streamer, Streamer])
+        output = DistributedSystem.wait_for_completion()
+    assert output == STREAM_MSG_COUNT
+    print(
+        f"[RESULT] stream: {STREAM_MSG_COUNT} messages at 10% drop, each delivered once"
+    )
+    print(
+        f"[RESULT] stream RSS MB per {STREAM_MSG_COUNT // SAMPLE_COUNT}: "
+        f"{Streamer.rss_samples}"
+    )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        STREAM_MSG_COUNT = int(sys.argv[1])
+    soak_window()
+    soak_stream()
@@ -0,0 +1,89 @@
+"""
+Goal: Measure threads and heartbeat frames spent on failure detection
+
+Runs a count_primes ring, then two busy processes that stream to each other while
+watching each other's liveness
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, MsgType, Process
+from distributed_systems.counting import count_primes
+
+import contextlib
+import io
+import sys
+import threading
+import time
+
+STREAM_SECONDS = 5
+
+
+class FrameCounter:
+    """Counts frames by type by wrapping ProcessFramework.send_msg"""
+
+    def __init__(self):
+        self.counts: dict = {}
+        self._send_msg = ProcessFramework.send_msg
+
+    def __enter__(self):
+        counts = self.counts
+        send_msg = self._send_msg
+
+        def counting_send_msg(process, target_id, msg=None):
+            msg_type = Process.codec.decode(msg).type
+            counts[msg_type] = counts.get(msg_type, 0) + 1
+            return send_msg(process, target_id, msg)
+
+        ProcessFramework.send_msg = counting_send_msg
+        return self
+
+    def __exit__(self, *exc_info):
+        ProcessFramework.send_msg = self._send_msg
+
+
+class Streamer(Process):
+    def start(self, msg: str = None):
+        peer = 1 - self.get_id()
+        self.send_heartbeats_to_process(peer)
+        self.keep_process_alive(peer, Streamer)
+        end_time = time.time() + STREAM_SECONDS
+        while time.time() < end_time:
+            futures = [
+                self.send_msg_async(peer, Msg.build_msg(f"{msg_idx}"))
+                for msg_idx in range(100)
+            ]
+            for future in futures:
+                future.result()
+        self.complete()
+
+
+def run(process_defs: list, input) -> tuple:
+    DistributedSystem.reset()
+    peak_thread_count = threading.active_count()
+    start_time = time.time()
+    with FrameCounter() as frame_counter, contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(input, process_defs)
+        waiter = threading.Thread(target=DistributedSystem.wait_for_completion)
+        waiter.start()
+        while waiter.is_alive():
+            peak_thread_count = max(peak_thread_count, threading.active_count())
+            waiter.join(0.05)
+    runtime = time.time() - start_time
+    heartbeat_count = frame_counter.counts.get(MsgType.HEARTBEAT, 0)
+    return runtime, peak_thread_count, heartbeat_count
+
+
+if __name__ == "__main__":
+    counter_count = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    count_primes.BITE_SIZE = 500
+    runtime, peak_thread_count, heartbeat_count = run(
+        [count_primes.FirstCounter], counter_count * count_primes.BITE_SIZE
+    )
+    print(f"[RESULT] count_primes ring of {counter_count} counters")
+    print(f"[RESULT] peak threads: {peak_thread_count}")
+    print(f"[RESULT] heartbeats/sec: {heartbeat_count / runtime:.1f}")
+
+    runtime, peak_thread_count, heartbeat_count = run([Streamer, Streamer], None)
+    print(f"[RESULT] 2 busy streamers for {STREAM_SECONDS}s")
+    print(f"[RESULT] peak threads: {peak_thread_count}")
+    print(f"[RESULT] heartbeats/sec: {heartbeat_count / runtime:.1f}")
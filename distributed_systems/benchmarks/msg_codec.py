@@ -0,0 +1,29 @@
+"""
+Goal: Compare encode/decode cost of the binary and JSON message codecs
+"""
+
+from distributed_systems.base_process import BinaryCodec, JsonCodec, Msg, MsgType
+
+import timeit
+
+ITERATIONS = 200000
+
+
+if __name__ == "__main__":
+    msgs = {
+        "heartbeat": Msg(12, MsgType.HEARTBEAT),
+        "ack": Msg(12, MsgType.ACKNOWLEDGE, ack_msg=4817),
+        "regular": Msg(12, MsgType.REGULAR, "120000~150000", 4817),
+        "regular_4kb": Msg(12, MsgType.REGULAR, "x" * 4096, 4817),
+    }
+    print("[RESULT] msg         | codec  | encode ns | decode ns | frame bytes")
+    for msg_name, msg in msgs.items():
+        for codec in [BinaryCodec(), JsonCodec()]:
+            frame = codec.encode(msg)
+            encode_time = timeit.timeit(lambda: codec.encode(msg), number=ITERATIONS)
+            decode_time = timeit.timeit(lambda: codec.decode(frame), number=ITERATIONS)
+            print(
+                f"[RESULT] {msg_name:11} | {type(codec).__name__[:-5]:6} | "
+                f"{encode_time / ITERATIONS * 1e9:9.0f} | "
+                f"{decode_time / ITERATIONS * 1e9:9.0f} | {len(frame)}"
+            )
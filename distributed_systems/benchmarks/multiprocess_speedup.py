@@ -0,0 +1,42 @@
+"""
+Goal: Compare count_primes wall time on the thread and multiprocess backends
+"""
+
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+from distributed_systems.counting import count_primes as count_primes_job
+
+import os
+import sys
+import time
+
+SYSTEM_INPUT = 80000
+
+
+def run(counter_count: int, backend) -> float:
+    count_primes_job.BITE_SIZE = -(-SYSTEM_INPUT // counter_count)
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(backend)
+    DistributedSystem.define_faults(msg_drop_prop=0.0, max_process_kill_count=0)
+    start_time = time.time()
+    DistributedSystem.process_input(SYSTEM_INPUT, [count_primes_job.FirstCounter])
+    output = DistributedSystem.wait_for_completion()
+    runtime = time.time() - start_time
+    assert output == count_primes_job.count_primes(0, SYSTEM_INPUT)
+    return runtime
+
+
+if __name__ == "__main__":
+    counter_counts = [int(arg) for arg in sys.argv[1:]] or [2, 4, 8]
+    results = []
+    for counter_count in counter_counts:
+        thread_time = run(counter_count, None)
+        multiprocess_time = run(counter_count, MultiprocessBackend())
+        results.append((counter_count, thread_time, multiprocess_time))
+    print(f"[RESULT] cores: {os.cpu_count()}")
+    print("[RESULT] counters | threads (s) | multiprocess (s) | speedup")
+    for counter_count, thread_time, multiprocess_time in results:
+        print(
+            f"[RESULT] {counter_count:8} | {thread_time:11.2f} | "
+            f"{multiprocess_time:16.2f} | {thread_time / multiprocess_time:.2f}"
+        )
@@ -0,0 +1,62 @@
+"""
+Goal: Measure per-message latency as round trips between two processes
+
+The pinger sends one message and waits for the reply before sending the next,
+so every round trip pays the full receive path twice. Reliable round trips
+also wait for the ack of each send
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, Process
+
+import contextlib
+import io
+import statistics
+import time
+
+ROUND_TRIP_COUNT = 2000
+
+
+class Pinger(Process):
+    verify = True
+
+    def start(self):
+        round_trip_times = []
+        for msg_idx in range(ROUND_TRIP_COUNT):
+            start_time = time.perf_counter()
+            self.send_msg(1, Msg.build_msg(f"{msg_idx}"), verify=Pinger.verify)
+            self.get_one_msg()
+            round_trip_times.append(time.perf_counter() - start_time)
+        self.send_msg(1, Msg.build_msg("DONE"), verify=Pinger.verify)
+        ProcessFramework.output = round_trip_times
+        self.complete()
+
+
+class Ponger(Process):
+    def start(self):
+        while True:
+            msg = self.get_one_msg()
+            if msg.content == "DONE":
+                break
+            self.send_msg(0, Msg.build_msg(msg.content), verify=Pinger.verify)
+        self.complete()
+
+
+def run(verify: bool) -> list:
+    DistributedSystem.reset()
+    Pinger.verify = verify
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(None, [Pinger, Ponger])
+        return DistributedSystem.wait_for_completion()
+
+
+if __name__ == "__main__":
+    print(f"[RESULT] {ROUND_TRIP_COUNT} round trips | median (ms) | p99 (ms)")
+    for verify in [False, True]:
+        round_trip_times = run(verify)
+        percentiles = statistics.quantiles(round_trip_times, n=100)
+        send_kind = "reliable" if verify else "unverified"
+        print(
+            f"[RESULT] {send_kind:10} | {statistics.median(round_trip_times) * 1e3:.3f} | "
+            f"{percentiles[98] * 1e3:.3f}"
+        )
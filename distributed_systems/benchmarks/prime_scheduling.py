@@ -0,0 +1,56 @@
+"""
+Goal: Compare count_primes wall time against worker count, ring against scheduler
+
+The ring gives each counter an equal range, so the counter holding the largest
+numbers finishes last. The scheduler sizes units from measured cost and lets
+idle counters steal. Both run on the multiprocess backend so workers use cores
+"""
+
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+from distributed_systems.counting import count_primes as count_primes_job
+
+import contextlib
+import io
+import os
+import sys
+import time
+
+SYSTEM_INPUT = 200_000_000
+
+
+def run(process_def: type, system_input: int) -> tuple:
+    """(seconds, output)"""
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(MultiprocessBackend())
+    DistributedSystem.define_faults(msg_drop_prop=0.0, max_process_kill_count=0)
+    start_time = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(system_input, [process_def])
+        output = DistributedSystem.wait_for_completion()
+    runtime = time.time() - start_time
+    DistributedSystem.set_backend(None)
+    return runtime, output
+
+
+if __name__ == "__main__":
+    system_input = int(sys.argv[1]) if len(sys.argv) > 1 else SYSTEM_INPUT
+    worker_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8]
+    correct_count = count_primes_job.count_primes(0, system_input)
+    results = []
+    for worker_count in worker_counts:
+        count_primes_job.BITE_SIZE = -(-system_input // worker_count)
+        ring_time, ring_output = run(count_primes_job.FirstCounter, system_input)
+        count_primes_job.PrimeScheduler.worker_count = worker_count
+        scheduler_time, scheduler_output = run(
+            count_primes_job.PrimeScheduler, system_input
+        )
+        assert ring_output == scheduler_output == correct_count
+        results.append((worker_count, ring_time, scheduler_time))
+    print(f"[RESULT] cores: {os.cpu_count()}, input: {system_input}")
+    print("[RESULT] workers | ring (s) | scheduler (s) | speedup")
+    for worker_count, ring_time, scheduler_time in results:
+        print(
+            f"[RESULT] {worker_count:7} | {ring_time:8.2f} | "
+            f"{scheduler_time:13.2f} | {ring_time / scheduler_time:.2f}"
+        )
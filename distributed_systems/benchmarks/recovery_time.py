@@ -0,0 +1,103 @@
+"""
+Goal: Compare how fast fixed-timeout and phi accrual detection revive a crashed process
+
+A watcher keeps a heartbeating process alive, which crashes after CRASH_TIME.
+Recovery time is from the crash to the revived instance starting. Quiet runs
+never crash and count revivals of a live process instead, a revived instance
+carries on where the one it replaced was. Everything runs in virtual time on
+the simulation backend
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg
+from distributed_systems.async_process import AsyncProcess
+from distributed_systems.simulation import SimulationBackend
+from distributed_systems.failure_detector import (
+    FixedTimeoutDetector,
+    PhiAccrualDetector,
+)
+
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+CRASH_TIME = 30
+QUIET_TIME = 600
+
+
+class Watcher(AsyncProcess):
+    async def start(self, msg: str = None):
+        self.keep_process_alive(1, Beater, "REVIVED")
+        await self.get_one_msg()
+        self.complete()
+
+
+class Beater(AsyncProcess):
+    # Virtual times of the current run, shared by every instance of process 1
+    end_time: float = None
+    crash_time: float = None
+
+    async def start(self, msg: str = None):
+        now = asyncio.get_running_loop().time()
+        if Beater.crash_time is not None:
+            ProcessFramework.output = now - Beater.crash_time
+            await self.send_msg(0, Msg.build_msg("DONE"))
+            self.complete()
+            return
+        if msg is None:
+            Beater.end_time = now + self.input
+        # A live process revived by mistake carries on until the run ends
+        self.send_heartbeats_to_process(0)
+        await asyncio.sleep(Beater.end_time - now)
+        if self.input == QUIET_TIME:
+            await self.send_msg(0, Msg.build_msg("DONE"))
+            self.complete()
+            return
+        Beater.crash_time = asyncio.get_running_loop().time()
+        self.shutdown(premature=True)
+
+
+def run(detector_def: type, run_time: float, seed: int, msg_drop_prop: float):
+    DistributedSystem.reset()
+    Beater.crash_time = None
+    DistributedSystem.set_backend(SimulationBackend(seed=seed))
+    DistributedSystem.define_faults(msg_drop_prop=msg_drop_prop)
+    DistributedSystem.define_failure_detection(detector_def)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(run_time, [Watcher, Beater])
+            output = DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+        DistributedSystem.define_faults()
+        DistributedSystem.define_failure_detection()
+    revival_count = DistributedSystem.get_process_metrics(1).starts - 1
+    return output, revival_count
+
+
+if __name__ == "__main__":
+    seed_count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    start_time = time.time()
+    print(
+        "[RESULT] detector | drop | mean recovery (s) | max recovery (s) | false revivals/hour"
+    )
+    for detector_def in [FixedTimeoutDetector, PhiAccrualDetector]:
+        for msg_drop_prop in [0.0, 0.1]:
+            recovery_times = []
+            false_revival_count = 0
+            for seed in range(seed_count):
+                recovery_time, _ = run(detector_def, CRASH_TIME, seed, msg_drop_prop)
+                recovery_times.append(recovery_time)
+                _, revival_count = run(detector_def, QUIET_TIME, seed, msg_drop_prop)
+                false_revival_count += revival_count
+            false_revivals_per_hour = false_revival_count / (
+                seed_count * QUIET_TIME / 3600
+            )
+            print(
+                f"[RESULT] {detector_def.__name__:20} | {msg_drop_prop:.1f} | "
+                f"{sum(recovery_times) / len(recovery_times):17.2f} | "
+                f"{max(recovery_times):16.2f} | {false_revivals_per_hour:.2f}"
+            )
+    print(f"[RESULT] Benchmark wall time: {time.time() - start_time:.1f}s")
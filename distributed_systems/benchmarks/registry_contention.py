@@ -0,0 +1,74 @@
+"""
+Goal: Measure send throughput while hundreds of processes exchange messages,
+with and without concurrent process creation/shutdown churn on the registry
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+
+from threading import Thread, Event
+import random
+import time
+
+MSGS_PER_PROCESS = 1000
+CHURN_INTERVAL = 0.001
+
+
+class Chatter(ProcessFramework):
+    process_count = 0
+    # Peers can deliver before start runs, so the count can't start there
+    received_count = 0
+
+    def read_msg(self, msg: str):
+        self.received_count += 1
+
+    def start(self, msg: str = None):
+        for _ in range(MSGS_PER_PROCESS):
+            self.send_msg(random.randrange(Chatter.process_count), "PING")
+        self.complete()
+
+
+class Idle(ProcessFramework):
+    def read_msg(self, msg: str):
+        pass
+
+    def start(self, msg: str = None):
+        pass
+
+
+def churn_registry(first_id: int, stop_event: Event) -> int:
+    churn_count = 0
+    while not stop_event.is_set():
+        process = DistributedSystem.initialize_process(first_id + churn_count, Idle)
+        process.shutdown()
+        churn_count += 1
+        time.sleep(CHURN_INTERVAL)
+    return churn_count
+
+
+def run(process_count: int, churn: bool) -> float:
+    DistributedSystem.reset()
+    DistributedSystem.define_faults(msg_drop_prop=0.0)
+    Chatter.process_count = process_count
+    stop_event = Event()
+    churn_thread = Thread(target=churn_registry, args=[process_count, stop_event])
+
+    start_time = time.time()
+    if churn:
+        churn_thread.start()
+    DistributedSystem.process_input(None, [Chatter] * process_count)
+    DistributedSystem.wait_for_completion()
+    runtime = time.time() - start_time
+    stop_event.set()
+    if churn:
+        churn_thread.join()
+    return process_count * MSGS_PER_PROCESS / runtime
+
+
+if __name__ == "__main__":
+    results = []
+    for process_count in [100, 300, 500]:
+        for churn in [False, True]:
+            results.append((process_count, churn, run(process_count, churn)))
+    print("[RESULT] processes | churn | sent msgs/sec")
+    for process_count, churn, sends_per_sec in results:
+        print(f"[RESULT] {process_count:9} | {str(churn):5} | {sends_per_sec:.0f}")
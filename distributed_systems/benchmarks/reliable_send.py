@@ -0,0 +1,50 @@
+"""
+Goal: Compare blocking reliable sends against many reliable sends in flight
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, Process
+
+import time
+
+MSG_COUNT = 500
+MSG_DROP_PROP = 0.1
+
+
+class Sender(Process):
+    pipelined = False
+
+    def start(self):
+        start_time = time.time()
+        if Sender.pipelined:
+            futures = []
+            for msg_idx in range(MSG_COUNT):
+                futures.append(self.send_msg_async(1, Msg.build_msg(f"{msg_idx}")))
+            for future in futures:
+                future.result()
+        else:
+            for msg_idx in range(MSG_COUNT):
+                self.send_msg(1, Msg.build_msg(f"{msg_idx}"))
+        ProcessFramework.output = time.time() - start_time
+        self.complete()
+
+
+class Receiver(Process):
+    def start(self):
+        self.complete()
+
+
+def run(pipelined: bool) -> float:
+    DistributedSystem.reset()
+    DistributedSystem.define_faults(msg_drop_prop=MSG_DROP_PROP)
+    Sender.pipelined = pipelined
+    DistributedSystem.process_input(None, [Sender, Receiver])
+    return DistributedSystem.wait_for_completion()
+
+
+if __name__ == "__main__":
+    blocking_time = run(False)
+    pipelined_time = run(True)
+    print(f"[RESULT] {MSG_COUNT} reliable sends at {MSG_DROP_PROP} drop probability")
+    print(f"[RESULT] blocking: {blocking_time:.2f}s")
+    print(f"[RESULT] in flight: {pipelined_time:.2f}s")
@@ -0,0 +1,62 @@
+"""
+Goal: Measure how many count_primes fault scenarios the simulation backend runs per second
+
+Each scenario drops 10% of messages and kills two counters, with its own seed.
+The same scenario on threads waits out real heartbeat and revival timeouts
+"""
+
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.simulation import SimulationBackend
+from distributed_systems.counting import count_primes
+
+import contextlib
+import io
+import sys
+import time
+
+SYSTEM_INPUT = 2000
+count_primes.BITE_SIZE = 200
+
+
+def run_scenario(seed: int, backend=None):
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(backend)
+    DistributedSystem.define_faults(
+        msg_drop_prop=0.1, max_process_kill_count=2, process_kill_wait_time=0.01
+    )
+    if backend:
+        process_defs = [count_primes.AsyncFirstCounter]
+    else:
+        process_defs = [count_primes.FirstCounter]
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(SYSTEM_INPUT, process_defs)
+        return DistributedSystem.wait_for_completion()
+
+
+if __name__ == "__main__":
+    scenario_count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    correct_count = count_primes.count_primes(0, SYSTEM_INPUT)
+
+    start_time = time.time()
+    virtual_time = 0.0
+    failed_seeds = []
+    for seed in range(scenario_count):
+        backend = SimulationBackend(seed=seed, time_limit=600)
+        try:
+            output = run_scenario(seed, backend)
+        except TimeoutError:
+            output = None
+        if output != correct_count:
+            failed_seeds.append(seed)
+        virtual_time += backend.time()
+    runtime = time.time() - start_time
+    print(f"[RESULT] {scenario_count} simulated scenarios in {runtime:.2f}s")
+    print(f"[RESULT] {scenario_count / runtime:.0f} scenarios/sec")
+    print(f"[RESULT] {virtual_time:.0f} virtual seconds simulated")
+    # Replay one with SimulationBackend(seed=...) to debug it
+    print(f"[RESULT] Failed seeds: {failed_seeds}")
+
+    start_time = time.time()
+    output = run_scenario(0)
+    print(f"[RESULT] One threaded scenario in {time.time() - start_time:.2f}s")
+    print(f"[RESULT] Threaded output correct: {output == correct_count}")
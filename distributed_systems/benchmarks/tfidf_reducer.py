@@ -0,0 +1,121 @@
+"""
+Goal: Time the tfidf reducer merging dict postings against sorted array postings
+
+The bundled raw_data is replicated REPLICATION times. Map tasks run up front
+and only the reducer side is timed: unpickling each partition, merging it
+into the reducer's state and reducing every term. Both variants that fold
+partitions as they arrive copy a term's accumulated postings per map task, so
+they slow down with the task count, while TermDocFreq merges each term once
+"""
+
+from distributed_systems.mapreduce import map_task, merge_partition
+from distributed_systems.tfidf import tfidf
+from distributed_systems.tfidf.tfidf import TermDocFreq, read_docs
+from utils.string_cleaning import sentence_to_list
+
+import os
+import pickle
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+REPLICATION = 1000
+SPLIT_SIZE = 1 << 16
+
+
+class DictTermDocFreq(TermDocFreq):
+    """Word -> {doc id: occurrences}, one record per doc, as before sorted postings"""
+
+    fold_partitions = True
+
+    def read_split(self, task):
+        return read_docs(task)
+
+    def map(self, record: tuple):
+        doc_id, doc = record
+        doc_word_counts = {}
+        for word in sentence_to_list(doc):
+            if word in doc_word_counts:
+                doc_word_counts[word] += 1
+            else:
+                doc_word_counts[word] = 1
+        for word, count in doc_word_counts.items():
+            yield word, {doc_id: count}
+
+    def combine(self, word: str, freqs_in_docs: list) -> dict:
+        combined_freq_in_docs = {}
+        for freq_in_docs in freqs_in_docs:
+            for doc_id, freq in freq_in_docs.items():
+                if doc_id in combined_freq_in_docs:
+                    combined_freq_in_docs[doc_id] += freq
+                else:
+                    combined_freq_in_docs[doc_id] = freq
+        return combined_freq_in_docs
+
+    def reduce(self, word: str, freqs_in_docs: list) -> dict:
+        return self.combine(word, freqs_in_docs)
+
+
+class FoldedTermDocFreq(TermDocFreq):
+    """Sorted postings merged into the accumulated run as each partition arrives"""
+
+    fold_partitions = True
+
+    def combine(self, word: str, postings_runs: list) -> tuple:
+        doc_ids, counts = super().combine(word, postings_runs)
+        # A run arriving after runs on both sides of it lands inside the merged run
+        if (doc_ids[1:] < doc_ids[:-1]).any():
+            order = np.argsort(doc_ids, kind="stable")
+            doc_ids = doc_ids[order]
+            counts = counts[order]
+        return doc_ids, counts
+
+
+def replicate_raw_data(data_dir: str, replication: int) -> list:
+    raw_data_dir = os.path.join(os.path.dirname(tfidf.__file__), "raw_data")
+    file_paths = []
+    for file_name in sorted(os.listdir(raw_data_dir)):
+        with open(os.path.join(raw_data_dir, file_name), "rb") as fh:
+            raw_data = fh.read()
+        file_path = os.path.join(data_dir, file_name)
+        with open(file_path, "wb") as fh:
+            for _ in range(replication):
+                fh.write(raw_data)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def time_reducer(job_def: type, file_paths: list) -> tuple:
+    """Returns (reducer seconds, map task count)"""
+    job = job_def()
+    job.reducer_count = 1
+    job.split_size = SPLIT_SIZE
+    tasks = job.split(file_paths)
+    # Shuffled, so partitions arrive out of doc id order like a real shuffle
+    random.Random(0).shuffle(tasks)
+    partition_msgs = [pickle.dumps(map_task(job, task)[0]) for task in tasks]
+
+    start_time = time.perf_counter()
+    key_values = {}
+    for partition_msg in partition_msgs:
+        merge_partition(job, key_values, pickle.loads(partition_msg))
+    for key, values in key_values.items():
+        job.reduce(key, values)
+    return time.perf_counter() - start_time, len(tasks)
+
+
+if __name__ == "__main__":
+    replication = int(sys.argv[1]) if len(sys.argv) > 1 else REPLICATION
+    data_dir = tempfile.mkdtemp()
+    try:
+        file_paths = replicate_raw_data(data_dir, replication)
+        print(f"[RESULT] raw_data x{replication} | map tasks | reducer time (s)")
+        for job_def in [DictTermDocFreq, FoldedTermDocFreq, TermDocFreq]:
+            reduce_time, task_count = time_reducer(job_def, file_paths)
+            print(f"[RESULT] {job_def.__name__:17} | {task_count} | {reduce_time:.2f}")
+    finally:
+        shutil.rmtree(data_dir)
@@ -0,0 +1,76 @@
+"""
+Goal: Let a revived process pick up where its previous instance left off
+
+Usage:
+    DistributedSystem.define_checkpoints(FileCheckpointStore(dir_path)) before
+    process_input. Processes call save_checkpoint(name, state) as they make
+    progress and load_checkpoint(name) when they start
+
+Notes:
+    - Checkpoints are keyed by process id and a name the process picks, e.g. the
+      range it works on, so an instance only sees what its predecessors saved
+    - State must be JSON serializable, a save replaces the previous state
+    - MemoryCheckpointStore is a stand-in for durable storage and only lasts as
+      long as the OS process. MultiprocessBackend revives a process in a fresh
+      OS process, so use FileCheckpointStore there
+    - Without a store saves are dropped and loads find nothing
+"""
+
+from abc import ABC, abstractmethod
+from threading import Lock
+import json
+import os
+
+
+class CheckpointStore(ABC):
+    @abstractmethod
+    def save(self, key: str, state):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def load(self, key: str):
+        """Last state saved under key, None if there is none"""
+        raise NotImplementedError()
+
+
+class MemoryCheckpointStore(CheckpointStore):
+    def __init__(self):
+        self._states: dict = {}
+        self._lock: Lock = Lock()
+
+    def save(self, key: str, state):
+        # Stored encoded, so a caller mutating state does not change the checkpoint
+        state_json = json.dumps(state)
+        with self._lock:
+            self._states[key] = state_json
+
+    def load(self, key: str):
+        with self._lock:
+            state_json = self._states.get(key)
+        return None if state_json is None else json.loads(state_json)
+
+
+class FileCheckpointStore(CheckpointStore):
+    """One JSON file per key in dir_path"""
+
+    def __init__(self, dir_path: str):
+        self.dir_path: str = dir_path
+        os.makedirs(dir_path, exist_ok=True)
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.dir_path, f"{key.replace('/', '_')}.json")
+
+    def save(self, key: str, state):
+        path = self._get_path(key)
+        # Killed mid write, the previous checkpoint must survive whole
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(state, fh)
+        os.replace(tmp_path, path)
+
+    def load(self, key: str):
+        try:
+            with open(self._get_path(key), "r") as fh:
+                return json.load(fh)
+        except FileNotFoundError:
+            return None
@@ -1,100 +1,109 @@
 from distributed_systems.framework import ProcessFramework, DistributedSystem
 from distributed_systems.base_process import Msg, Process
+from distributed_systems.shared_input import InputRef, SharedInput
 
 import time
-import sys
+
+import numpy as np
 
 
 DONE = "DONE"
+REQUEST = "REQUEST"
+# Prefix of a partial sum sent up the reduction tree
+SUM = "SUM"
+ONE = ord("1")
 
 MANAGER_ID = 0
-GUARD_ID = 1
-WORKER_0_ID = 2
-WORKER_1_ID = 3
 
 WORKER_COUNT = 2
+# Windows per worker, more balances uneven workers at one round trip each
+WINDOWS_PER_WORKER = 4
+
+
+def get_child_ids(process_id: int) -> list:
+    """
+    Reduction tree over the manager and workers 1..WORKER_COUNT, laid out like a
+    binary heap: each node adds its children's sums to its own and sends the
+    total to its parent, so sums reach the manager in log2(WORKER_COUNT) hops
+    """
+    return [
+        child_id
+        for child_id in [2 * process_id + 1, 2 * process_id + 2]
+        if child_id <= WORKER_COUNT
+    ]
 
 
-class Manager(Process):
-    def start(self):
-        ProcessFramework.output = 0
-        bite_size = 5
-        input_len = len(ProcessFramework.input)
-        for window_start in range(0, input_len, bite_size):
-            window_end = min(window_start + bite_size, input_len)
-            msg: Msg = self.get_one_msg()
-            self.send_msg(msg.src, Msg.build_msg(f"{window_start}~{window_end}"))
-        for _ in range(WORKER_COUNT):
-            msg = self.get_one_msg()
-            self.send_msg(msg.src, Msg.build_msg(DONE))
-        self.send_msg(GUARD_ID, Msg.build_msg(DONE))
-        self.complete()
+def get_parent_id(process_id: int) -> int:
+    return (process_id - 1) // 2
+
+
+def count_ones(window_ref: InputRef) -> int:
+    window = ProcessFramework.input.as_array("uint8", window_ref)
+    return int(np.count_nonzero(window == ONE))
 
 
-class Guard(Process):
-    def start(self):
-        self.owner = None
-        while True:
+class Manager(Process):
+    def start(self, msg: str = None):
+        window_refs = [
+            window_ref
+            for window_ref in ProcessFramework.input.split(
+                WINDOWS_PER_WORKER * WORKER_COUNT
+            )
+            if window_ref.length > 0
+        ]
+        window_refs.reverse()
+        child_ids = get_child_ids(self.get_id())
+        done_count = 0
+        one_count = 0
+        summed_child_count = 0
+        while done_count < WORKER_COUNT or summed_child_count < len(child_ids):
             msg = self.get_one_msg()
-            if msg.content and msg.content == DONE:
-                break
+            if msg.content.startswith(SUM):
+                one_count += int(msg.content.split("~")[1])
+                summed_child_count += 1
+            elif window_refs:
+                self.send_msg(msg.src, Msg.build_msg(window_refs.pop().to_str()))
             else:
-                if not self.owner:
-                    self.owner = msg.src
-                    self.send_msg(msg.src, Msg.build_msg("TRUE"))
-                elif self.owner == msg.src:
-                    self.owner = None
-                else:
-                    self.send_msg(msg.src, Msg.build_msg("FALSE"))
+                self.send_msg(msg.src, Msg.build_msg(DONE))
+                done_count += 1
+        ProcessFramework.output = one_count
         self.complete()
 
 
 class Worker(Process):
-    def _process_window(self, bounds: tuple):
-        input_window = ProcessFramework.input[bounds[0] : bounds[1]]
+    def start(self, msg: str = None):
+        child_ids = get_child_ids(self.get_id())
         one_count = 0
-        for char in input_window:
-            if char == "1":
-                one_count += 1
-
-        holding_lock = False
-        while not holding_lock:
-            self.send_msg(GUARD_ID, Msg.build_msg())
-            msg = self.get_one_msg()
-            assert msg.src == GUARD_ID
-            if msg.content == "TRUE":
-                holding_lock = True
-        ProcessFramework.output += one_count
-        self.send_msg(GUARD_ID, Msg.build_msg())
-
-    def start(self):
-        while True:
-            self.send_msg(MANAGER_ID, Msg.build_msg())
+        summed_child_count = 0
+        done = False
+        self.send_msg(MANAGER_ID, Msg.build_msg(REQUEST))
+        while not done or summed_child_count < len(child_ids):
             msg = self.get_one_msg()
             msg_content: str = msg.content
-            if msg.content == DONE:
-                self.complete()
-                break
+            if msg_content.startswith(SUM):
+                # Children can finish before this worker's last window
+                one_count += int(msg_content.split("~")[1])
+                summed_child_count += 1
+            elif msg_content == DONE:
+                done = True
             elif msg_content.find("~") != -1:
-                range_list = msg_content.split("~")
-                self._process_window((int(range_list[0]), int(range_list[1])))
+                one_count += count_ones(InputRef.from_str(msg_content))
+                self.send_msg(MANAGER_ID, Msg.build_msg(REQUEST))
             else:
                 raise ValueError(f"[DEBUG] Unrecognized message: {msg.content}")
+        self.send_msg(get_parent_id(self.get_id()), Msg.build_msg(f"{SUM}~{one_count}"))
+        self.complete()
 
 
 if __name__ == "__main__":
     system_input = "000101111000010010000101111000010010"
     print(f"Input length: {len(system_input)}")
-    processes = [
-        Manager,
-        Guard,
-        Worker,
-        Worker,
-    ]
+    processes = [Manager] + [Worker] * WORKER_COUNT
     DistributedSystem.define_faults(0.0, 0, float("inf"))
     start_time = time.time()
-    DistributedSystem.process_input(system_input, processes)
-    output = DistributedSystem.wait_for_completion()
+    with SharedInput.from_bytes(system_input) as shared_input:
+        DistributedSystem.process_input(shared_input, processes)
+        output = DistributedSystem.wait_for_completion()
     print(f"Runtime: {time.time() - start_time}")
 
     correct_count = 0
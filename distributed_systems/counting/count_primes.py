@@ -1,35 +1,237 @@
 """
 Goal: Have threads keep each other alive while counting primes
+
+Two ways to split the count:
+    FirstCounter -> a ring of counters, each owns BITE_SIZE numbers and keeps
+        the next one alive. The slowest range sets the runtime
+    PrimeScheduler -> StealingCounters pull work units from a scheduler. Units
+        are sized from the measured cost per number, shrink as the work runs out,
+        and an idle counter takes the back half of the slowest peer's unit.
+        The scheduler revives dead counters, which resume from their last
+        checkpoint, and hands a unit out again once its lease runs out. The
+        first counter revives the scheduler
+
+PrimeScheduler.method:
+    SIEVE -> counters sieve all of [0, input)
+    LUCY -> the scheduler runs Lucy_Hedgehog's table up to input^(1/3) while
+        counters sieve [0, input^(2/3)) for the pi(x // p) terms left past it,
+        about input^(2/3) work in all
+
+Usage:
+    python count_primes.py -> the ring counts up to 128834
+    python count_primes.py --scheduler -> PrimeScheduler counts up to 200M
 """
 
 from distributed_systems.framework import ProcessFramework, DistributedSystem
 from distributed_systems.base_process import Msg, Process
+from distributed_systems.async_process import AsyncProcess
+from distributed_systems.failure_detector import PhiAccrualDetector
 
+from threading import Thread
+import asyncio
 import time
 import math
 import os
 import json
+import sys
+
+import numpy as np
 
 BITE_SIZE = 30000
+# A revived counter never saw requests sent to its previous instance, so ask again
+# once a request has gone unanswered this long
+REQUEST_TIMEOUT = 5
+# Numbers sieved at a time, sized so a segment stays in cache
+SEGMENT_SIZE = 1 << 18
+# Units are multiples of UNIT_GRAIN numbers, a stolen unit is cut on this grid so
+# its owner can report the count up to the cut without counting again
+UNIT_GRAIN = SEGMENT_SIZE
+# Seconds a unit should take at the measured cost per number
+TARGET_UNIT_TIME = 0.5
+# A unit not reported after LEASE_FACTOR times its expected time, and at least
+# REQUEST_TIMEOUT, is assumed lost and handed out again
+LEASE_FACTOR = 4
+# Weight of the newest cost measurement in the running average
+COST_SMOOTHING = 0.3
+# Seconds a counter waits before claiming again when every unit is taken
+CLAIM_PAUSE = 0.05
+# Most numbers a counter counts between checkpoints, bounding what a revived
+# counter counts again when the job defines a checkpoint store
+CHECKPOINT_INTERVAL = 1 << 20
+# Checkpoints per range or unit when that is fewer numbers apart, so small
+# ranges are checkpointed partway through too
+CHECKPOINTS_PER_RANGE = 4
+
+SIEVE = "SIEVE"
+LUCY = "LUCY"
+
+# (limit, every prime up to limit), grown on demand and shared by every counter
+# in this OS process. One tuple, so a thread never pairs one limit with another
+# thread's primes
+_base_primes: tuple = (1, np.array([], dtype=np.int64))
+
+
+def get_checkpoint_interval(range_size: int) -> int:
+    """Numbers counted between checkpoints of a range of range_size numbers"""
+    return max(min(CHECKPOINT_INTERVAL, range_size // CHECKPOINTS_PER_RANGE), 1)
 
 
 def check_prime(num):
+    """Trial division, for checking single numbers"""
     if num <= 1:
         return False
-    for i in range(2, int(num / 2) + 1):
+    for i in range(2, math.isqrt(num) + 1):
         if (num % i) == 0:
             return False
     return True
 
 
+def get_base_primes(limit: int) -> np.ndarray:
+    """Every prime up to at least limit"""
+    global _base_primes
+    base_primes_limit, base_primes = _base_primes
+    if limit > base_primes_limit:
+        # Grow geometrically so rising ranges do not sieve again every time
+        new_limit = max(limit, 2 * base_primes_limit)
+        is_prime = np.ones(new_limit + 1, dtype=bool)
+        is_prime[:2] = False
+        for num in range(2, math.isqrt(new_limit) + 1):
+            if is_prime[num]:
+                is_prime[num * num :: num] = False
+        base_primes = np.flatnonzero(is_prime)
+        _base_primes = (new_limit, base_primes)
+    return base_primes
+
+
+def sieve_segments(range_start, range_end):
+    """
+    Yields (segment_start, is_prime) over [range_start, range_end) by segmented
+    Sieve of Eratosthenes. is_prime is reused, read it before the next segment
+    """
+    range_start = max(range_start, 2)
+    if range_end <= range_start:
+        return
+    base_primes = get_base_primes(math.isqrt(range_end - 1))
+    is_prime = np.empty(SEGMENT_SIZE, dtype=bool)
+    for segment_start in range(range_start, range_end, SEGMENT_SIZE):
+        segment_end = min(segment_start + SEGMENT_SIZE, range_end)
+        segment = is_prime[: segment_end - segment_start]
+        segment[:] = True
+        for prime in base_primes:
+            prime = int(prime)
+            if prime * prime >= segment_end:
+                break
+            # Smaller multiples were crossed off by smaller primes
+            first_multiple = max(prime * prime, -(-segment_start // prime) * prime)
+            segment[first_multiple - segment_start :: prime] = False
+        yield segment_start, segment
+
+
 def count_primes(range_start, range_end):
+    """Primes in [range_start, range_end)"""
     answer = 0
-    for input_value in range(range_start, range_end):
-        if check_prime(input_value):
-            answer += 1
+    for _, segment in sieve_segments(range_start, range_end):
+        answer += int(np.count_nonzero(segment))
     return answer
 
 
+def count_primes_at(range_start, range_end, points: np.ndarray) -> tuple:
+    """
+    (primes in [range_start, range_end), sum over points of primes in
+    [range_start, point]), points sorted and inside the range
+    """
+    answer = 0
+    points_total = 0
+    for segment_start, segment in sieve_segments(range_start, range_end):
+        segment_points = points[
+            np.searchsorted(points, segment_start) : np.searchsorted(
+                points, segment_start + len(segment)
+            )
+        ]
+        if len(segment_points):
+            # Primes in [segment_start, segment_start + idx], by idx
+            segment_prefix = np.cumsum(segment, dtype=np.int64)
+            points_total += int(segment_prefix[segment_points - segment_start].sum())
+            points_total += answer * len(segment_points)
+        answer += int(np.count_nonzero(segment))
+    return answer, points_total
+
+
+def icbrt(num: int) -> int:
+    """Largest integer whose cube is at most num"""
+    root = round(num ** (1 / 3))
+    while root**3 > num:
+        root -= 1
+    while (root + 1) ** 3 <= num:
+        root += 1
+    return root
+
+
+def count_phi(x: int, prime_limit: int) -> int:
+    """
+    Numbers in [2, x] that are prime or have no prime factor up to prime_limit
+
+    Lucy_Hedgehog's table of S(v) over the values v = x // i, started at
+    S(v) = v - 1 and crossed off one prime at a time, stopped after prime_limit
+    """
+    sqrt_x = math.isqrt(x)
+    # small[v] -> S(v), large[i] -> S(x // i), both for 1 <= v, i <= sqrt_x
+    small = np.arange(-1, sqrt_x, dtype=np.int64)
+    small[0] = 0
+    large_values = np.zeros(sqrt_x + 1, dtype=np.int64)
+    large_values[1:] = x // np.arange(1, sqrt_x + 1, dtype=np.int64)
+    large = large_values - 1
+    for prime in range(2, min(prime_limit, sqrt_x) + 1):
+        if small[prime] == small[prime - 1]:
+            # Crossed off, not a prime
+            continue
+        smaller_prime_count = small[prime - 1]
+        prime_square = prime * prime
+        # S(v) -= S(v // prime) - S(prime - 1) for every v >= prime^2. Each right
+        # hand side is evaluated before its update, so reads see the last round
+        large_end = min(sqrt_x, x // prime_square)
+        # x // i // prime is x // (i * prime), in large while i * prime <= sqrt_x
+        large_split = min(large_end, sqrt_x // prime)
+        large[1 : large_split + 1] -= (
+            large[prime : large_split * prime + 1 : prime] - smaller_prime_count
+        )
+        # Large entries read small ones, so update them before small
+        large[large_split + 1 : large_end + 1] -= (
+            small[large_values[large_split + 1 : large_end + 1] // prime]
+            - smaller_prime_count
+        )
+        values = np.arange(prime_square, sqrt_x + 1, dtype=np.int64)
+        small[prime_square:] -= small[values // prime] - smaller_prime_count
+    return int(large[1]) if x > 1 else 0
+
+
+def get_p2_terms(x: int) -> tuple:
+    """
+    Sorted x // p and the sum of pi(p) - 1 over primes x^(1/3) < p <= x^(1/2),
+    so that pi(x) = count_phi(x, icbrt(x)) - sum of pi(point) + that sum
+
+    Past x^(1/3), x // p < p^2, so the rest of Lucy's rounds only take away
+    pi(x // p) - pi(p - 1) each, and pi(x // p) needs a sieve up to x^(2/3)
+    """
+    base_primes = get_base_primes(math.isqrt(x))
+    first_idx = int(np.searchsorted(base_primes, icbrt(x), side="right"))
+    end_idx = int(np.searchsorted(base_primes, math.isqrt(x), side="right"))
+    # pi(p) - 1 of the prime at idx is idx
+    prime_count_total = (first_idx + end_idx - 1) * (end_idx - first_idx) // 2
+    points = (x // base_primes[first_idx:end_idx])[::-1]
+    return points, prime_count_total
+
+
+def count_primes_lucy(x: int) -> int:
+    """pi(x) in about x^(2/3) time, for inputs too large to enumerate"""
+    if x < 2:
+        return 0
+    points, prime_count_total = get_p2_terms(x)
+    sieve_end = int(points[-1]) + 1 if len(points) else 0
+    _, points_total = count_primes_at(0, sieve_end, points)
+    return count_phi(x, icbrt(x)) - points_total + prime_count_total
+
+
 class StartupMsg:
     def __init__(self, parent_counter: int, process_start: int, revival: str = "FALSE"):
         self.parent_counter: int = parent_counter
@@ -49,7 +251,31 @@ class StartupMsg:
         )
 
 
-class Counter(Process):
+class CounterStep:
+    """What a counter does after a message: pause, send, then maybe complete"""
+
+    def __init__(self, sends: list = None, pause: float = 0, done: bool = False):
+        self.sends: list = sends or []
+        self.pause: float = pause
+        self.done: bool = done
+
+
+class CounterLogic:
+    """
+    Counter protocol shared by the threaded and asyncio counters
+
+    The protocol never touches the transport itself: begin_counting and handle_msg
+    return a CounterStep that each runtime's start loop carries out
+    """
+
+    def get_counter_def(self) -> type:
+        """Process definition for the counters this one starts and revives"""
+        raise NotImplementedError()
+
+    def get_time(self) -> float:
+        """Clock the runtime's timeouts run on"""
+        raise NotImplementedError()
+
     def initialize_state(self):
         self.counter_type: str = None
         self.revival: bool = None
@@ -57,6 +283,9 @@ class Counter(Process):
         self.process_end: int = None
         self.send_heartbeats_to: int = None
         self.get_heartbeats_from: int = None
+        self.prime_count: int = None
+        self.final_prime_count: int = None
+        self.request_time: float = None
 
     def process_startup_msg(self, startup_msg_str: str = None) -> bool:
         startup_msg: StartupMsg = StartupMsg.from_json(startup_msg_str)
@@ -78,60 +307,102 @@ class Counter(Process):
             if not self.revival:
                 regular_startup_msg = StartupMsg(self.get_id(), self.process_end)
                 self.new_process(
-                    self.get_heartbeats_from, Counter, regular_startup_msg.to_json()
+                    self.get_heartbeats_from,
+                    self.get_counter_def(),
+                    regular_startup_msg.to_json(),
                 )
             revival_startup_msg = StartupMsg(self.get_id(), self.process_end, "TRUE")
         self.keep_process_alive(
-            self.get_heartbeats_from, Counter, revival_startup_msg.to_json()
+            self.get_heartbeats_from,
+            self.get_counter_def(),
+            revival_startup_msg.to_json(),
         )
 
-    def start(self, startup_msg_str: str = None):
+    def begin_counting(self, startup_msg_str: str = None) -> CounterStep:
         self.initialize_state()
         if self.process_startup_msg(startup_msg_str):
-            self.complete()
-            return
+            return CounterStep(done=True)
 
         self.send_heartbeats_to_process(self.send_heartbeats_to)
 
         self.keep_child_counter_alive()
 
-        prime_count = count_primes(self.process_start, self.process_end)
+        self.prime_count = self.count_range()
         if self.get_heartbeats_from == 0:
             # Last counter
-            final_prime_count = prime_count
-        else:
-            # All counters but last
-            final_prime_count = None
-        while True:
-            if not final_prime_count:
-                self.send_msg(self.get_heartbeats_from, Msg.build_msg("REQUEST"))
+            self.final_prime_count = self.prime_count
+        return self._request_step()
 
-            msg = self.get_one_msg()
-            if msg.content == "DONE":
-                if self.get_heartbeats_from != 0:
-                    self.send_msg(self.get_heartbeats_from, Msg.build_msg("DONE"))
-                self.complete()
-                return
-            elif msg.content.isdigit():
-                final_prime_count = int(msg.content) + prime_count
-                if self.get_id() == 0:
-                    ProcessFramework.output = final_prime_count
-                    self.send_msg(self.get_heartbeats_from, Msg.build_msg("DONE"))
-                    self.complete()
-                    return
-            elif msg.content == "REQUEST":
-                if final_prime_count:
-                    self.send_msg(msg.src, Msg.build_msg(f"{final_prime_count}"))
-                else:
-                    self.send_msg(msg.src, Msg.build_msg("WAIT"))
-            elif msg.content == "WAIT":
-                time.sleep(1)
+    def count_range(self) -> int:
+        """Primes in [process_start, process_end), from the last checkpoint on"""
+        checkpoint_name = f"{self.process_start}-{self.process_end}"
+        checkpoint_interval = get_checkpoint_interval(
+            self.process_end - self.process_start
+        )
+        position = self.process_start
+        prime_count = 0
+        checkpoint = self.load_checkpoint(checkpoint_name)
+        if checkpoint is not None:
+            position, prime_count = checkpoint["position"], checkpoint["prime_count"]
+            print(
+                f"[STATUS] Process {self.get_id()} resuming "
+                f"[{self.process_start}, {self.process_end}) at {position}"
+            )
+        while position < self.process_end:
+            chunk_end = min(position + checkpoint_interval, self.process_end)
+            prime_count += count_primes(position, chunk_end)
+            position = chunk_end
+            self.save_checkpoint(
+                checkpoint_name, {"position": position, "prime_count": prime_count}
+            )
+        return prime_count
+
+    def handle_msg(self, msg: Msg = None) -> CounterStep:
+        """msg -> None when get_one_msg timed out"""
+        if msg is None:
+            self.request_time = None
+            return self._request_step()
+        elif msg.content == "DONE":
+            if self.get_heartbeats_from != 0:
+                return CounterStep([(self.get_heartbeats_from, "DONE")], done=True)
+            return CounterStep(done=True)
+        elif msg.content.isdigit():
+            self.final_prime_count = int(msg.content) + self.prime_count
+            if self.get_id() == 0:
+                ProcessFramework.output = self.final_prime_count
+                return CounterStep([(self.get_heartbeats_from, "DONE")], done=True)
+        elif msg.content == "REQUEST":
+            if self.final_prime_count is not None:
+                reply = f"{self.final_prime_count}"
+            else:
+                reply = "WAIT"
+            return self._request_step([(msg.src, reply)])
+        elif msg.content == "WAIT":
+            self.request_time = None
+            return self._request_step(pause=1)
+        return self._request_step()
+
+    def _request_step(self, sends: list = None, pause: float = 0) -> CounterStep:
+        """
+        Keeps one REQUEST outstanding until the count arrives
 
+        Requesting again on every message would answer each reply with another
+        request, and the WAITs pile up faster than their pauses drain them
+        """
+        sends = sends or []
+        if self.final_prime_count is None and (
+            self.request_time is None
+            or self.get_time() - self.request_time >= REQUEST_TIMEOUT
+        ):
+            sends.append((self.get_heartbeats_from, "REQUEST"))
+            self.request_time = self.get_time() + pause
+        return CounterStep(sends, pause)
 
-class FirstCounter(Counter):
+
+class FirstCounterLogic(CounterLogic):
     def process_startup_msg(self, startup_msg_str: str = None) -> bool:
         if self.input <= BITE_SIZE:
-            self.output = count_primes(0, self.input)
+            ProcessFramework.output = count_primes(0, self.input)
             return True
         self.revival = False
         self.process_start = 0
@@ -139,19 +410,459 @@ class FirstCounter(Counter):
         return False
 
 
+class Counter(CounterLogic, Process):
+    def get_counter_def(self) -> type:
+        return Counter
+
+    def get_time(self) -> float:
+        return time.time()
+
+    def start(self, startup_msg_str: str = None):
+        step = self.begin_counting(startup_msg_str)
+        while True:
+            if step.pause:
+                time.sleep(step.pause)
+            for target, content in step.sends:
+                self.send_msg(target, Msg.build_msg(content))
+            if step.done:
+                self.complete()
+                return
+            step = self.handle_msg(self.get_one_msg(REQUEST_TIMEOUT))
+
+
+class FirstCounter(FirstCounterLogic, Counter):
+    pass
+
+
+class AsyncCounter(CounterLogic, AsyncProcess):
+    """Same protocol as Counter, for AsyncBackend and SimulationBackend"""
+
+    def get_counter_def(self) -> type:
+        return AsyncCounter
+
+    def get_time(self) -> float:
+        return asyncio.get_running_loop().time()
+
+    async def start(self, startup_msg_str: str = None):
+        step = self.begin_counting(startup_msg_str)
+        while True:
+            if step.pause:
+                await asyncio.sleep(step.pause)
+            for target, content in step.sends:
+                await self.send_msg(target, Msg.build_msg(content))
+            if step.done:
+                self.complete()
+                return
+            step = self.handle_msg(await self.get_one_msg(REQUEST_TIMEOUT))
+
+
+class AsyncFirstCounter(FirstCounterLogic, AsyncCounter):
+    pass
+
+
+SCHEDULER_ID = 0
+
+
+class UnitLease:
+    """Numbers [start, end) handed to a counter at start_time"""
+
+    def __init__(self, start: int, end: int, start_time: float):
+        self.start: int = start
+        self.end: int = end
+        self.start_time: float = start_time
+
+
+def smooth_cost(cost: float, new_cost: float) -> float:
+    if cost is None:
+        return new_cost
+    return COST_SMOOTHING * new_cost + (1 - COST_SMOOTHING) * cost
+
+
+class PrimeScheduler(Process):
+    """
+    Hands out units of [0, input) to StealingCounters 1..worker_count
+
+    Messages (fields joined by ~):
+        counter -> scheduler: CLAIM, RESULT start end count points_total cost,
+            RESULTS json
+        scheduler -> counter: UNIT start end, WAIT, STEAL start cut, RECOVER, DONE
+
+    A unit's points_total sums, over the LUCY points inside it, the primes from
+    the unit's start up to the point. Dead counters are revived and resume their
+    unit from their last checkpoint
+    """
+
+    worker_count: int = 4
+    method: str = SIEVE
+
+    def get_counter_def(self) -> type:
+        """Process definition for the counters this scheduler starts and revives"""
+        return StealingCounter
+
+    def start(self, msg: str = None):
+        sieve_end = self.input
+        if self.method == LUCY:
+            # Primes below input, as SIEVE counts them
+            x = max(self.input - 1, 0)
+            self.points, self.prime_count_total = get_p2_terms(x)
+            sieve_end = int(self.points[-1]) + 1 if len(self.points) else 0
+            # Runs beside the message loop, which only hands out units
+            self.phi_count: int = None
+            phi_thread = Thread(target=self.count_phi_part, args=[x])
+            phi_thread.start()
+        # Sorted [start, end) ranges whose count is not in prime_count yet
+        self.uncovered: list = [[0, sieve_end]] if sieve_end > 0 else []
+        # [start, end, count, points_total] of every unit counted
+        self.counted_units: list = []
+        self.prime_count: int = 0
+        self.leases: dict[int, UnitLease] = {}
+        # Seconds per number, over every counter and per counter
+        self.cost: float = None
+        self.worker_costs: dict[int, float] = {}
+
+        worker_ids = range(1, self.worker_count + 1)
+        if msg == "REVIVAL":
+            # Counts reported to the previous instance died with it
+            for worker_id in worker_ids:
+                self.send_msg_async(worker_id, Msg.build_msg("RECOVER"))
+        else:
+            for worker_id in worker_ids:
+                self.new_process(worker_id, self.get_counter_def(), self.method)
+        for worker_id in worker_ids:
+            self.keep_process_alive(worker_id, self.get_counter_def(), self.method)
+        self.send_heartbeats_to_process(1)
+
+        while self.uncovered:
+            msg = self.get_one_msg(CLAIM_PAUSE)
+            if msg is not None:
+                self.handle_msg(msg)
+            self.expire_leases()
+
+        if self.method == LUCY:
+            phi_thread.join()
+            ProcessFramework.output = (
+                self.phi_count - self.get_points_total() + self.prime_count_total
+            )
+        else:
+            ProcessFramework.output = self.prime_count
+        # Not waited on, a dead counter never acknowledges
+        for worker_id in worker_ids:
+            self.send_msg_async(worker_id, Msg.build_msg("DONE"))
+        self.complete()
+
+    def handle_msg(self, msg: Msg):
+        fields = msg.content.split("~")
+        if fields[0] == "CLAIM":
+            # A counter only claims once its previous unit is reported or abandoned
+            self.leases.pop(msg.src, None)
+            self.send_msg_async(msg.src, Msg.build_msg(self.assign_unit(msg.src)))
+        elif fields[0] == "RESULT":
+            start, end, count, points_total = map(int, fields[1:5])
+            lease = self.leases.get(msg.src)
+            if lease is not None and lease.start == start:
+                del self.leases[msg.src]
+            self.cost = smooth_cost(self.cost, float(fields[5]))
+            self.worker_costs[msg.src] = smooth_cost(
+                self.worker_costs.get(msg.src), float(fields[5])
+            )
+            self.add_count(start, end, count, points_total)
+        elif fields[0] == "RESULTS":
+            for start, end, count, points_total in json.loads(fields[1]):
+                self.add_count(start, end, count, points_total)
+
+    def count_phi_part(self, x: int):
+        self.phi_count = count_phi(x, icbrt(x)) if x >= 2 else 0
+
+    def get_points_total(self) -> int:
+        """Sum of pi(point) over the LUCY points, once every unit is counted"""
+        points_total = 0
+        primes_below = 0
+        for start, end, count, unit_points_total in sorted(self.counted_units):
+            point_count = np.searchsorted(self.points, end) - np.searchsorted(
+                self.points, start
+            )
+            points_total += unit_points_total + int(point_count) * primes_below
+            primes_below += count
+        return points_total
+
+    def add_count(
+        self, start: int, end: int, count: int, points_total: int = 0
+    ) -> bool:
+        """
+        Adds count unless part of [start, end) is already counted. A unit counted
+        twice, or cut differently by a revived scheduler, must not count twice
+        """
+        for range_idx, (range_start, range_end) in enumerate(self.uncovered):
+            if range_start <= start and end <= range_end:
+                self.uncovered[range_idx : range_idx + 1] = [
+                    [remainder_start, remainder_end]
+                    for remainder_start, remainder_end in [
+                        (range_start, start),
+                        (end, range_end),
+                    ]
+                    if remainder_start < remainder_end
+                ]
+                self.prime_count += count
+                self.counted_units.append([start, end, count, points_total])
+                return True
+        return False
+
+    def find_pending(self) -> tuple:
+        """First (start, end) run that is neither counted nor leased, None if none"""
+        leased = sorted((lease.start, lease.end) for lease in self.leases.values())
+        for range_start, range_end in self.uncovered:
+            pending_start = range_start
+            for leased_start, leased_end in leased:
+                if leased_end <= pending_start:
+                    continue
+                if leased_start >= range_end:
+                    break
+                if leased_start > pending_start:
+                    return pending_start, leased_start
+                pending_start = leased_end
+            if pending_start < range_end:
+                return pending_start, range_end
+        return None
+
+    def get_unit_size(self) -> int:
+        remaining = sum(
+            range_end - range_start for range_start, range_end in self.uncovered
+        )
+        # Shrinks as the work runs out, so the last units finish close together
+        unit_size = remaining // (2 * self.worker_count)
+        if self.cost:
+            unit_size = min(unit_size, int(TARGET_UNIT_TIME / self.cost))
+        else:
+            # One grain each until a cost is measured
+            unit_size = UNIT_GRAIN
+        return max(UNIT_GRAIN, unit_size // UNIT_GRAIN * UNIT_GRAIN)
+
+    def assign_unit(self, worker_id: int) -> str:
+        now = time.monotonic()
+        pending = self.find_pending()
+        if pending is not None:
+            start, end = pending
+            end = min(end, start + self.get_unit_size())
+        else:
+            stolen = self.steal_unit(worker_id, now)
+            if stolen is None:
+                return "WAIT"
+            start, end = stolen
+        self.leases[worker_id] = UnitLease(start, end, now)
+        return f"UNIT~{start}~{end}"
+
+    def steal_unit(self, thief_id: int, now: float) -> tuple:
+        """
+        Cuts the leased unit with the most time left in two on the grain grid and
+        returns the back half, None if no unit has a whole grain left past its cut
+        """
+        best_steal = None
+        for owner_id, lease in self.leases.items():
+            owner_cost = self.worker_costs.get(owner_id, self.cost)
+            progress = lease.start
+            if owner_cost:
+                progress += int((now - lease.start_time) / owner_cost)
+            # First grid point past halfway through what the owner has left
+            half_way = (min(progress, lease.end) + lease.end) // 2
+            cut = lease.start + -(-(half_way - lease.start) // UNIT_GRAIN) * UNIT_GRAIN
+            if lease.end - cut < UNIT_GRAIN:
+                continue
+            time_left = (lease.end - cut) * (owner_cost or 1)
+            if best_steal is None or time_left > best_steal[0]:
+                best_steal = (time_left, owner_id, cut)
+        if best_steal is None:
+            return None
+
+        _, owner_id, cut = best_steal
+        lease = self.leases[owner_id]
+        stolen = (cut, lease.end)
+        lease.end = cut
+        self.send_msg_async(owner_id, Msg.build_msg(f"STEAL~{lease.start}~{cut}"))
+        print(
+            f"[STATUS] Process {thief_id} stealing [{stolen[0]}, {stolen[1]}) "
+            f"from process {owner_id}"
+        )
+        return stolen
+
+    def expire_leases(self):
+        now = time.monotonic()
+        for worker_id, lease in list(self.leases.items()):
+            worker_cost = self.worker_costs.get(worker_id, self.cost) or 0
+            lease_time = max(
+                REQUEST_TIMEOUT, LEASE_FACTOR * (lease.end - lease.start) * worker_cost
+            )
+            if now - lease.start_time > lease_time:
+                print(
+                    f"[STATUS] Lease of process {worker_id} on "
+                    f"[{lease.start}, {lease.end}) expired"
+                )
+                del self.leases[worker_id]
+
+
+class StealingCounter(Process):
+    def start(self, msg: str = None):
+        """msg -> the scheduler's method"""
+        self.points: np.ndarray = np.empty(0, dtype=np.int64)
+        if msg == LUCY:
+            self.points, _ = get_p2_terms(max(self.input - 1, 0))
+        # [start, end, count, points_total] of every unit counted, for a revived
+        # scheduler
+        self.counted_units: list = []
+        self.unit_start: int = None
+        self.unit_end: int = None
+        self.done: bool = False
+        if self.get_id() == 1:
+            self.keep_process_alive(SCHEDULER_ID, PrimeScheduler, "REVIVAL")
+        self.send_heartbeats_to_process(SCHEDULER_ID)
+        # Counts depend on the method through points_total
+        self.checkpoint_name: str = f"{msg}-{self.input}"
+        checkpoint = self.load_checkpoint(self.checkpoint_name)
+        if checkpoint is not None:
+            self.resume(checkpoint)
+
+        while not self.done:
+            unit = self.claim_unit()
+            if unit is not None:
+                self.count_unit(*unit)
+        self.complete()
+
+    def resume(self, checkpoint: dict):
+        """
+        Reports what a previous instance counted, including the part of its unit
+        up to the last checkpoint, so the scheduler hands out only the rest
+        """
+        self.counted_units = checkpoint["counted_units"]
+        if checkpoint["unit"] is not None:
+            start, position, _, _ = checkpoint["unit"]
+            print(
+                f"[STATUS] Process {self.get_id()} resuming unit at {start} "
+                f"from {position}"
+            )
+            self.counted_units.append(checkpoint["unit"])
+            self.save_progress()
+        if self.counted_units:
+            self.send_msg(
+                SCHEDULER_ID,
+                Msg.build_msg(f"RESULTS~{json.dumps(self.counted_units)}"),
+            )
+
+    def save_progress(self, unit: list = None):
+        """unit -> [start, position, count, points_total] of the unit being counted"""
+        self.save_checkpoint(
+            self.checkpoint_name, {"counted_units": self.counted_units, "unit": unit}
+        )
+
+    def claim_unit(self) -> tuple:
+        """(start, end) of the next unit, None to claim again"""
+        self.send_msg(SCHEDULER_ID, Msg.build_msg("CLAIM"))
+        while not self.done:
+            msg = self.get_one_msg(REQUEST_TIMEOUT)
+            if msg is None:
+                # The claim died with the scheduler
+                return None
+            fields = msg.content.split("~")
+            if fields[0] == "UNIT":
+                return int(fields[1]), int(fields[2])
+            if fields[0] == "WAIT":
+                time.sleep(CLAIM_PAUSE)
+                return None
+            self.handle_control_msg(fields)
+        return None
+
+    def handle_control_msg(self, fields: list):
+        if fields[0] == "DONE":
+            self.done = True
+        elif fields[0] == "RECOVER":
+            self.send_msg(
+                SCHEDULER_ID,
+                Msg.build_msg(f"RESULTS~{json.dumps(self.counted_units)}"),
+            )
+        elif fields[0] == "STEAL":
+            # Ignored once the unit is reported, the scheduler keeps the first count
+            if int(fields[1]) == self.unit_start and int(fields[2]) < self.unit_end:
+                self.unit_end = int(fields[2])
+
+    def count_unit(self, start: int, end: int):
+        self.unit_start = start
+        self.unit_end = end
+        # (count, points_total) of [start, start + grain_idx * UNIT_GRAIN), by
+        # grain_idx
+        grain_counts = [(0, 0)]
+        checkpoint_interval = get_checkpoint_interval(end - start)
+        checkpoint_position = start
+        start_time = time.perf_counter()
+        grain_start = start
+        while grain_start < self.unit_end:
+            grain_end = min(grain_start + UNIT_GRAIN, self.unit_end)
+            grain_points = self.points[
+                np.searchsorted(self.points, grain_start) : np.searchsorted(
+                    self.points, grain_end
+                )
+            ]
+            grain_count, grain_points_total = count_primes_at(
+                grain_start, grain_end, grain_points
+            )
+            count, points_total = grain_counts[-1]
+            grain_counts.append(
+                (
+                    count + grain_count,
+                    points_total + grain_points_total + count * len(grain_points),
+                )
+            )
+            grain_start = grain_end
+            # Steals land between grains
+            msg = self.get_one_msg(0)
+            while msg is not None:
+                self.handle_control_msg(msg.content.split("~"))
+                if self.done:
+                    return
+                msg = self.get_one_msg(0)
+            if (
+                grain_start - checkpoint_position >= checkpoint_interval
+                and grain_start < self.unit_end
+            ):
+                self.save_progress([start, grain_start, *grain_counts[-1]])
+                checkpoint_position = grain_start
+        cost = (time.perf_counter() - start_time) / (grain_start - start)
+
+        # A cut behind grain_start is on the grid, so its count is in grain_counts
+        end = self.unit_end
+        count, points_total = grain_counts[-(-(end - start) // UNIT_GRAIN)]
+        self.unit_start = self.unit_end = None
+        self.counted_units.append([start, end, count, points_total])
+        self.save_progress()
+        self.send_msg(
+            SCHEDULER_ID,
+            Msg.build_msg(f"RESULT~{start}~{end}~{count}~{points_total}~{cost}"),
+        )
+
+
 if __name__ == "__main__":
-    system_input = 128834
+    # --scheduler runs the long PrimeScheduler demo instead of the ring
+    if "--scheduler" in sys.argv[1:]:
+        system_input = 200_000_000
+        correct_count = 11078937
+        processes = [PrimeScheduler]
+        # The job must still be running when the kill lands
+        kill_wait_time = 1
+    else:
+        system_input = 128834
+        correct_count = 12059
+        processes = [FirstCounter]
+        kill_wait_time = 5
     print(f"[SETUP] Input length: {system_input}")
-    processes = [FirstCounter]
     start_time = time.time()
     DistributedSystem.define_faults(
-        msg_drop_prop=0.0, max_process_kill_count=1, process_kill_wait_time=5
+        msg_drop_prop=0.0,
+        max_process_kill_count=1,
+        process_kill_wait_time=kill_wait_time,
     )
+    # Revive a killed process a few heartbeats after it goes quiet, not after 5s
+    DistributedSystem.define_failure_detection(PhiAccrualDetector)
     DistributedSystem.process_input(system_input, processes)
     output = DistributedSystem.wait_for_completion()
     print(f"[RESULT] Runtime: {time.time() - start_time}")
 
-    correct_count = 12059
     print(f"[RESULT] Correct: {correct_count}")
     print(f"[RESULT] Actual: {output}")
     if output == correct_count:
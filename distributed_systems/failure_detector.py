@@ -0,0 +1,196 @@
+"""
+Goal: Decide when a monitored process is dead from when its frames arrive
+
+Usage:
+    DistributedSystem.define_failure_detection(PhiAccrualDetector) before process_input,
+    or partial(PhiAccrualDetector, threshold=...) to tune it.
+    keep_process_alive then builds one detector per monitored process
+
+Notes:
+    - Detectors take the time as an argument, so threads, asyncio and virtual
+      time all share them
+    - A detector only says when to suspect the process, the caller schedules one
+      check for that time and asks again if something arrived in the meantime
+"""
+
+from abc import ABC, abstractmethod
+from collections import deque
+from statistics import NormalDist
+from threading import Lock
+import math
+
+
+class FailureDetector(ABC):
+    def __init__(self, wait_time: float, heartbeat_interval: float):
+        """
+        wait_time -> keep_process_alive's timeout
+        heartbeat_interval -> how often a quiet process sends a heartbeat
+        """
+        self.wait_time: float = wait_time
+        self.heartbeat_interval: float = heartbeat_interval
+        self._last_arrival_time: float = None
+
+    def reset(self, now: float):
+        """Start watching, or watch a revived process, without sampling a gap"""
+        self._last_arrival_time = now
+
+    def heartbeat(self, now: float):
+        """Any frame from the monitored process"""
+        self._last_arrival_time = now
+
+    @abstractmethod
+    def get_suspicion_time(self) -> float:
+        """Time at which the process counts as dead if nothing else arrives"""
+        raise NotImplementedError()
+
+
+class FixedTimeoutDetector(FailureDetector):
+    """Dead after wait_time of silence"""
+
+    def get_suspicion_time(self) -> float:
+        return self._last_arrival_time + self.wait_time
+
+
+class PhiAccrualDetector(FailureDetector):
+    """
+    Hayashibara et al. phi accrual detector, aware of lost heartbeats
+
+    Suspects the process once phi = -log10(P(a live process stays this quiet))
+    reaches threshold. A heartbeat arrives after a normally distributed delay,
+    fitted to the observed gaps, unless it was lost, and every lost heartbeat adds
+    one heartbeat_interval. Without the loss term a lossy network gives gaps far
+    heavier tailed than a normal distribution and phi fires on a few drops in a row.
+    The loss estimate starts from a prior, so a short run of heartbeats that all
+    arrived does not pass for a lossless network. A steady sender on a clean
+    network is suspected within a few heartbeat intervals, one on a lossy network
+    later. Never waits longer than wait_time
+    """
+
+    def __init__(
+        self,
+        wait_time: float,
+        heartbeat_interval: float,
+        threshold: float = 5.0,
+        window_size: int = 100,
+        min_std_dev: float = 0.1,
+        min_loss_prob: float = 0.001,
+        prior_loss_prob: float = 0.1,
+        prior_gap_count: float = 5,
+        acceptable_pause: float = 0.0,
+        min_sample_count: int = 3,
+    ):
+        """
+        threshold -> phi to suspect at, 5 means a 1e-5 chance a live process is this quiet
+        min_std_dev -> floor on the delay spread, so a perfectly regular sender is
+            not suspected the moment one frame is late
+        min_loss_prob -> floor on the estimated heartbeat loss, a window without
+            losses does not prove there are none
+        prior_loss_prob -> heartbeat loss assumed before any gaps are seen, the
+            framework's usual drop rate
+        prior_gap_count -> how many observed gaps the prior weighs as
+        acceptable_pause -> extra seconds of silence always tolerated
+        min_sample_count -> gaps needed before phi is trusted, wait_time is used until then
+        """
+        super().__init__(wait_time, heartbeat_interval)
+        self.threshold: float = threshold
+        self.min_std_dev: float = min_std_dev
+        self.min_loss_prob: float = min_loss_prob
+        self.prior_loss_prob: float = prior_loss_prob
+        self.prior_gap_count: float = prior_gap_count
+        self.acceptable_pause: float = acceptable_pause
+        self.min_sample_count: int = min_sample_count
+        # Until the first frame after reset, a starting process gets wait_time
+        self._starting: bool = True
+        # (delay, lost heartbeat count) per gap, delay being the gap minus one
+        # heartbeat_interval per lost heartbeat
+        self._gaps: deque = deque(maxlen=window_size)
+        self._delay_sum: float = 0.0
+        self._delay_square_sum: float = 0.0
+        self._lost_count: int = 0
+        # Arrivals come from a delivery thread, suspicion is checked from a timer
+        self._lock: Lock = Lock()
+
+    def reset(self, now: float):
+        self._starting = True
+        super().reset(now)
+
+    def heartbeat(self, now: float):
+        last_arrival_time = self._last_arrival_time
+        self._last_arrival_time = now
+        if self._starting:
+            self._starting = False
+            return
+        gap = now - last_arrival_time
+        # The sender skips heartbeats while other traffic flows, so short gaps say
+        # nothing about how long a quiet sender takes
+        if gap < self.heartbeat_interval / 2:
+            return
+        lost_count = max(round(gap / self.heartbeat_interval) - 1, 0)
+        delay = gap - lost_count * self.heartbeat_interval
+        with self._lock:
+            if len(self._gaps) == self._gaps.maxlen:
+                dropped_delay, dropped_lost_count = self._gaps.popleft()
+                self._delay_sum -= dropped_delay
+                self._delay_square_sum -= dropped_delay * dropped_delay
+                self._lost_count -= dropped_lost_count
+            self._gaps.append((delay, lost_count))
+            self._delay_sum += delay
+            self._delay_square_sum += delay * delay
+            self._lost_count += lost_count
+
+    def _get_distribution(self) -> tuple:
+        """Returns (delay distribution, heartbeat loss probability), None until trusted"""
+        with self._lock:
+            sample_count = len(self._gaps)
+            if sample_count < self.min_sample_count:
+                return None
+            mean = self._delay_sum / sample_count
+            variance = max(self._delay_square_sum / sample_count - mean * mean, 0.0)
+            loss_prob = (
+                self._lost_count + self.prior_loss_prob * self.prior_gap_count
+            ) / (sample_count + self._lost_count + self.prior_gap_count)
+        std_dev = max(math.sqrt(variance), self.min_std_dev)
+        return NormalDist(mean, std_dev), max(loss_prob, self.min_loss_prob)
+
+    def _get_quiet_prob(self, distribution: tuple, elapsed: float) -> float:
+        """P(a live process sends nothing for elapsed seconds)"""
+        delay_dist, loss_prob = distribution
+        quiet_prob = 0.0
+        lost_count = 0
+        # Each term is the next heartbeat getting through after lost_count losses
+        while True:
+            loss_weight = loss_prob**lost_count
+            tail_start = elapsed - lost_count * self.heartbeat_interval
+            quiet_prob += loss_weight * (1 - delay_dist.cdf(tail_start))
+            if tail_start < delay_dist.mean or loss_weight < 1e-20:
+                return quiet_prob
+            lost_count += 1
+
+    def get_phi(self, now: float) -> float:
+        distribution = self._get_distribution()
+        if distribution is None:
+            return 0.0
+        elapsed = now - self._last_arrival_time - self.acceptable_pause
+        quiet_prob = self._get_quiet_prob(distribution, elapsed)
+        if quiet_prob <= 0:
+            return math.inf
+        return -math.log10(quiet_prob)
+
+    def get_suspicion_time(self) -> float:
+        last_arrival_time = self._last_arrival_time
+        fixed_suspicion_time = last_arrival_time + self.wait_time
+        distribution = self._get_distribution()
+        if distribution is None or self._starting:
+            return fixed_suspicion_time
+        # Quiet probability only falls with elapsed time, bisect for the threshold
+        suspicion_prob = 10**-self.threshold
+        low, high = 0.0, self.wait_time - self.acceptable_pause
+        if high <= 0 or self._get_quiet_prob(distribution, high) > suspicion_prob:
+            return fixed_suspicion_time
+        while high - low > 0.001:
+            middle = (low + high) / 2
+            if self._get_quiet_prob(distribution, middle) > suspicion_prob:
+                low = middle
+            else:
+                high = middle
+        return last_arrival_time + self.acceptable_pause + high
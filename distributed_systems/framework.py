@@ -1,9 +1,15 @@
+from distributed_systems.failure_detector import FailureDetector, FixedTimeoutDetector
+from distributed_systems.checkpoint_store import CheckpointStore
+
+import json
 import sys
 import time
+import traceback
 from abc import ABC, abstractmethod
 from threading import Lock, Thread, Condition
+from queue import SimpleQueue
 import random
-from typing import List, Dict
+from typing import Callable, List, Dict
 
 
 """
@@ -15,6 +21,109 @@ Simple User Journey
 """
 
 
+class LatencyHistogram:
+    """Power-of-two microsecond buckets, so recording is one bit_length call"""
+
+    BUCKET_COUNT = 32
+
+    def __init__(self):
+        self.counts: List[int] = [0] * LatencyHistogram.BUCKET_COUNT
+        self.total: float = 0.0
+        self.max: float = 0.0
+
+    def record(self, seconds: float):
+        bucket_idx = min(
+            int(seconds * 1e6).bit_length(), LatencyHistogram.BUCKET_COUNT - 1
+        )
+        self.counts[bucket_idx] += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def get_count(self) -> int:
+        return sum(self.counts)
+
+    def get_percentile(self, percentile: float) -> float:
+        """Upper bound in seconds of the bucket holding the percentile"""
+        rank = self.get_count() * percentile / 100
+        seen = 0
+        for bucket_idx, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket_idx) / 1e6, self.max)
+        return 0.0
+
+    def to_dict(self) -> dict:
+        count = self.get_count()
+        return {
+            "count": count,
+            "mean_ms": self.total / count * 1e3 if count else 0.0,
+            "p50_ms": self.get_percentile(50) * 1e3,
+            "p99_ms": self.get_percentile(99) * 1e3,
+            "max_ms": self.max * 1e3,
+            # Bucket upper bound in ms -> count
+            "buckets": {
+                f"{(1 << bucket_idx) / 1e3}": count
+                for bucket_idx, count in enumerate(self.counts)
+                if count
+            },
+        }
+
+    def add(self, histogram: dict):
+        """Merges a histogram exported by to_dict"""
+        for upper_bound_ms, count in histogram["buckets"].items():
+            bucket_idx = round(float(upper_bound_ms) * 1e3).bit_length() - 1
+            self.counts[bucket_idx] += count
+        self.total += histogram["mean_ms"] * histogram["count"] / 1e3
+        self.max = max(self.max, histogram["max_ms"] / 1e3)
+
+
+class ProcessMetrics:
+    """
+    Messaging counters for one process id, shared by every instance revived under it
+
+    Counters are plain attributes bumped without a lock to keep sends cheap, so
+    under heavy contention an increment can occasionally be lost
+    """
+
+    _COUNTERS = [
+        "starts",
+        "sent",
+        "received",
+        "dropped",
+        "retransmitted",
+        "heartbeats",
+        "inbox_high_water",
+    ]
+
+    def __init__(self):
+        self.starts: int = 0
+        self.sent: int = 0
+        self.received: int = 0
+        self.dropped: int = 0
+        self.retransmitted: int = 0
+        self.heartbeats: int = 0
+        self.inbox_high_water: int = 0
+        self.blocked_time: float = 0.0
+        self.ack_latency: LatencyHistogram = LatencyHistogram()
+
+    def to_dict(self) -> dict:
+        metrics = {counter: getattr(self, counter) for counter in self._COUNTERS}
+        metrics["blocked_seconds"] = self.blocked_time
+        metrics["ack_latency"] = self.ack_latency.to_dict()
+        return metrics
+
+    def add(self, metrics: dict):
+        """Merges metrics exported by to_dict, e.g. from another OS process"""
+        for counter in self._COUNTERS:
+            if counter.endswith("high_water"):
+                setattr(self, counter, max(getattr(self, counter), metrics[counter]))
+            else:
+                setattr(self, counter, getattr(self, counter) + metrics[counter])
+        self.blocked_time += metrics["blocked_seconds"]
+        self.ack_latency.add(metrics["ack_latency"])
+
+
 class ProcessFramework(ABC):
     """
     Usage:
@@ -25,9 +134,13 @@ class ProcessFramework(ABC):
             - alive_status -> process still alive
 
         Mandatory implement:
-            - read_msg -> process message
+            - read_msg -> process message (runs on a shared dispatcher thread, keep it short)
             - start -> start process execution
 
+        Optional implement:
+            - flush_reads -> runs once the dispatcher has nothing queued behind
+                the last read_msg, e.g. to send work batched across reads
+
         Other:
             - complete -> call when process done
 
@@ -48,6 +161,8 @@ class ProcessFramework(ABC):
         self._id: int = id
         self._alive_status: bool = True
         self._alive_status_lock: Lock = Lock()
+        self.metrics: ProcessMetrics = DistributedSystem.get_process_metrics(id)
+        self.metrics.starts += 1
 
     @classmethod
     def set_input(cls, input):
@@ -65,14 +180,21 @@ class ProcessFramework(ABC):
         raise NotImplementedError()
 
     def receive_msg(self, msg: str):
-        Thread(target=self.read_msg, args=[msg]).start()
+        if self.get_alive_status():
+            self.metrics.received += 1
+            self.read_msg(msg)
+
+    def flush_reads(self):
+        pass
 
     def send_msg(self, target_id: int, msg: str = None):
         if not self.get_alive_status():
             sys.exit()
-        if msg and not isinstance(msg, str):
-            raise ValueError("Message must be string")
+        if msg and not isinstance(msg, (str, bytes)):
+            raise ValueError("Message must be string or bytes")
+        self.metrics.sent += 1
         if DistributedSystem.decide_msg_drop():
+            self.metrics.dropped += 1
             print(f"[STATUS] Dropping message")
             return
         DistributedSystem.msg_to_process(target_id, msg)
@@ -80,8 +202,16 @@ class ProcessFramework(ABC):
     def new_process(self, process_id: int, process_def: type, msg: str = None):
         if not self.get_alive_status():
             sys.exit()
-        process_instance = DistributedSystem.initialize_process(process_id, process_def)
-        Thread(target=process_instance.start, args=[msg]).start()
+        DistributedSystem.start_process(process_id, process_def, msg)
+
+    def save_checkpoint(self, name: str, state):
+        if not self.get_alive_status():
+            sys.exit()
+        DistributedSystem.save_checkpoint(self.get_id(), name, state)
+
+    def load_checkpoint(self, name: str):
+        """Last state saved under name by this process id, None if there is none"""
+        return DistributedSystem.load_checkpoint(self.get_id(), name)
 
     def get_alive_status(self):
         with self._alive_status_lock:
@@ -91,12 +221,123 @@ class ProcessFramework(ABC):
         print(f"[STATUS] Process {self.get_id()} complete")
         DistributedSystem.process_completion(self.get_id())
 
-    def shutdown(self, premature=False):
+    def stop(self):
+        """Stops this instance without reporting it, e.g. once a revival replaced it"""
         with self._alive_status_lock:
             self._alive_status = False
+
+    def shutdown(self, premature=False):
+        self.stop()
         if premature:
             print(f"[STATUS] Process {self.get_id()} experienced hardware failure")
-        DistributedSystem.process_shutdown(self.get_id())
+        DistributedSystem.process_shutdown(self.get_id(), self)
+
+
+class MsgDispatcher:
+    """
+    Delivers messages from a fixed pool of threads instead of a thread per message
+
+    Messages to the same process always go through the same dispatcher thread,
+    so a process sees messages from one sender in the order they were sent, and
+    read_msg and flush_reads never run concurrently for one process
+    """
+
+    _STOP = object()
+
+    def __init__(self, thread_count: int = 4):
+        self._inboxes: List[SimpleQueue] = [SimpleQueue() for _ in range(thread_count)]
+        self._delivered_counts: List[int] = [0] * thread_count
+        self._start_time: float = time.time()
+        self._stop_time: float = None
+        for thread_idx in range(thread_count):
+            Thread(
+                target=self._deliver_continuously, args=[thread_idx], daemon=True
+            ).start()
+
+    def dispatch(self, process: ProcessFramework, msg: str):
+        self._inboxes[hash(process.get_id()) % len(self._inboxes)].put((process, msg))
+
+    def _deliver_continuously(self, thread_idx: int):
+        inbox = self._inboxes[thread_idx]
+        # Processes read from since this thread's queue was last empty
+        unflushed_processes: set = set()
+        while True:
+            item = inbox.get()
+            if item is MsgDispatcher._STOP:
+                return
+            process, msg = item
+            self._deliver(process.receive_msg, msg)
+            unflushed_processes.add(process)
+            # Each thread owns its slot, so no lock is needed
+            self._delivered_counts[thread_idx] += 1
+            if inbox.empty():
+                for process in unflushed_processes:
+                    self._deliver(process.flush_reads)
+                unflushed_processes.clear()
+
+    @staticmethod
+    def _deliver(receiver, *args):
+        try:
+            receiver(*args)
+        except SystemExit:
+            pass
+        except Exception:
+            traceback.print_exc()
+
+    def stop(self):
+        if self._stop_time is not None:
+            return
+        self._stop_time = time.time()
+        for inbox in self._inboxes:
+            inbox.put(MsgDispatcher._STOP)
+
+    def get_delivered_count(self) -> int:
+        return sum(self._delivered_counts)
+
+    def get_delivery_rate(self) -> float:
+        end_time = self._stop_time if self._stop_time else time.time()
+        elapsed = max(end_time - self._start_time, 1e-9)
+        return self.get_delivered_count() / elapsed
+
+
+class ProcessRegistry:
+    """
+    Copy-on-write map from process id to process instance
+
+    Writers copy the map under a lock and swap in the new one. Swapping a
+    reference is atomic, so readers (the send path) never take a lock and
+    never wait behind process creation or shutdown
+    """
+
+    def __init__(self):
+        self._processes: Dict[int, ProcessFramework] = {}
+        self._write_lock: Lock = Lock()
+
+    def get(self, process_id: int) -> ProcessFramework:
+        return self._processes.get(process_id)
+
+    def values(self) -> List[ProcessFramework]:
+        return list(self._processes.values())
+
+    def put(self, process: ProcessFramework) -> ProcessFramework:
+        with self._write_lock:
+            processes = dict(self._processes)
+            replaced_process = processes.get(process.get_id())
+            processes[process.get_id()] = process
+            self._processes = processes
+        return replaced_process
+
+    def remove(self, process_id: int, process: ProcessFramework = None):
+        with self._write_lock:
+            current_process = self._processes.get(process_id)
+            if current_process is None:
+                return
+            if process is not None and current_process is not process:
+                # Process id was already taken over by a revived instance
+                return
+            processes = dict(self._processes)
+            del processes[process_id]
+            self._processes = processes
 
 
 class DistributedSystem:
@@ -104,12 +345,17 @@ class DistributedSystem:
     Usage:
         1. Write process implementations (described above)
         2. Define faults with define_faults call
+            (optional) size the message dispatcher pool with define_delivery
+            (optional) pick how keep_process_alive detects failures with
+            define_failure_detection
+            (optional) let revived processes resume with define_checkpoints
         3. Call process_input with list of process definitions (not instances) and input
         4. Call wait_for_completion to get output
+            (optional) get_metrics for per-process messaging metrics, or
+            define_metrics to dump them as JSON on completion
     """
 
-    _processes: Dict[int, ProcessFramework] = {}
-    _processes_lock = Lock()
+    _processes: ProcessRegistry = ProcessRegistry()
 
     _running_process_ids: set = set()
     _running_process_ids_lock = Lock()
@@ -119,6 +365,22 @@ class DistributedSystem:
     _max_process_kill_count = 0
     _process_kill_wait_time = 5
 
+    _dispatcher_count = 4
+    _dispatcher: MsgDispatcher = None
+
+    _failure_detector_factory: Callable = FixedTimeoutDetector
+
+    _checkpoint_store: CheckpointStore = None
+
+    _metrics: Dict[int, ProcessMetrics] = {}
+    _metrics_lock: Lock = Lock()
+    _metrics_path: str = None
+
+    # Runs processes outside this interpreter, e.g. MultiprocessBackend
+    _backend = None
+    # Inside a backend worker: receives whatever cannot be handled locally
+    _remote = None
+
     @classmethod
     def define_faults(
         cls,
@@ -130,6 +392,62 @@ class DistributedSystem:
         cls._max_process_kill_count = max_process_kill_count
         cls._process_kill_wait_time = process_kill_wait_time
 
+    @classmethod
+    def define_delivery(cls, dispatcher_count: int = 4):
+        if dispatcher_count < 1:
+            raise ValueError("Need at least one dispatcher thread")
+        cls._dispatcher_count = dispatcher_count
+
+    @classmethod
+    def define_failure_detection(
+        cls, detector_factory: Callable = FixedTimeoutDetector
+    ):
+        """
+        detector_factory -> called with (wait_time, heartbeat_interval) for every
+            process passed to keep_process_alive, returns its FailureDetector
+        """
+        cls._failure_detector_factory = detector_factory
+
+    @classmethod
+    def create_failure_detector(
+        cls, wait_time: float, heartbeat_interval: float
+    ) -> FailureDetector:
+        return cls._failure_detector_factory(wait_time, heartbeat_interval)
+
+    @classmethod
+    def define_checkpoints(cls, store: CheckpointStore = None):
+        """store -> where save_checkpoint persists progress, None drops it"""
+        cls._checkpoint_store = store
+
+    @classmethod
+    def save_checkpoint(cls, process_id: int, name: str, state):
+        if cls._checkpoint_store:
+            cls._checkpoint_store.save(f"{process_id}/{name}", state)
+
+    @classmethod
+    def load_checkpoint(cls, process_id: int, name: str):
+        if cls._checkpoint_store:
+            return cls._checkpoint_store.load(f"{process_id}/{name}")
+        return None
+
+    @classmethod
+    def define_metrics(cls, dump_path: str = None):
+        """dump_path -> file wait_for_completion writes get_metrics to as JSON"""
+        cls._metrics_path = dump_path
+
+    @classmethod
+    def set_backend(cls, backend):
+        """Backend must implement process_input and wait_for_completion, None for threads"""
+        cls._backend = backend
+
+    @classmethod
+    def set_remote(cls, remote):
+        """
+        Remote must implement start_process, msg_to_process, process_completion and
+        process_shutdown. Used by backend workers hosting a single process
+        """
+        cls._remote = remote
+
     @classmethod
     def decide_msg_drop(cls):
         return random.uniform(0.0001, 1) <= cls._msg_drop_prop
@@ -139,11 +457,10 @@ class DistributedSystem:
         process_kill_count = 0
         while process_kill_count < cls._max_process_kill_count:
             time.sleep(cls._process_kill_wait_time)
-            with cls._processes_lock:
-                try:
-                    process = random.choice(list(cls._processes.values()))
-                except IndexError:
-                    return
+            try:
+                process = random.choice(cls._processes.values())
+            except IndexError:
+                return
             process.shutdown(premature=True)
             process_kill_count += 1
 
@@ -151,17 +468,34 @@ class DistributedSystem:
     def initialize_process(cls, process_id: int, process_def: type):
         with cls._running_process_ids_lock:
             cls._running_process_ids.add(process_id)
-        with cls._processes_lock:
-            if process_id in cls._processes:
-                print(f"[WARNING] Restarting healthy process {process_id}")
-            process_instance: ProcessFramework = process_def(process_id)
-            print(f"[STATUS] Starting process {process_id}")
-            cls._processes[process_instance.get_id()] = process_instance
-            return process_instance
+        process_instance: ProcessFramework = process_def(process_id)
+        print(f"[STATUS] Starting process {process_id}")
+        replaced_process = cls._processes.put(process_instance)
+        if replaced_process:
+            print(f"[WARNING] Restarting healthy process {process_id}")
+            # Messages only reach the new instance, the old one must not keep running
+            replaced_process.stop()
+        return process_instance
+
+    @classmethod
+    def start_process(cls, process_id: int, process_def: type, msg: str = None):
+        if cls._remote:
+            cls._remote.start_process(process_id, process_def, msg)
+            return
+        process_instance = cls.initialize_process(process_id, process_def)
+        Thread(target=process_instance.start, args=[msg]).start()
+
+    @classmethod
+    def start_delivery(cls):
+        cls._dispatcher = MsgDispatcher(cls._dispatcher_count)
 
     @classmethod
     def process_input(cls, input, process_defs: List[type]):
+        if cls._backend:
+            cls._backend.process_input(input, process_defs)
+            return
         ProcessFramework.set_input(input)
+        cls.start_delivery()
         threads: list[Thread] = []
         for process_id in range(len(process_defs)):
             process_instance = cls.initialize_process(
@@ -175,11 +509,39 @@ class DistributedSystem:
 
     @classmethod
     def msg_to_process(cls, target_id: int, msg: str):
-        try:
-            with cls._processes_lock:
-                cls._processes[target_id].receive_msg(msg)
-        except KeyError:
-            pass
+        process = cls._processes.get(target_id)
+        if process is not None:
+            cls._dispatcher.dispatch(process, msg)
+        elif cls._remote:
+            cls._remote.msg_to_process(target_id, msg)
+
+    @classmethod
+    def get_process_metrics(cls, process_id: int) -> ProcessMetrics:
+        metrics = cls._metrics.get(process_id)
+        if metrics is None:
+            with cls._metrics_lock:
+                metrics = cls._metrics.setdefault(process_id, ProcessMetrics())
+        return metrics
+
+    @classmethod
+    def get_metrics(cls) -> dict:
+        """Per-process metrics plus totals across processes, JSON serializable"""
+        totals = ProcessMetrics()
+        processes = {}
+        for process_id, metrics in sorted(cls._metrics.items()):
+            processes[process_id] = metrics.to_dict()
+            totals.add(processes[process_id])
+        return {"totals": totals.to_dict(), "processes": processes}
+
+    @classmethod
+    def _dump_metrics(cls):
+        if cls._metrics_path:
+            with open(cls._metrics_path, "w") as fh:
+                json.dump(cls.get_metrics(), fh, indent=2)
+
+    @classmethod
+    def get_delivered_msg_count(cls) -> int:
+        return cls._dispatcher.get_delivered_count() if cls._dispatcher else 0
 
     @classmethod
     def process_completion(cls, id: int):
@@ -187,22 +549,49 @@ class DistributedSystem:
             if id in cls._running_process_ids:
                 cls._running_process_ids.remove(id)
             cls._running_process_ids_cv.notify()
+        if cls._remote:
+            cls._remote.process_completion(id)
 
     @classmethod
-    def process_shutdown(cls, id: int):
+    def process_shutdown(cls, id: int, process: ProcessFramework = None):
         cls.process_completion(id)
-        with cls._processes_lock:
-            del cls._processes[id]
+        cls._processes.remove(id, process)
+        if cls._remote:
+            cls._remote.process_shutdown(id)
+
+    @classmethod
+    def reset(cls):
+        """Forget all processes and output so another job can run in this interpreter"""
+        cls._processes = ProcessRegistry()
+        cls._running_process_ids = set()
+        cls._running_process_ids_lock = Lock()
+        cls._running_process_ids_cv = Condition(cls._running_process_ids_lock)
+        if cls._dispatcher:
+            cls._dispatcher.stop()
+        cls._dispatcher = None
+        cls._remote = None
+        cls._metrics = {}
+        ProcessFramework.input = None
+        ProcessFramework.output = None
 
     @classmethod
     def wait_for_completion(cls):
+        if cls._backend:
+            output = cls._backend.wait_for_completion()
+            cls._dump_metrics()
+            return output
         with cls._running_process_ids_lock:
             while len(cls._running_process_ids) > 0:
                 cls._running_process_ids_cv.wait()
         print("[STATUS] No running processes, initiating shutdown")
-        with cls._processes_lock:
-            processes: List[ProcessFramework] = list(cls._processes.values())
+        processes: List[ProcessFramework] = cls._processes.values()
         for process in processes:
             process.shutdown()
+        cls._dispatcher.stop()
+        print(
+            f"[STATUS] Delivered {cls._dispatcher.get_delivered_count()} messages "
+            f"({cls._dispatcher.get_delivery_rate():.0f} msgs/sec)"
+        )
         print("[STATUS] Distributed system shutdown complete")
+        cls._dump_metrics()
         return ProcessFramework.output
@@ -0,0 +1,241 @@
+"""
+Goal: Run map/combine/reduce jobs on DistributedSystem without hand rolling processes
+
+Usage:
+    1. Subclass MapReduceJob, implement map and reduce, optionally combine,
+       split and read_split
+    2. Subclass MapReduceCoordinator with job_def set to the job class
+    3. DistributedSystem.process_input(input, [Coordinator]), wait_for_completion
+       returns {key: reduce(key, values)}
+
+Processes:
+    0 -> coordinator: splits the input, starts the reducers and up to
+        max_running_map_tasks mappers at a time, restarts mappers that stop
+        heartbeating and collects reducer output
+    1..reducer_count -> reducers, each owns the keys partition maps to it
+    reducer_count + 1.. -> one mapper per split
+
+Notes:
+    - Mappers run combine over their own output before the shuffle, so a
+      reducer receives at most one value per key from each map task
+    - Reducers with a combine fold each partition into one value per key as it
+      arrives, so their memory follows the key count, not the map task count.
+      combine must therefore accept its own output among its values
+    - Set fold_partitions = False when combine's output grows with its input,
+      e.g. concatenating postings. Folding would then copy everything merged so
+      far per partition, so reducers keep each map task's value and reduce
+      merges them once
+    - A retried map task sends its partitions again, reducers keep the first
+      copy from each task so retries never count twice
+    - Mappers are judged by their heartbeats, not their run time, so a slow
+      split is never restarted while it is still being mapped
+    - Only map tasks are retried. A lost coordinator or reducer is not
+      detected, the job then hangs and wait_for_completion never returns
+    - Job classes must be importable by module and name, workers look them up
+      from their startup message
+"""
+
+from distributed_systems.base_process import Msg, Process
+from distributed_systems.framework import ProcessFramework
+
+from typing import Iterable
+import importlib
+import json
+import pickle
+import zlib
+
+COORDINATOR_ID = 0
+
+# Shuffle and result messages, pickled so keys and values keep their types
+_PARTITION = "PARTITION"
+_MAPPED = "MAPPED"
+_REDUCED = "REDUCED"
+
+
+class MapReduceJob:
+    reducer_count: int = 2
+    # Input items per map task for the default split
+    split_size: int = 20
+    # Seconds without a heartbeat from a map task before it is started again
+    heartbeat_timeout: float = 5
+    # Mappers running at once, the rest start as these report done
+    max_running_map_tasks: int = 8
+
+    # Optional, (key, values) -> one value like those map emits, applied by
+    # mappers before the shuffle and by reducers as partitions arrive
+    combine = None
+    # Whether reducers apply combine as each partition arrives
+    fold_partitions: bool = True
+
+    def split(self, input) -> list:
+        """Map tasks for the input, each must be JSON serializable"""
+        return [
+            [split_start, min(split_start + self.split_size, len(input))]
+            for split_start in range(0, len(input), self.split_size)
+        ]
+
+    def read_split(self, task) -> Iterable:
+        """Records of one map task, read by the mapper"""
+        split_start, split_end = task
+        return ProcessFramework.input[split_start:split_end]
+
+    def map(self, record) -> Iterable[tuple]:
+        """Yields (key, value) pairs for one record"""
+        raise NotImplementedError()
+
+    def reduce(self, key, values: list):
+        raise NotImplementedError()
+
+    def partition(self, key) -> int:
+        """Reducer index for key, stable across OS processes unlike hash()"""
+        return zlib.crc32(repr(key).encode("utf-8")) % self.reducer_count
+
+
+def _get_job_path(job_def: type) -> str:
+    return f"{job_def.__module__}:{job_def.__qualname__}"
+
+
+def _load_job(job_path: str) -> MapReduceJob:
+    module_name, class_name = job_path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+class MapReduceCoordinator(Process):
+    job_def: type = None
+    # Process class the mappers run, MapTask when None
+    map_task_def: type = None
+
+    def _get_map_task_id(self, task_idx: int) -> int:
+        return self.job.reducer_count + 1 + task_idx
+
+    def _start_map_tasks(self):
+        """Starts pending map tasks while fewer than max_running_map_tasks run"""
+        map_task_def = self.map_task_def or MapTask
+        while (
+            self.next_task_idx < len(self.tasks)
+            and len(self.running_task_idxs) < self.job.max_running_map_tasks
+        ):
+            task_idx = self.next_task_idx
+            startup_msg = json.dumps(
+                {
+                    "JOB": _get_job_path(self.job_def),
+                    "TASK_IDX": task_idx,
+                    "TASK": self.tasks[task_idx],
+                }
+            )
+            process_id = self._get_map_task_id(task_idx)
+            self.new_process(process_id, map_task_def, startup_msg)
+            # Restarted once it stops heartbeating, however long its split takes
+            self.keep_process_alive(
+                process_id, map_task_def, startup_msg, self.job.heartbeat_timeout
+            )
+            self.running_task_idxs.add(task_idx)
+            self.next_task_idx += 1
+
+    def start(self, msg: str = None):
+        self.job: MapReduceJob = self.job_def()
+        self.tasks: list = self.job.split(ProcessFramework.input)
+        # Map tasks from next_task_idx on have not been started yet
+        self.next_task_idx: int = 0
+        self.running_task_idxs: set = set()
+
+        for reducer_idx in range(self.job.reducer_count):
+            startup_msg = {
+                "JOB": _get_job_path(self.job_def),
+                "REDUCER_IDX": reducer_idx,
+                "TASK_COUNT": len(self.tasks),
+            }
+            self.new_process(1 + reducer_idx, ReduceTask, json.dumps(startup_msg))
+        self._start_map_tasks()
+
+        output = {}
+        reduced_idxs = set()
+        while len(reduced_idxs) < self.job.reducer_count:
+            kind, idx, result = pickle.loads(self.get_one_msg().content)
+            if kind == _MAPPED and idx in self.running_task_idxs:
+                self.running_task_idxs.remove(idx)
+                self.stop_keeping_process_alive(self._get_map_task_id(idx))
+                self._start_map_tasks()
+            elif kind == _REDUCED and idx not in reduced_idxs:
+                reduced_idxs.add(idx)
+                output.update(result)
+
+        ProcessFramework.output = output
+        self.complete()
+
+
+def map_task(job: MapReduceJob, task) -> list:
+    """Runs one map task, returns the combined partition for each reducer"""
+    # Per reducer: key -> values emitted for it
+    partitions = [{} for _ in range(job.reducer_count)]
+    for record in job.read_split(task):
+        for key, value in job.map(record):
+            partition = partitions[job.partition(key)]
+            if key in partition:
+                partition[key].append(value)
+            else:
+                partition[key] = [value]
+    if job.combine:
+        for partition in partitions:
+            for key, values in partition.items():
+                partition[key] = [job.combine(key, values)]
+    return partitions
+
+
+def merge_partition(job: MapReduceJob, key_values: dict, partition: dict):
+    """Folds one map task's partition into a reducer's key -> values"""
+    for key, values in partition.items():
+        if key not in key_values:
+            key_values[key] = values
+        elif job.combine and job.fold_partitions:
+            key_values[key] = [job.combine(key, key_values[key] + values)]
+        else:
+            key_values[key].extend(values)
+
+
+class MapTask(Process):
+    def start(self, msg: str = None):
+        msg_dict = json.loads(msg)
+        job = _load_job(msg_dict["JOB"])
+        task_idx = msg_dict["TASK_IDX"]
+        # The coordinator restarts this task once these stop
+        self.send_heartbeats_to_process(COORDINATOR_ID)
+
+        partitions = map_task(job, msg_dict["TASK"])
+        for reducer_idx, partition in enumerate(partitions):
+            # Sent even when empty, reducers count map tasks
+            partition_msg = pickle.dumps((_PARTITION, task_idx, partition))
+            self.send_msg(1 + reducer_idx, Msg.build_msg(partition_msg))
+        self.send_msg(
+            COORDINATOR_ID, Msg.build_msg(pickle.dumps((_MAPPED, task_idx, None)))
+        )
+        self.complete()
+
+
+class ReduceTask(Process):
+    def start(self, msg: str = None):
+        msg_dict = json.loads(msg)
+        job = _load_job(msg_dict["JOB"])
+        reducer_idx = msg_dict["REDUCER_IDX"]
+        task_count = msg_dict["TASK_COUNT"]
+
+        key_values = {}
+        received_task_idxs = set()
+        while len(received_task_idxs) < task_count:
+            _, task_idx, partition = pickle.loads(self.get_one_msg().content)
+            if task_idx in received_task_idxs:
+                # Partition from a retried map task
+                continue
+            received_task_idxs.add(task_idx)
+            merge_partition(job, key_values, partition)
+            print(
+                f"[STATUS] Reducer {reducer_idx} merged "
+                f"{len(received_task_idxs)}/{task_count} map tasks, {len(key_values)} keys"
+            )
+
+        output = {key: job.reduce(key, values) for key, values in key_values.items()}
+        self.send_msg(
+            COORDINATOR_ID,
+            Msg.build_msg(pickle.dumps((_REDUCED, reducer_idx, output))),
+        )
+        self.complete()
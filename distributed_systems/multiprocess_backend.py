@@ -0,0 +1,303 @@
+"""
+Goal: Run every process in its own OS process so CPU-bound jobs use all cores
+
+Usage:
+    DistributedSystem.set_backend(MultiprocessBackend())
+    Then define_faults, process_input and wait_for_completion as usual
+
+Notes:
+    - Messages travel over one pipe per OS process and are routed by the parent
+    - Process definitions must be module-level classes and the platform must support fork
+    - ProcessFramework.output is collected from a worker when it completes or shuts
+      down, so a job must assign output from one process rather than accumulate into it
+    - Starting a process under a running id stops the old worker, like the other
+      backends stop a replaced instance
+    - A process that raises fails the whole job: wait_for_completion stops every
+      worker and raises RuntimeError with the worker's traceback
+"""
+
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+
+import multiprocessing
+from multiprocessing.connection import Connection, wait
+from threading import Lock, Thread, Condition
+from typing import List, Dict
+import os
+import random
+import sys
+import time
+import traceback
+
+# Parent -> worker
+_DELIVER = "DELIVER"
+_KILL = "KILL"
+_STOP = "STOP"
+# Worker -> parent
+_SEND = "SEND"
+_START = "START"
+_COMPLETE = "COMPLETE"
+_SHUTDOWN = "SHUTDOWN"
+_METRICS = "METRICS"
+_FAILED = "FAILED"
+
+
+class _ParentLink:
+    """Forwards what a worker cannot handle locally to the parent"""
+
+    def __init__(self, conn: Connection, initial_output):
+        self._conn: Connection = conn
+        self._send_lock: Lock = Lock()
+        self._initial_output = initial_output
+
+    def _send(self, item: tuple):
+        with self._send_lock:
+            try:
+                self._conn.send(item)
+            except OSError:
+                # Parent is gone, so is the job
+                os._exit(0)
+
+    def start_process(self, process_id: int, process_def: type, msg: str = None):
+        self._send((_START, process_id, process_def, msg))
+
+    def msg_to_process(self, target_id: int, msg: str):
+        self._send((_SEND, target_id, msg))
+
+    def process_completion(self, id: int):
+        output = ProcessFramework.output
+        if output is self._initial_output:
+            self._send((_COMPLETE, id, False, None))
+        else:
+            self._send((_COMPLETE, id, True, output))
+
+    def process_shutdown(self, id: int):
+        self._send((_SHUTDOWN, id))
+
+    def process_failure(self, id: int, error: str):
+        self._send((_FAILED, id, error))
+
+    def send_metrics(self):
+        self._send((_METRICS, DistributedSystem.get_metrics()["processes"]))
+
+    def exit(self):
+        sys.stdout.flush()
+        # Never exit halfway through writing to the pipe
+        with self._send_lock:
+            os._exit(0)
+
+
+def _start_process(
+    process: ProcessFramework, parent_link: _ParentLink, start_args: list
+):
+    try:
+        process.start(*start_args)
+    except Exception:
+        # A dead thread would leave the job waiting on a completion that never comes
+        if process.get_alive_status():
+            parent_link.process_failure(process.get_id(), traceback.format_exc())
+
+
+def _run_worker(conn: Connection, process_id: int, process_def: type, start_args: list):
+    system_input = ProcessFramework.input
+    output = ProcessFramework.output
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(None)
+    ProcessFramework.set_input(system_input)
+    ProcessFramework.output = output
+    # Forked workers share the parent's random state, fault injection must not
+    random.seed()
+
+    parent_link = _ParentLink(conn, output)
+    DistributedSystem.set_remote(parent_link)
+    DistributedSystem.start_delivery()
+    process = DistributedSystem.initialize_process(process_id, process_def)
+    Thread(
+        target=_start_process, args=[process, parent_link, start_args], daemon=True
+    ).start()
+
+    while True:
+        try:
+            item = conn.recv()
+        except (EOFError, OSError):
+            break
+        if item[0] == _DELIVER:
+            DistributedSystem.msg_to_process(process_id, item[1])
+        elif item[0] == _KILL:
+            process.shutdown(premature=True)
+            break
+        elif item[0] == _STOP:
+            process.shutdown()
+            break
+    parent_link.send_metrics()
+    parent_link.exit()
+
+
+class _Worker:
+    def __init__(self, process_id: int, os_process, conn: Connection):
+        self.process_id: int = process_id
+        self.os_process = os_process
+        self.conn: Connection = conn
+        self._send_lock: Lock = Lock()
+
+    def send(self, item: tuple):
+        with self._send_lock:
+            try:
+                self.conn.send(item)
+            except OSError:
+                pass
+
+
+class MultiprocessBackend:
+    def __init__(self, worker_stop_timeout: float = 5):
+        self._context = multiprocessing.get_context("fork")
+        self._worker_stop_timeout: float = worker_stop_timeout
+
+        # Latest worker per process id, messages are routed here
+        self._workers: Dict[int, _Worker] = {}
+        # Every worker not yet exited, including replaced ones
+        self._live_workers: List[_Worker] = []
+        self._workers_lock: Lock = Lock()
+
+        self._running_process_ids: set = set()
+        self._running_process_ids_lock: Lock = Lock()
+        self._running_process_ids_cv: Condition = Condition(
+            self._running_process_ids_lock
+        )
+
+        self._routing: bool = False
+        self._router: Thread = None
+        # Traceback of the first process that raised
+        self._failure: str = None
+
+    def start_process(self, process_id: int, process_def: type, start_args: list):
+        with self._running_process_ids_lock:
+            self._running_process_ids.add(process_id)
+        conn, worker_conn = self._context.Pipe()
+        sys.stdout.flush()
+        os_process = self._context.Process(
+            target=_run_worker,
+            args=[worker_conn, process_id, process_def, start_args],
+            daemon=True,
+        )
+        # Forks are serialized so no worker inherits another worker's end of a pipe
+        with self._workers_lock:
+            os_process.start()
+            worker_conn.close()
+            worker = _Worker(process_id, os_process, conn)
+            replaced_worker = self._workers.get(process_id)
+            if replaced_worker is not None:
+                print(f"[WARNING] Restarting healthy process {process_id}")
+                # Messages only reach the new worker, the old one must not keep running
+                replaced_worker.send((_STOP,))
+            self._workers[process_id] = worker
+            self._live_workers.append(worker)
+
+    def process_input(self, input, process_defs: List[type]):
+        ProcessFramework.set_input(input)
+        for process_id in range(len(process_defs)):
+            self.start_process(process_id, process_defs[process_id], [])
+        self._routing = True
+        self._router = Thread(target=self._route_continuously)
+        self._router.start()
+        if DistributedSystem._max_process_kill_count > 0:
+            Thread(target=self._shut_down_processes, daemon=True).start()
+
+    def _remove_running_process_id(self, process_id: int):
+        with self._running_process_ids_lock:
+            self._running_process_ids.discard(process_id)
+            self._running_process_ids_cv.notify()
+
+    def _worker_exited(self, worker: _Worker):
+        worker.conn.close()
+        worker.os_process.join()
+        with self._workers_lock:
+            self._live_workers.remove(worker)
+            crashed = self._workers.get(worker.process_id) is worker
+            if crashed:
+                del self._workers[worker.process_id]
+        if crashed:
+            # Exited without shutting down, do not wait on it forever
+            self._remove_running_process_id(worker.process_id)
+
+    def _handle(self, worker: _Worker, item: tuple):
+        if item[0] == _SEND:
+            with self._workers_lock:
+                target = self._workers.get(item[1])
+            if target:
+                target.send((_DELIVER, item[2]))
+        elif item[0] == _START:
+            self.start_process(item[1], item[2], [item[3]])
+        elif item[0] == _COMPLETE:
+            with self._workers_lock:
+                replaced = self._workers.get(item[1]) not in (worker, None)
+            # A replaced worker reports completion as it stops, its successor runs on
+            if replaced:
+                return
+            if item[2]:
+                ProcessFramework.output = item[3]
+            self._remove_running_process_id(item[1])
+        elif item[0] == _SHUTDOWN:
+            with self._workers_lock:
+                if self._workers.get(item[1]) is worker:
+                    del self._workers[item[1]]
+        elif item[0] == _FAILED:
+            with self._running_process_ids_lock:
+                if self._failure is None:
+                    self._failure = f"Process {item[1]} failed:\n{item[2]}"
+                self._running_process_ids_cv.notify()
+        elif item[0] == _METRICS:
+            for process_id, metrics in item[1].items():
+                DistributedSystem.get_process_metrics(process_id).add(metrics)
+        else:
+            raise ValueError(f"Invalid worker request: {item[0]}")
+
+    def _route_continuously(self):
+        # Keep going until every worker has hung up, its metrics come last
+        while self._routing or self._live_workers:
+            with self._workers_lock:
+                workers = {worker.conn: worker for worker in self._live_workers}
+            for conn in wait(list(workers.keys()), timeout=0.1):
+                worker = workers[conn]
+                try:
+                    item = conn.recv()
+                except (EOFError, OSError):
+                    self._worker_exited(worker)
+                    continue
+                self._handle(worker, item)
+
+    def _shut_down_processes(self):
+        process_kill_count = 0
+        while process_kill_count < DistributedSystem._max_process_kill_count:
+            time.sleep(DistributedSystem._process_kill_wait_time)
+            if not self._routing:
+                return
+            with self._workers_lock:
+                try:
+                    worker = random.choice(list(self._workers.values()))
+                except IndexError:
+                    return
+            worker.send((_KILL,))
+            process_kill_count += 1
+
+    def wait_for_completion(self):
+        with self._running_process_ids_lock:
+            while len(self._running_process_ids) > 0 and self._failure is None:
+                self._running_process_ids_cv.wait()
+        if self._failure is None:
+            print("[STATUS] No running processes, initiating shutdown")
+        else:
+            print("[STATUS] Process failed, initiating shutdown")
+        with self._workers_lock:
+            workers = list(self._live_workers)
+        for worker in workers:
+            worker.send((_STOP,))
+        for worker in workers:
+            worker.os_process.join(self._worker_stop_timeout)
+            if worker.os_process.is_alive():
+                worker.os_process.kill()
+        self._routing = False
+        self._router.join()
+        print("[STATUS] Distributed system shutdown complete")
+        if self._failure is not None:
+            raise RuntimeError(self._failure)
+        return ProcessFramework.output
@@ -0,0 +1,152 @@
+"""
+Goal: Hand every process the job input without copying it
+
+Usage:
+    1. Wrap the input: SharedInput.from_bytes(data) copies it into shared memory
+       once, SharedInput.from_file(path) maps a file without reading it
+    2. Pass the SharedInput to process_input, processes read it from
+       ProcessFramework.input
+    3. Send InputRef(offset, length).to_str() instead of the data, the receiver
+       reads ProcessFramework.input.view(InputRef.from_str(msg.content))
+    4. close() the SharedInput once the job is done
+
+Notes:
+    - view returns a memoryview and as_array a NumPy array over the shared bytes,
+      neither copies. NumPy is only imported by as_array
+    - Forked workers (MultiprocessBackend) inherit the mapping, and pickling a
+      SharedInput only carries the shared memory name or file path
+    - Views must be released before close() can unmap the memory
+"""
+
+from multiprocessing import shared_memory
+from typing import Union
+import mmap
+
+
+class InputRef:
+    """Window of the shared input, small enough to send in place of its bytes"""
+
+    def __init__(self, offset: int, length: int):
+        self.offset: int = offset
+        self.length: int = length
+
+    def to_str(self) -> str:
+        return f"{self.offset}~{self.length}"
+
+    @staticmethod
+    def from_str(ref_str: str):
+        offset, length = ref_str.split("~")
+        return InputRef(int(offset), int(length))
+
+
+class SharedInput:
+    def __init__(
+        self,
+        buffer: Union[mmap.mmap, memoryview],
+        length: int,
+        shm: shared_memory.SharedMemory = None,
+        file_path: str = None,
+    ):
+        """Use from_bytes or from_file"""
+        self._buffer: Union[mmap.mmap, memoryview] = buffer
+        self._length: int = length
+        self._shm: shared_memory.SharedMemory = shm
+        self._file_path: str = file_path
+        self._owner: bool = False
+
+    @staticmethod
+    def from_bytes(data: Union[bytes, bytearray, memoryview, str]):
+        """Copies data into a new shared memory block, str is stored as UTF-8"""
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        data = memoryview(data).cast("B")
+        # Shared memory blocks cannot be empty
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[: len(data)] = data
+        shared_input = SharedInput(shm.buf, len(data), shm=shm)
+        shared_input._owner = True
+        return shared_input
+
+    @staticmethod
+    def from_file(file_path: str):
+        """Maps file_path read only, pages are loaded as processes touch them"""
+        with open(file_path, "rb") as fh:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        return SharedInput(buffer, len(buffer), file_path=file_path)
+
+    @staticmethod
+    def _attach(shm_name: str, length: int):
+        shm = shared_memory.SharedMemory(name=shm_name)
+        return SharedInput(shm.buf, length, shm=shm)
+
+    def __reduce__(self):
+        if self._shm is not None:
+            return SharedInput._attach, (self._shm.name, self._length)
+        return SharedInput.from_file, (self._file_path,)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def view(self, offset: Union[int, InputRef] = 0, length: int = None) -> memoryview:
+        """Bytes [offset, offset + length), or the window an InputRef names"""
+        if isinstance(offset, InputRef):
+            offset, length = offset.offset, offset.length
+        if length is None:
+            length = self._length - offset
+        if offset < 0 or length < 0 or offset + length > self._length:
+            raise IndexError(
+                f"Window {offset}+{length} outside input of length {self._length}"
+            )
+        return memoryview(self._buffer)[offset : offset + length]
+
+    def as_array(
+        self, dtype="uint8", offset: Union[int, InputRef] = 0, count: int = -1
+    ):
+        """
+        NumPy array of count dtype items starting at byte offset, -1 for the rest
+        of the input. An InputRef gives the window in bytes instead
+        """
+        import numpy as np
+
+        if isinstance(offset, InputRef):
+            count = offset.length // np.dtype(dtype).itemsize
+            offset = offset.offset
+        return np.frombuffer(
+            self.view(0, self._length), dtype=dtype, count=count, offset=offset
+        )
+
+    def split(self, window_count: int) -> list:
+        """InputRefs covering the input in window_count near equal windows"""
+        window_size, remainder = divmod(self._length, window_count)
+        refs = []
+        offset = 0
+        for window_idx in range(window_count):
+            length = window_size + (1 if window_idx < remainder else 0)
+            refs.append(InputRef(offset, length))
+            offset += length
+        return refs
+
+    def close(self):
+        """Unmaps the input, and frees the shared memory if this process created it"""
+        if self._shm is not None:
+            self._buffer = None
+            try:
+                self._shm.close()
+            except BufferError:
+                # A view is still alive, the mapping goes when this process exits
+                pass
+            if self._owner:
+                self._shm.unlink()
+                self._owner = False
+        elif self._buffer is not None:
+            try:
+                self._buffer.close()
+            except BufferError:
+                pass
+            self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,108 @@
+"""
+Goal: Run fault scenarios in virtual time so they finish in milliseconds and replay exactly
+
+Usage:
+    1. Write processes with AsyncProcess, as for AsyncBackend
+    2. DistributedSystem.set_backend(SimulationBackend(seed=...))
+    3. define_faults, process_input and wait_for_completion as usual
+
+Notes:
+    - The event loop never sleeps: when nothing is ready it jumps the clock to the
+      next timer, so timeouts, heartbeats and kill delays cost no wall time
+    - Message deliveries are timers too, each after a random latency
+    - The seed drives every random choice made during the run (drops, kills,
+      latencies), so the same seed replays the same run
+    - Computation takes no virtual time
+"""
+
+from distributed_systems.framework import ProcessFramework
+from distributed_systems.async_process import AsyncBackend
+
+from typing import Union
+import asyncio
+import random
+import selectors
+
+
+class _VirtualClockSelector:
+    """
+    Wraps the loop's selector, waiting for I/O advances the clock instead
+
+    Simulated processes never do real I/O, so the real selector is never polled
+    """
+
+    def __init__(self, loop: "_VirtualClockLoop", selector: selectors.BaseSelector):
+        self._loop: _VirtualClockLoop = loop
+        self._selector: selectors.BaseSelector = selector
+
+    def __getattr__(self, name: str):
+        return getattr(self._selector, name)
+
+    def select(self, timeout: float = None):
+        if timeout is None:
+            # Nothing is ready and no timer is due, real time would hang forever
+            raise RuntimeError(
+                "Simulation stalled: every process waits without a timeout"
+            )
+        self._loop.virtual_time += timeout
+        return []
+
+
+class _VirtualClockLoop(asyncio.SelectorEventLoop):
+    def __init__(self):
+        self.virtual_time: float = 0.0
+        super().__init__(_VirtualClockSelector(self, selectors.DefaultSelector()))
+
+    def time(self) -> float:
+        return self.virtual_time
+
+
+class SimulationBackend(AsyncBackend):
+    def __init__(
+        self,
+        seed: int = 0,
+        min_latency: float = 0.0005,
+        max_latency: float = 0.005,
+        time_limit: float = None,
+    ):
+        """
+        min_latency, max_latency -> virtual seconds a message spends in the network
+        time_limit -> virtual seconds after which wait_for_completion raises TimeoutError
+        """
+        super().__init__()
+        self._seed: int = seed
+        self._min_latency: float = min_latency
+        self._max_latency: float = max_latency
+        self._time_limit: float = time_limit
+        self._delivered_count: int = 0
+
+    def time(self) -> float:
+        return self._loop.time() if self._loop else 0.0
+
+    def get_delivered_count(self) -> int:
+        return self._delivered_count
+
+    def msg_to_process(self, target_id: int, frame: Union[str, bytes]):
+        latency = random.uniform(self._min_latency, self._max_latency)
+        self._loop.call_later(latency, self._deliver, target_id, frame)
+
+    def _deliver(self, target_id: int, frame: Union[str, bytes]):
+        self._delivered_count += 1
+        super()._deliver(target_id, frame)
+
+    def wait_for_completion(self):
+        # Seed the module random that fault injection uses, without disturbing
+        # the caller's sequence
+        random_state = random.getstate()
+        random.seed(self._seed)
+        try:
+            with asyncio.Runner(loop_factory=_VirtualClockLoop) as runner:
+                runner.run(asyncio.wait_for(self._run(), self._time_limit))
+        finally:
+            random.setstate(random_state)
+        print(
+            f"[STATUS] Simulated {self.time():.3f} seconds, "
+            f"delivered {self._delivered_count} messages"
+        )
+        print("[STATUS] Distributed system shutdown complete")
+        return ProcessFramework.output
@@ -0,0 +1,85 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg
+from distributed_systems.async_process import AsyncProcess, AsyncBackend
+
+import asyncio
+import contextlib
+import io
+
+MSG_COUNT = 300
+
+
+class Flooder(AsyncProcess):
+    async def start(self, msg: str = None):
+        # More sends in flight than the receiver's duplicate window holds
+        await asyncio.gather(
+            *[
+                self.send_msg(1, Msg.build_msg(f"{msg_idx}"))
+                for msg_idx in range(MSG_COUNT)
+            ]
+        )
+        self.complete()
+
+
+class Collector(AsyncProcess):
+    async def start(self, msg: str = None):
+        msgs = []
+        while True:
+            msg = await self.get_one_msg(timeout=1)
+            if msg is None:
+                break
+            msgs.append(msg.content)
+        ProcessFramework.output = msgs
+        self.complete()
+
+
+class MixedSender(AsyncProcess):
+    async def start(self, msg: str = None):
+        await self.send_msg(1, Msg.build_msg("unreliable"), verify=False)
+        await self.send_msg(1, Msg.build_msg("reliable"))
+        self.complete()
+
+
+class FirstIncarnation(AsyncProcess):
+    async def start(self, msg: str = None):
+        await self.send_msg(1, Msg.build_msg("first"))
+        self.new_process(0, SecondIncarnation)
+
+
+class SecondIncarnation(AsyncProcess):
+    async def start(self, msg: str = None):
+        # Reuses sequence number 0, the new epoch keeps it from looking duplicate
+        await self.send_msg(1, Msg.build_msg("second"))
+        self.complete()
+
+
+def run_job(process_defs: list, msg_drop_prop: float = 0.0):
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(AsyncBackend())
+    DistributedSystem.define_faults(msg_drop_prop=msg_drop_prop)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(None, process_defs)
+            return DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+        DistributedSystem.define_faults()
+
+
+def test_each_msg_delivered_once_despite_drops():
+    output = run_job([Flooder, Collector], msg_drop_prop=0.3)
+    assert sorted(output, key=int) == [f"{msg_idx}" for msg_idx in range(MSG_COUNT)]
+
+
+def test_unverified_send_is_delivered():
+    assert run_job([MixedSender, Collector]) == ["unreliable", "reliable"]
+
+
+def test_revived_sender_is_not_mistaken_for_duplicate():
+    assert run_job([FirstIncarnation, Collector]) == ["first", "second"]
+
+
+if __name__ == "__main__":
+    test_each_msg_delivered_once_despite_drops()
+    test_unverified_send_is_delivered()
+    test_revived_sender_is_not_mistaken_for_duplicate()
@@ -0,0 +1,282 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import (
+    BinaryCodec,
+    JsonCodec,
+    Msg,
+    MsgType,
+    RttEstimator,
+    DuplicateWindow,
+    _pack_batch,
+    _unpack_batch,
+    _get_tree_children,
+    _get_tree_parent,
+    Process,
+)
+
+from threading import Thread
+import contextlib
+import io
+import time
+
+
+def test_binary_codec_round_trip():
+    codec = BinaryCodec()
+    msg = codec.decode(codec.encode(Msg(3, MsgType.REGULAR, "12~34", 7)))
+    assert msg.src == 3
+    assert msg.type == MsgType.REGULAR
+    assert msg.content == "12~34"
+    assert msg.ack == 7
+
+    msg = codec.decode(codec.encode(Msg(1, MsgType.REGULAR, b"\x00\xff", 2)))
+    assert msg.content == b"\x00\xff"
+
+
+def test_binary_codec_header_only_for_control_msgs():
+    codec = BinaryCodec()
+    heartbeat = codec.encode(Msg(5, MsgType.HEARTBEAT))
+    ack = codec.encode(Msg(5, MsgType.ACKNOWLEDGE, ack_msg=9))
+    assert len(heartbeat) == BinaryCodec._HEADER.size
+    assert len(ack) == BinaryCodec._HEADER.size
+    msg = codec.decode(ack)
+    assert msg.type == MsgType.ACKNOWLEDGE
+    assert msg.ack == 9
+    assert msg.content is None
+    assert msg.payload is None
+
+
+def test_binary_codec_payload_is_view_into_frame():
+    codec = BinaryCodec()
+    frame = codec.encode(Msg.build_msg(b"abcdef"))
+    msg = codec.decode(frame)
+    assert msg.payload.obj is frame
+    assert msg.payload[2:4].tobytes() == b"cd"
+
+
+def test_json_codec_round_trip():
+    codec = JsonCodec()
+    msg = codec.decode(codec.encode(Msg(2, MsgType.HEARTBEAT, None, -1)))
+    assert msg.src == 2
+    assert msg.type == MsgType.HEARTBEAT
+    assert msg.content is None
+
+    msg = codec.decode(codec.encode(Msg(2, MsgType.REGULAR, b"\x01\x02", 4)))
+    assert msg.content == b"\x01\x02"
+
+
+def test_encoding_does_not_change_msg():
+    msg = Msg.build_msg("DONE")
+    first_json = msg.to_json()
+    assert msg.type == MsgType.REGULAR
+    assert msg.to_json() == first_json
+    assert Msg.from_json(first_json).content == "DONE"
+
+
+def test_rtt_estimator_timeout():
+    estimator = RttEstimator()
+    assert estimator.get_timeout(0.1) == 0.1
+    estimator.add_sample(0.05)
+    assert abs(estimator.get_timeout(0.1) - 0.15) < 1e-9
+    for _ in range(50):
+        estimator.add_sample(0.001)
+    assert estimator.get_timeout(0.1) == RttEstimator.MIN_TIMEOUT
+    estimator.add_sample(10)
+    assert estimator.get_timeout(0.1) == RttEstimator.MAX_TIMEOUT
+
+
+def test_duplicate_window_cumulative_and_selective():
+    duplicate_window = DuplicateWindow(epoch=1, base=0)
+    for seq in [0, 1, 3, 5]:
+        assert duplicate_window.record(seq)
+    assert duplicate_window.watermark == 2
+    assert duplicate_window.get_sack() == [3, 5]
+    assert duplicate_window.record(2)
+    assert duplicate_window.watermark == 4
+    assert duplicate_window.get_sack() == [5]
+    duplicate_window.advance_to(5)
+    assert duplicate_window.watermark == 6
+    assert duplicate_window.get_sack() == []
+
+
+def test_duplicate_window_drops_duplicates():
+    duplicate_window = DuplicateWindow(epoch=1, base=10)
+    assert not duplicate_window.record(9)
+    assert duplicate_window.record(12)
+    assert not duplicate_window.record(12)
+    assert duplicate_window.record(10)
+    assert not duplicate_window.record(10)
+    assert duplicate_window.record(11)
+    assert duplicate_window.watermark == 13
+    assert duplicate_window.bitmap == 0
+
+
+def test_duplicate_window_slides_instead_of_growing():
+    duplicate_window = DuplicateWindow(epoch=1, base=0)
+    assert duplicate_window.record(1000)
+    assert duplicate_window.bitmap < (1 << DuplicateWindow.SIZE)
+    assert not duplicate_window.record(1000)
+
+
+def test_batch_round_trip():
+    codec = BinaryCodec()
+    frames = [codec.encode(Msg.build_msg(f"{idx}")) for idx in range(3)]
+    unpacked = _unpack_batch(memoryview(_pack_batch(frames)))
+    assert [codec.decode(frame).content for frame in unpacked] == ["0", "1", "2"]
+
+
+class Silent(Process):
+    def start(self, msg: str = None):
+        self.complete()
+
+
+class Watcher(Process):
+    def start(self, msg: str = None):
+        self.keep_process_alive(1, Silent, wait_time=0.2)
+        time.sleep(1)
+        self.complete()
+
+
+class Chatty(Process):
+    def start(self, msg: str = None):
+        peer = 1 - self.get_id()
+        self.send_heartbeats_to_process(peer)
+        end_time = time.time() + 3 * self.heartbeat_interval
+        while time.time() < end_time:
+            self.send_msg(peer, Msg.build_msg("BUSY"))
+        self.complete()
+
+
+class MixedSender(Process):
+    def start(self, msg: str = None):
+        self.send_msg(1, Msg.build_msg("unreliable"), verify=False)
+        self.send_msg(1, Msg.build_msg("reliable"))
+        self.send_msg(1, Msg.build_msg("reliable again"))
+        self.complete()
+
+
+class Collector(Process):
+    def start(self, msg: str = None):
+        ProcessFramework.output = [self.get_one_msg(1).content for _ in range(3)]
+        self.complete()
+
+
+class Blocked(Process):
+    def start(self, msg: str = None):
+        try:
+            self.get_one_msg()
+            ProcessFramework.output = "RETURNED"
+        except SystemExit:
+            ProcessFramework.output = "EXITED"
+
+
+COLLECTIVE_RANKS = [5, 0, 3, 1, 4, 2]
+
+
+class CollectiveMember(Process):
+    def start(self, msg: str = None):
+        ranks = COLLECTIVE_RANKS
+        rank = ranks.index(self.get_id())
+        results = [
+            self.broadcast(f"from {self.get_id()}", ranks, root=3),
+            self.scatter([f"slice {idx}" for idx in range(len(ranks))], ranks, root=1),
+            self.reduce(rank, ranks, root=4),
+            self.allreduce(rank, ranks, max),
+            # Non commutative, so only right if folded in ranks order from root
+            self.allreduce(str(rank), ranks),
+        ]
+        gathered = self.gather(results, ranks, root=2)
+        if gathered is not None:
+            ProcessFramework.output = gathered
+        self.complete()
+
+
+def run_job(process_defs: list) -> dict:
+    DistributedSystem.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(None, process_defs)
+        DistributedSystem.wait_for_completion()
+    return DistributedSystem.get_metrics()["processes"]
+
+
+def test_quiet_process_is_revived():
+    metrics = run_job([Watcher, Silent])
+    assert metrics[1]["starts"] >= 3
+
+
+def test_heartbeats_skipped_while_traffic_flows():
+    metrics = run_job([Chatty, Chatty])
+    # Only the heartbeat sent when monitoring starts
+    assert metrics[0]["heartbeats"] == 1
+    assert metrics[1]["heartbeats"] == 1
+
+
+def test_unverified_send_is_delivered_alongside_reliable_ones():
+    run_job([MixedSender, Collector])
+    assert ProcessFramework.output == ["unreliable", "reliable", "reliable again"]
+
+
+def test_stop_wakes_blocked_get_one_msg():
+    ProcessFramework.output = None
+    DistributedSystem.reset()
+    DistributedSystem.start_delivery()
+    process = Blocked(0)
+    thread = Thread(target=process.start)
+    thread.start()
+    process.stop()
+    thread.join(1)
+    assert not thread.is_alive()
+    assert ProcessFramework.output == "EXITED"
+
+
+def test_binomial_tree_covers_ranks_in_log_depth():
+    for size in range(1, 20):
+        subtree_sizes = [1] * size
+        for rel_rank in reversed(range(size)):
+            children = _get_tree_children(rel_rank, size)
+            for child in children:
+                assert _get_tree_parent(child) == rel_rank
+                subtree_sizes[rel_rank] += subtree_sizes[child]
+            # Contiguous subtrees
+            if children:
+                assert children[-1] + subtree_sizes[children[-1]] == (
+                    rel_rank + subtree_sizes[rel_rank]
+                )
+        assert subtree_sizes[0] == size
+        depth = max(bin(rel_rank).count("1") for rel_rank in range(size))
+        assert depth <= max(size - 1, 0).bit_length()
+
+
+def test_collectives_survive_drops():
+    DistributedSystem.define_faults(msg_drop_prop=0.2)
+    try:
+        run_job([CollectiveMember] * len(COLLECTIVE_RANKS))
+    finally:
+        DistributedSystem.define_faults()
+    size = len(COLLECTIVE_RANKS)
+    gathered = ProcessFramework.output
+    assert len(gathered) == size
+    for rank, results in enumerate(gathered):
+        broadcast, scatter, reduce, max_rank, concatenated = results
+        assert broadcast == "from 3"
+        assert scatter == f"slice {rank}"
+        assert reduce == (sum(range(size)) if COLLECTIVE_RANKS[rank] == 4 else None)
+        assert max_rank == size - 1
+        assert concatenated == "012345"
+
+
+if __name__ == "__main__":
+    test_binary_codec_round_trip()
+    test_binary_codec_header_only_for_control_msgs()
+    test_binary_codec_payload_is_view_into_frame()
+    test_json_codec_round_trip()
+    test_encoding_does_not_change_msg()
+    test_rtt_estimator_timeout()
+    test_duplicate_window_cumulative_and_selective()
+    test_duplicate_window_drops_duplicates()
+    test_duplicate_window_slides_instead_of_growing()
+    test_batch_round_trip()
+    test_quiet_process_is_revived()
+    test_heartbeats_skipped_while_traffic_flows()
+    test_unverified_send_is_delivered_alongside_reliable_ones()
+    test_stop_wakes_blocked_get_one_msg()
+    test_binomial_tree_covers_ranks_in_log_depth()
+    test_collectives_survive_drops()
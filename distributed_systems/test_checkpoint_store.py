@@ -0,0 +1,198 @@
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.checkpoint_store import (
+    FileCheckpointStore,
+    MemoryCheckpointStore,
+)
+from distributed_systems.failure_detector import FixedTimeoutDetector
+from distributed_systems.counting import count_primes
+
+import contextlib
+import io
+import os
+import sys
+
+import pytest
+
+
+def test_memory_store_keeps_last_save():
+    store = MemoryCheckpointStore()
+    assert store.load("1/0-10") is None
+    state = {"position": 5, "prime_count": 3}
+    store.save("1/0-10", state)
+    state["position"] = 7
+    store.save("2/0-10", {"position": 10, "prime_count": 4})
+    assert store.load("1/0-10") == {"position": 5, "prime_count": 3}
+    store.save("1/0-10", state)
+    assert store.load("1/0-10") == {"position": 7, "prime_count": 3}
+
+
+def test_file_store_survives_reopen(tmp_path):
+    store = FileCheckpointStore(str(tmp_path))
+    store.save("1/0-10", {"position": 5, "prime_count": 3})
+    store.save("1/0-10", {"position": 10, "prime_count": 4})
+    assert FileCheckpointStore(str(tmp_path)).load("1/0-10") == {
+        "position": 10,
+        "prime_count": 4,
+    }
+    assert store.load("2/0-10") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+class CrashingCounter(count_primes.Counter):
+    """Process 2 crashes once, right after its first checkpoint partway through"""
+
+    crashed: bool = False
+
+    def get_counter_def(self) -> type:
+        return CrashingCounter
+
+    def save_checkpoint(self, name: str, state):
+        super().save_checkpoint(name, state)
+        if (
+            self.get_id() == 2
+            and not CrashingCounter.crashed
+            and state["position"] < self.process_end
+        ):
+            CrashingCounter.crashed = True
+            self.shutdown(premature=True)
+            sys.exit()
+
+
+class CrashingFirstCounter(count_primes.FirstCounterLogic, CrashingCounter):
+    pass
+
+
+class CrashingStealingCounter(count_primes.StealingCounter):
+    """Crashes once, right after its first checkpoint partway through a unit"""
+
+    crashed: bool = False
+
+    def save_checkpoint(self, name: str, state):
+        super().save_checkpoint(name, state)
+        if state["unit"] is not None and not CrashingStealingCounter.crashed:
+            CrashingStealingCounter.crashed = True
+            self.shutdown(premature=True)
+            sys.exit()
+
+
+class CrashingCounterScheduler(count_primes.PrimeScheduler):
+    worker_count = 1
+
+    def get_counter_def(self) -> type:
+        return CrashingStealingCounter
+
+
+def run_ring(system_input: int, first_counter_def=count_primes.FirstCounter) -> int:
+    DistributedSystem.reset()
+    with contextlib.redirect_stdout(io.StringIO()):
+        DistributedSystem.process_input(system_input, [first_counter_def])
+        return DistributedSystem.wait_for_completion()
+
+
+def revive_after(wait_time: float):
+    """Failure detection that revives after wait_time, whatever the process asks"""
+    DistributedSystem.define_failure_detection(
+        lambda _, heartbeat_interval: FixedTimeoutDetector(
+            wait_time, heartbeat_interval
+        )
+    )
+
+
+def test_counters_resume_from_checkpoints():
+    bite_size = count_primes.BITE_SIZE
+    checkpoint_interval = count_primes.CHECKPOINT_INTERVAL
+    count_primes.BITE_SIZE = 1000
+    count_primes.CHECKPOINT_INTERVAL = 300
+    store = MemoryCheckpointStore()
+    DistributedSystem.define_checkpoints(store)
+    try:
+        assert run_ring(3000) == 430
+        assert store.load("2/2000-3000") == {
+            "position": 3000,
+            "prime_count": count_primes.count_primes(2000, 3000),
+        }
+
+        # Counters that find a finished checkpoint count nothing again
+        sieve = count_primes.count_primes
+        counted_ranges = []
+
+        def record_count(range_start, range_end):
+            counted_ranges.append((range_start, range_end))
+            return sieve(range_start, range_end)
+
+        count_primes.count_primes = record_count
+        try:
+            assert run_ring(3000) == 430
+        finally:
+            count_primes.count_primes = sieve
+        assert counted_ranges == []
+    finally:
+        DistributedSystem.define_checkpoints()
+        count_primes.BITE_SIZE = bite_size
+        count_primes.CHECKPOINT_INTERVAL = checkpoint_interval
+
+
+# Crashed counters exit their thread with SystemExit
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_killed_counter_resumes_mid_range():
+    bite_size = count_primes.BITE_SIZE
+    count_primes.BITE_SIZE = 1000
+    DistributedSystem.define_checkpoints(MemoryCheckpointStore())
+    revive_after(2)
+    sieve = count_primes.count_primes
+    counted_ranges = []
+
+    def record_count(range_start, range_end):
+        counted_ranges.append((range_start, range_end))
+        return sieve(range_start, range_end)
+
+    count_primes.count_primes = record_count
+    CrashingCounter.crashed = False
+    try:
+        # Default CHECKPOINT_INTERVAL, the interval comes from the range size
+        assert run_ring(3000, CrashingFirstCounter) == 430
+    finally:
+        count_primes.count_primes = sieve
+        DistributedSystem.define_checkpoints()
+        DistributedSystem.define_failure_detection()
+        count_primes.BITE_SIZE = bite_size
+    assert CrashingCounter.crashed
+    # Crashed after checkpointing 2250, revived from there rather than from 2000
+    assert [
+        counted_range for counted_range in counted_ranges if counted_range[0] >= 2000
+    ] == [(2000, 2250), (2250, 2500), (2500, 2750), (2750, 3000)]
+
+
+# Crashed counters exit their thread with SystemExit
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_killed_stealing_counter_resumes_mid_unit():
+    unit_grain = count_primes.UNIT_GRAIN
+    count_primes.UNIT_GRAIN = 1000
+    DistributedSystem.define_checkpoints(MemoryCheckpointStore())
+    revive_after(2)
+    count_primes_at = count_primes.count_primes_at
+    counted_grains = []
+
+    def record_count(range_start, range_end, points):
+        counted_grains.append(range_start)
+        return count_primes_at(range_start, range_end, points)
+
+    count_primes.count_primes_at = record_count
+    CrashingStealingCounter.crashed = False
+    try:
+        assert run_ring(200_000, CrashingCounterScheduler) == 17984
+    finally:
+        count_primes.count_primes_at = count_primes_at
+        DistributedSystem.define_checkpoints()
+        DistributedSystem.define_failure_detection()
+        count_primes.UNIT_GRAIN = unit_grain
+    assert CrashingStealingCounter.crashed
+    # The only counter resumed its unit at the checkpoint, so no grain twice
+    assert sorted(counted_grains) == list(range(0, 200_000, 1000))
+
+
+if __name__ == "__main__":
+    test_memory_store_keeps_last_save()
+    test_counters_resume_from_checkpoints()
+    test_killed_counter_resumes_mid_range()
+    test_killed_stealing_counter_resumes_mid_unit()
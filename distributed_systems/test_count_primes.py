@@ -0,0 +1,118 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.counting import count_primes
+
+import contextlib
+import io
+import time
+
+
+def test_sieve_matches_trial_division():
+    for range_start, range_end in [(0, 2), (0, 3), (0, 1000), (997, 1010), (5, 5)]:
+        expected = sum(
+            count_primes.check_prime(num) for num in range(range_start, range_end)
+        )
+        assert count_primes.count_primes(range_start, range_end) == expected
+
+
+def test_sieve_across_segments():
+    segment_size = count_primes.SEGMENT_SIZE
+    count_primes.SEGMENT_SIZE = 64
+    try:
+        assert count_primes.count_primes(0, 10_000) == 1229
+        assert count_primes.count_primes(9_000, 10_000) == 1229 - 1117
+    finally:
+        count_primes.SEGMENT_SIZE = segment_size
+
+
+def test_known_prime_counts():
+    assert count_primes.count_primes(0, 10**6) == 78498
+    assert count_primes.count_primes(0, 10**7) == 664579
+    # Base primes for 10^9 without sieving below it
+    expected = sum(count_primes.check_prime(num) for num in range(10**9, 10**9 + 100))
+    assert count_primes.count_primes(10**9, 10**9 + 100) == expected
+
+
+def test_scheduler_counts_each_range_once():
+    ProcessFramework.set_input(100)
+    scheduler = count_primes.PrimeScheduler(0)
+    scheduler.uncovered = [[0, 100]]
+    scheduler.counted_units = []
+    scheduler.prime_count = 0
+    scheduler.leases = {1: count_primes.UnitLease(0, 40, time.monotonic())}
+    assert scheduler.find_pending() == (40, 100)
+    assert scheduler.add_count(40, 100, 13)
+    # Counted again by a thief, or overlapping a counted range
+    assert not scheduler.add_count(40, 100, 13)
+    assert not scheduler.add_count(30, 50, 3)
+    assert scheduler.find_pending() is None
+    assert scheduler.add_count(0, 40, 12)
+    assert scheduler.uncovered == [] and scheduler.prime_count == 25
+    ProcessFramework.set_input(None)
+
+
+def test_steal_cuts_slowest_unit_on_grain_grid():
+    unit_grain = count_primes.UNIT_GRAIN
+    count_primes.UNIT_GRAIN = 10
+    try:
+        scheduler = count_primes.PrimeScheduler(0)
+        scheduler.cost = 0.01
+        scheduler.worker_costs = {1: 0.01, 2: 0.01}
+        now = time.monotonic()
+        # 1 has counted about 30 of 100 numbers, 2 about 50 of 60
+        scheduler.leases = {
+            1: count_primes.UnitLease(0, 100, now - 0.3),
+            2: count_primes.UnitLease(100, 160, now - 0.5),
+        }
+        scheduler.send_msg_async = lambda target, msg: None
+        with contextlib.redirect_stdout(io.StringIO()):
+            assert scheduler.steal_unit(3, now) == (70, 100)
+        assert scheduler.leases[1].end == 70
+    finally:
+        count_primes.UNIT_GRAIN = unit_grain
+
+
+def test_scheduler_job():
+    unit_grain = count_primes.UNIT_GRAIN
+    count_primes.UNIT_GRAIN = 1000
+    count_primes.PrimeScheduler.worker_count = 3
+    DistributedSystem.reset()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(50_000, [count_primes.PrimeScheduler])
+            output = DistributedSystem.wait_for_completion()
+    finally:
+        count_primes.UNIT_GRAIN = unit_grain
+        count_primes.PrimeScheduler.worker_count = 4
+    assert output == 5133
+
+
+def test_lucy_matches_sieve():
+    for x in [0, 1, 2, 3, 4, 26, 27, 28, 1000, 99_991, 128_834]:
+        assert count_primes.count_primes_lucy(x) == count_primes.count_primes(0, x + 1)
+    assert count_primes.count_primes_lucy(10**10) == 455052511
+
+
+def test_scheduler_lucy_job():
+    unit_grain = count_primes.UNIT_GRAIN
+    count_primes.UNIT_GRAIN = 64
+    count_primes.PrimeScheduler.method = count_primes.LUCY
+    DistributedSystem.reset()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(128_834, [count_primes.PrimeScheduler])
+            output = DistributedSystem.wait_for_completion()
+    finally:
+        count_primes.UNIT_GRAIN = unit_grain
+        count_primes.PrimeScheduler.method = count_primes.SIEVE
+    assert output == count_primes.count_primes(0, 128_834) == 12059
+
+
+if __name__ == "__main__":
+    test_sieve_matches_trial_division()
+    test_sieve_across_segments()
+    test_known_prime_counts()
+    test_scheduler_counts_each_range_once()
+    test_steal_cuts_slowest_unit_on_grain_grid()
+    test_scheduler_job()
+    test_lucy_matches_sieve()
+    test_scheduler_lucy_job()
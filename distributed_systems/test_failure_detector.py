@@ -0,0 +1,119 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg
+from distributed_systems.async_process import AsyncProcess
+from distributed_systems.simulation import SimulationBackend
+from distributed_systems.failure_detector import (
+    FixedTimeoutDetector,
+    PhiAccrualDetector,
+)
+
+import asyncio
+import contextlib
+import io
+import random
+
+
+def feed_heartbeats(detector, gaps: list) -> float:
+    now = 0.0
+    detector.reset(now)
+    for gap in gaps:
+        now += gap
+        detector.heartbeat(now)
+    return now
+
+
+class Watcher(AsyncProcess):
+    async def start(self, msg: str = None):
+        self.keep_process_alive(1, Beater, "REVIVED")
+        await self.get_one_msg()
+        self.complete()
+
+
+class Beater(AsyncProcess):
+    crash_time: float = None
+
+    async def start(self, msg: str = None):
+        now = asyncio.get_running_loop().time()
+        if msg == "REVIVED":
+            ProcessFramework.output = now - Beater.crash_time
+            await self.send_msg(0, Msg.build_msg("DONE"))
+            self.complete()
+            return
+        self.send_heartbeats_to_process(0)
+        await asyncio.sleep(20)
+        Beater.crash_time = asyncio.get_running_loop().time()
+        self.shutdown(premature=True)
+
+
+def measure_recovery_time(detector_def: type) -> float:
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(SimulationBackend())
+    DistributedSystem.define_failure_detection(detector_def)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(None, [Watcher, Beater])
+            return DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+        DistributedSystem.define_failure_detection()
+
+
+def test_phi_suspects_steady_sender_within_a_few_intervals():
+    detector = PhiAccrualDetector(5, 1.0)
+    last_arrival_time = feed_heartbeats(
+        detector, [random.uniform(0.99, 1.01) for _ in range(50)]
+    )
+    quiet_time = detector.get_suspicion_time() - last_arrival_time
+    assert 1 < quiet_time < 4
+    assert detector.get_phi(last_arrival_time + quiet_time) >= detector.threshold
+    assert detector.get_phi(last_arrival_time + 1) < 1
+
+
+def test_phi_tolerates_longer_silence_on_lossy_link():
+    clean_detector = PhiAccrualDetector(10, 1.0)
+    clean_last_arrival_time = feed_heartbeats(clean_detector, [1.0] * 50)
+    lossy_detector = PhiAccrualDetector(10, 1.0)
+    lossy_last_arrival_time = feed_heartbeats(lossy_detector, [1.0] * 40 + [2.0] * 5)
+    assert (
+        lossy_detector.get_suspicion_time() - lossy_last_arrival_time
+        > clean_detector.get_suspicion_time() - clean_last_arrival_time + 1
+    )
+
+
+def test_phi_short_clean_window_does_not_rule_out_loss():
+    detector = PhiAccrualDetector(10, 1.0)
+    last_arrival_time = feed_heartbeats(detector, [1.0] * 10)
+    short_quiet_time = detector.get_suspicion_time() - last_arrival_time
+    last_arrival_time = feed_heartbeats(detector, [1.0] * 100)
+    long_quiet_time = detector.get_suspicion_time() - last_arrival_time
+    # Ten heartbeats in a row also happen on a link dropping one in ten
+    assert short_quiet_time > 3
+    assert long_quiet_time < short_quiet_time
+
+
+def test_phi_ignores_gaps_from_regular_traffic():
+    detector = PhiAccrualDetector(5, 1.0)
+    last_arrival_time = feed_heartbeats(detector, [1.0] * 10)
+    quiet_time = detector.get_suspicion_time() - last_arrival_time
+    detector = PhiAccrualDetector(5, 1.0)
+    last_arrival_time = feed_heartbeats(detector, [1.0] * 10 + [0.001] * 1000)
+    assert detector.get_suspicion_time() - last_arrival_time == quiet_time
+
+    # A revived process gets wait_time to send its first frame
+    detector.reset(last_arrival_time)
+    assert detector.get_suspicion_time() == last_arrival_time + 5
+
+
+def test_phi_revives_crashed_process_sooner():
+    fixed_recovery_time = measure_recovery_time(FixedTimeoutDetector)
+    phi_recovery_time = measure_recovery_time(PhiAccrualDetector)
+    assert 3 < fixed_recovery_time <= 5
+    assert phi_recovery_time < 3
+
+
+if __name__ == "__main__":
+    test_phi_suspects_steady_sender_within_a_few_intervals()
+    test_phi_tolerates_longer_silence_on_lossy_link()
+    test_phi_short_clean_window_does_not_rule_out_loss()
+    test_phi_ignores_gaps_from_regular_traffic()
+    test_phi_revives_crashed_process_sooner()
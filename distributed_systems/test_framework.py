@@ -0,0 +1,151 @@
+from distributed_systems.framework import (
+    ProcessFramework,
+    DistributedSystem,
+    LatencyHistogram,
+    MsgDispatcher,
+    ProcessMetrics,
+)
+from distributed_systems.base_process import Msg, Process
+
+import contextlib
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+MSG_COUNT = 50
+
+
+class Sender(Process):
+    def start(self, msg: str = None):
+        for msg_idx in range(MSG_COUNT):
+            self.send_msg(1, Msg.build_msg(f"{msg_idx}"))
+        self.complete()
+
+
+class Receiver(Process):
+    def start(self, msg: str = None):
+        msg_sum = 0
+        for _ in range(MSG_COUNT):
+            msg_sum += int(self.get_one_msg().content)
+        ProcessFramework.output = msg_sum
+        self.complete()
+
+
+class Recorder(ProcessFramework):
+    """Keeps what the dispatcher delivers, read_msg is the only entry point"""
+
+    def __init__(self, id: int):
+        super().__init__(id)
+        self.msgs: list = []
+
+    def start(self, msg: str = None):
+        pass
+
+    def read_msg(self, msg: str):
+        self.msgs.append(msg)
+
+
+def test_dispatcher_orders_per_target_and_skips_dead_processes():
+    DistributedSystem.reset()
+    dispatcher = MsgDispatcher(thread_count=3)
+    live_processes = [Recorder(process_id) for process_id in range(4)]
+    dead_process = Recorder(4)
+    dead_process.stop()
+    for msg_idx in range(200):
+        for process in live_processes + [dead_process]:
+            dispatcher.dispatch(process, f"{msg_idx}")
+    deadline = time.time() + 5
+    while dispatcher.get_delivered_count() < 1000 and time.time() < deadline:
+        time.sleep(0.01)
+    dispatcher.stop()
+
+    for process in live_processes:
+        assert process.msgs == [f"{msg_idx}" for msg_idx in range(200)]
+    assert dead_process.msgs == []
+    assert dead_process.metrics.received == 0
+    # Dropped deliveries to the dead process still pass through a dispatcher thread
+    assert dispatcher.get_delivered_count() == 1000
+    rate = dispatcher.get_delivery_rate()
+    assert rate > 0
+    time.sleep(0.05)
+    assert dispatcher.get_delivery_rate() == rate
+
+
+def test_latency_histogram_percentiles_and_merge():
+    histogram = LatencyHistogram()
+    for _ in range(99):
+        histogram.record(0.001)
+    histogram.record(0.5)
+    assert histogram.get_count() == 100
+    assert 0.001 <= histogram.get_percentile(50) < 0.002
+    assert histogram.get_percentile(100) >= 0.5
+
+    merged = LatencyHistogram()
+    merged.add(histogram.to_dict())
+    merged.add(histogram.to_dict())
+    assert merged.counts == [count * 2 for count in histogram.counts]
+    assert merged.max == histogram.max
+
+
+def test_job_metrics_dumped_on_completion():
+    DistributedSystem.reset()
+    DistributedSystem.define_faults(msg_drop_prop=0.2)
+    dump_path = os.path.join(tempfile.mkdtemp(), "metrics.json")
+    DistributedSystem.define_metrics(dump_path)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(None, [Sender, Receiver])
+            output = DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.define_faults()
+        DistributedSystem.define_metrics()
+    assert output == sum(range(MSG_COUNT))
+
+    with open(dump_path) as fh:
+        metrics = json.load(fh)
+    sender, receiver = metrics["processes"]["0"], metrics["processes"]["1"]
+    assert sender["starts"] == 1
+    assert sender["ack_latency"]["count"] == MSG_COUNT
+    assert sender["sent"] >= MSG_COUNT
+    assert receiver["received"] >= MSG_COUNT
+    assert receiver["blocked_seconds"] > 0
+    assert receiver["inbox_high_water"] >= 1
+    totals = metrics["totals"]
+    assert totals["sent"] == sender["sent"] + receiver["sent"]
+    assert totals["received"] + totals["dropped"] <= totals["sent"]
+
+
+def test_metrics_merge_keeps_high_water_marks():
+    metrics = ProcessMetrics()
+    metrics.sent = 3
+    metrics.inbox_high_water = 7
+    merged = ProcessMetrics()
+    merged.inbox_high_water = 9
+    merged.add(metrics.to_dict())
+    merged.add(metrics.to_dict())
+    assert merged.sent == 6
+    assert merged.inbox_high_water == 9
+    assert "focused_inbox_high_water" not in merged.to_dict()
+
+
+def test_reset_stops_dispatcher_threads():
+    DistributedSystem.reset()
+    thread_count = threading.active_count()
+    for _ in range(5):
+        DistributedSystem.start_delivery()
+        DistributedSystem.reset()
+    deadline = time.time() + 1
+    while threading.active_count() > thread_count and time.time() < deadline:
+        time.sleep(0.01)
+    assert threading.active_count() <= thread_count
+
+
+if __name__ == "__main__":
+    test_dispatcher_orders_per_target_and_skips_dead_processes()
+    test_latency_histogram_percentiles_and_merge()
+    test_job_metrics_dumped_on_completion()
+    test_metrics_merge_keeps_high_water_marks()
+    test_reset_stops_dispatcher_threads()
@@ -0,0 +1,85 @@
+from distributed_systems.tfidf.inverted_index import InvertedIndex, BM25, TFIDF
+
+import math
+import random
+
+import numpy as np
+
+TERM_DOC_FREQ = {
+    "CAT": {0: 2, 3: 1},
+    "DOG": {1: 1, 0: 1},
+    "BIRD": {2: 4},
+}
+
+
+def test_postings_are_sorted_views():
+    index = InvertedIndex.from_term_doc_freq(TERM_DOC_FREQ)
+    doc_ids, counts = index.get_postings("DOG")
+    assert doc_ids.tolist() == [0, 1]
+    assert counts.tolist() == [1, 1]
+    assert doc_ids.base is not None
+    assert len(index.get_postings("MOUSE")[0]) == 0
+    assert index.doc_lengths.tolist() == [3, 1, 4, 1]
+    assert index.get_doc_freqs().tolist() == [1, 2, 2]
+
+
+def test_weights_match_formulas():
+    index = InvertedIndex.from_term_doc_freq(TERM_DOC_FREQ)
+    doc_ids, _ = index.get_postings("CAT")
+    cat_weights = index.get_weights(TFIDF)[
+        index.term_offsets[1] : index.term_offsets[2]
+    ]
+    idf = math.log(5 / 3) + 1
+    assert np.allclose(cat_weights, [2 / 3 * idf, 1 / 1 * idf])
+
+    bm25_weight = index.get_weights(BM25)[index.term_offsets[0]]
+    avg_doc_length = 9 / 4
+    norm = 1 - 0.75 + 0.75 * 4 / avg_doc_length
+    expected = math.log(1 + 3.5 / 1.5) * 4 * 2.2 / (4 + 1.2 * norm)
+    assert math.isclose(bm25_weight, expected, rel_tol=1e-5)
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(3)
+    term_doc_freq = {}
+    for doc_id in range(200):
+        for _ in range(rng.randint(1, 8)):
+            freq_in_docs = term_doc_freq.setdefault(f"W{rng.randint(0, 30)}", {})
+            freq_in_docs[doc_id] = freq_in_docs.get(doc_id, 0) + 1
+    index = InvertedIndex.from_term_doc_freq(term_doc_freq)
+    weights = index.get_weights(BM25)
+    expected_scores = {}
+    for term in ["W1", "W2", "W7"]:
+        term_id = index.terms.index(term)
+        for posting_idx in range(
+            index.term_offsets[term_id], index.term_offsets[term_id + 1]
+        ):
+            doc_id = int(index.doc_ids[posting_idx])
+            expected_scores[doc_id] = (
+                expected_scores.get(doc_id, 0) + weights[posting_idx]
+            )
+    results = index.query("w1 w2, w7 unknown", k=5)
+    expected = sorted(expected_scores.items(), key=lambda item: (-item[1], item[0]))[:5]
+    assert [doc_id for doc_id, _ in results] == [doc_id for doc_id, _ in expected]
+    assert np.allclose(
+        [score for _, score in results], [score for _, score in expected]
+    )
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = InvertedIndex.from_term_doc_freq(TERM_DOC_FREQ)
+    index.get_weights(BM25)
+    index.save(str(tmp_path))
+    loaded_index = InvertedIndex.load(str(tmp_path))
+    assert loaded_index.terms == index.terms
+    assert isinstance(loaded_index.doc_ids, np.memmap)
+    assert loaded_index.query("cat dog") == index.query("cat dog")
+    assert loaded_index.query("bird", scoring=TFIDF) == index.query(
+        "bird", scoring=TFIDF
+    )
+
+
+if __name__ == "__main__":
+    test_postings_are_sorted_views()
+    test_weights_match_formulas()
+    test_query_matches_brute_force()
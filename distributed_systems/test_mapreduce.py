@@ -0,0 +1,199 @@
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.mapreduce import (
+    MapReduceCoordinator,
+    MapReduceJob,
+    MapTask,
+    merge_partition,
+)
+from distributed_systems.counting import count_words
+from distributed_systems.tfidf import tfidf
+from distributed_systems.tfidf.inverted_index import InvertedIndex
+
+from utils.string_cleaning import sentence_to_list
+
+import contextlib
+import io
+import json
+import os
+import random
+import time
+
+import numpy as np
+
+
+class Letters(MapReduceJob):
+    reducer_count = 3
+    split_size = 4
+    heartbeat_timeout = 2
+    max_running_map_tasks = 2
+
+    def map(self, word: str):
+        for letter in word:
+            yield letter, 1
+
+    def reduce(self, letter: str, counts: list) -> int:
+        return sum(counts)
+
+
+class LettersCoordinator(MapReduceCoordinator):
+    job_def = Letters
+
+
+class CrashingMapTask(MapTask):
+    # Split starts whose first attempt crashes
+    crashing_tasks: set = set()
+
+    def start(self, msg: str = None):
+        split_start, _ = json.loads(msg)["TASK"]
+        if split_start in CrashingMapTask.crashing_tasks:
+            CrashingMapTask.crashing_tasks.remove(split_start)
+            # Stops its messages and heartbeats like a hardware failure would
+            self.shutdown(premature=True)
+            return
+        super().start(msg)
+
+
+class CrashingLettersCoordinator(LettersCoordinator):
+    map_task_def = CrashingMapTask
+
+
+class SlowLetters(Letters):
+    # Split start -> mapper attempts, a restart would make it 2
+    attempts: dict = {}
+
+    def read_split(self, task):
+        split_start, _ = task
+        SlowLetters.attempts[split_start] = SlowLetters.attempts.get(split_start, 0) + 1
+        # Maps for longer than heartbeat_timeout while heartbeats keep flowing
+        time.sleep(self.heartbeat_timeout * 1.5)
+        return super().read_split(task)
+
+
+class SlowLettersCoordinator(MapReduceCoordinator):
+    job_def = SlowLetters
+
+
+class MergedLetters(Letters):
+    def combine(self, letter: str, counts: list) -> int:
+        return sum(counts)
+
+    def reduce(self, letter: str, counts: list) -> tuple:
+        return sum(counts), len(counts)
+
+
+class MergedLettersCoordinator(MapReduceCoordinator):
+    job_def = MergedLetters
+
+
+class SmallSplitTermDocFreq(tfidf.TermDocFreq):
+    split_size = 100
+
+
+class SmallSplitTfidfCoordinator(MapReduceCoordinator):
+    job_def = SmallSplitTermDocFreq
+
+
+def run_job(coordinator_def: type, system_input, **faults):
+    DistributedSystem.reset()
+    DistributedSystem.define_faults(**faults)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(system_input, [coordinator_def])
+            return DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.define_faults()
+
+
+def test_count_words_with_drops():
+    words = [random.choice(["cat", "dog", "bird"]) for _ in range(200)]
+    output = run_job(count_words.Initializer, words, msg_drop_prop=0.1)
+    assert output == {word: words.count(word) for word in set(words)}
+
+
+def test_partition_is_stable():
+    job = count_words.WordCount()
+    assert {job.partition("cat") for _ in range(10)} == {job.partition("cat")}
+    assert 0 <= job.partition(("a", 1)) < job.reducer_count
+
+
+def test_failed_map_task_is_retried_without_double_counting():
+    words = ["abc", "bcd", "cde", "def"] * 4
+    CrashingMapTask.crashing_tasks = {0, 8}
+    output = run_job(CrashingLettersCoordinator, words)
+    assert not CrashingMapTask.crashing_tasks
+    assert output == {letter: "".join(words).count(letter) for letter in "abcdef"}
+
+
+def test_split_slower_than_heartbeat_timeout_completes_once():
+    words = ["abc", "bcd", "cde", "def"] * 2
+    SlowLetters.attempts = {}
+    output = run_job(SlowLettersCoordinator, words)
+    assert SlowLetters.attempts == {0: 1, 4: 1}
+    assert output == {letter: "".join(words).count(letter) for letter in "abcdef"}
+
+
+def test_reducer_merges_partitions_as_they_arrive():
+    words = ["abc", "bcd", "cde", "def"] * 8
+    output = run_job(MergedLettersCoordinator, words)
+    # One accumulated value per key no matter how many map tasks sent it
+    assert output == {letter: ("".join(words).count(letter), 1) for letter in "abcdef"}
+
+
+def test_postings_runs_are_merged_once_in_reduce():
+    job = tfidf.TermDocFreq()
+    key_values = {}
+    # Partitions arrive out of doc id order, one run per map task
+    for task_idx in reversed(range(50)):
+        doc_ids = np.arange(task_idx * 10, task_idx * 10 + 10, 2, dtype=np.int32)
+        merge_partition(job, key_values, {"cat": [(doc_ids, np.ones_like(doc_ids))]})
+    assert len(key_values["cat"]) == 50
+    doc_ids, counts = job.reduce("cat", key_values["cat"])
+    assert doc_ids.tolist() == list(range(0, 500, 2))
+    assert counts.tolist() == [1] * 250
+
+
+def test_line_aligned_splits_cover_every_doc_once(tmp_path):
+    file_path = tmp_path / "docs.txt"
+    file_path.write_bytes(b"one\n\ntwo words\nno newline at end")
+    docs = ["one\n", "\n", "two words\n", "no newline at end"]
+    for split_size in [1, 5, 14, 1000]:
+        job = SmallSplitTermDocFreq()
+        job.split_size = split_size
+        tasks = job.split([str(file_path), str(file_path)])
+        records = [record for task in tasks for record in tfidf.read_docs(task)]
+        assert records == list(enumerate(docs + docs))
+
+
+def test_tfidf_matches_serial_count():
+    raw_data_dir = os.path.join(os.path.dirname(tfidf.__file__), "raw_data")
+    file_paths = [
+        os.path.join(raw_data_dir, file_name)
+        for file_name in sorted(os.listdir(raw_data_dir))
+    ]
+    term_freq = {}
+    doc_id = 0
+    for file_path in file_paths:
+        with open(file_path, "r") as fh:
+            for doc in fh:
+                for word in sentence_to_list(doc):
+                    freq_in_docs = term_freq.setdefault(word, {})
+                    freq_in_docs[doc_id] = freq_in_docs.get(doc_id, 0) + 1
+                doc_id += 1
+    term_postings = run_job(tfidf.Initializer, file_paths, msg_drop_prop=0.1)
+    assert InvertedIndex.from_postings(term_postings).to_term_doc_freq() == term_freq
+    # Several splits per file, merged as sorted runs
+    term_postings = run_job(SmallSplitTfidfCoordinator, file_paths)
+    assert all(
+        (doc_ids[1:] > doc_ids[:-1]).all() for doc_ids, _ in term_postings.values()
+    )
+    assert InvertedIndex.from_postings(term_postings).to_term_doc_freq() == term_freq
+
+
+if __name__ == "__main__":
+    test_count_words_with_drops()
+    test_partition_is_stable()
+    test_failed_map_task_is_retried_without_double_counting()
+    test_split_slower_than_heartbeat_timeout_completes_once()
+    test_reducer_merges_partitions_as_they_arrive()
+    test_postings_runs_are_merged_once_in_reduce()
+    test_tfidf_matches_serial_count()
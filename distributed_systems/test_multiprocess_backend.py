@@ -0,0 +1,120 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, Process
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+from distributed_systems.shared_input import SharedInput
+from distributed_systems.counting import count_primes, count1s
+
+import contextlib
+import io
+import os
+import time
+
+import pytest
+
+
+class Accumulator(Process):
+    def start(self, msg: str = None):
+        ProcessFramework.output += 1
+        self.complete()
+
+
+class Ticker(Process):
+    """Sends its OS pid to process 0 until told to stop"""
+
+    def start(self, msg: str = None):
+        while self.get_one_msg(0.05) is None:
+            self.send_msg(0, Msg.build_msg(f"{os.getpid()}"))
+        self.complete()
+
+
+class Restarter(Process):
+    def start(self, msg: str = None):
+        self.new_process(1, Ticker)
+        first_pid = self.get_one_msg().content
+        # Revives 1 while it is still running, like a false suspicion would
+        self.new_process(1, Ticker)
+        # Let ticks already sent by the first instance drain
+        time.sleep(0.5)
+        while self.get_one_msg(0) is not None:
+            pass
+        pids = {self.get_one_msg().content for _ in range(10)}
+        self.send_msg(1, Msg.build_msg("DONE"))
+        ProcessFramework.output = (first_pid, pids)
+        self.complete()
+
+
+def run_multiprocess(process_defs: list, input, **faults):
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(MultiprocessBackend())
+    DistributedSystem.define_faults(**faults)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            DistributedSystem.process_input(input, process_defs)
+            return DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+        DistributedSystem.define_faults()
+
+
+def test_count_primes_survives_kill():
+    bite_size = count_primes.BITE_SIZE
+    count_primes.BITE_SIZE = 1000
+    try:
+        output = run_multiprocess(
+            [count_primes.FirstCounter],
+            4000,
+            max_process_kill_count=1,
+            process_kill_wait_time=0.5,
+        )
+    finally:
+        count_primes.BITE_SIZE = bite_size
+    assert output == count_primes.count_primes(0, 4000)
+
+
+def test_prime_scheduler_survives_kill():
+    # Long enough for the kill to land, whether on the scheduler or a counter
+    output = run_multiprocess(
+        [count_primes.PrimeScheduler],
+        50_000_000,
+        max_process_kill_count=1,
+        process_kill_wait_time=0.2,
+    )
+    assert output == 3001134
+
+
+def test_raising_process_fails_job():
+    # Accumulating into ProcessFramework.output, which each OS process only
+    # sees as None
+    start_time = time.time()
+    with pytest.raises(RuntimeError, match="TypeError"):
+        run_multiprocess([Accumulator, Accumulator], None)
+    assert time.time() - start_time < 10
+
+
+def test_count1s_tree_reduction():
+    data = b"0110111" * 10_000
+    worker_count = count1s.WORKER_COUNT
+    count1s.WORKER_COUNT = 5
+    try:
+        with SharedInput.from_bytes(data) as shared_input:
+            output = run_multiprocess(
+                [count1s.Manager] + [count1s.Worker] * count1s.WORKER_COUNT,
+                shared_input,
+            )
+    finally:
+        count1s.WORKER_COUNT = worker_count
+    assert output == data.count(b"1")
+
+
+def test_revived_running_process_replaces_old_worker():
+    first_pid, pids = run_multiprocess([Restarter], None)
+    # Only the new instance still ticks
+    assert len(pids) == 1 and first_pid not in pids
+
+
+if __name__ == "__main__":
+    test_count_primes_survives_kill()
+    test_prime_scheduler_survives_kill()
+    test_raising_process_fails_job()
+    test_count1s_tree_reduction()
+    test_revived_running_process_replaces_old_worker()
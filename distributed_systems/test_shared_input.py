@@ -0,0 +1,98 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.base_process import Msg, Process
+from distributed_systems.multiprocess_backend import MultiprocessBackend
+from distributed_systems.shared_input import InputRef, SharedInput
+
+import contextlib
+import io
+import pickle
+
+import pytest
+
+
+class WindowSummer(Process):
+    def start(self, msg: str = None):
+        if self.get_id() == 0:
+            self.new_process(1, WindowSummer)
+            window_refs = ProcessFramework.input.split(3)
+            for window_ref in window_refs:
+                self.send_msg(1, Msg.build_msg(window_ref.to_str()))
+            ProcessFramework.output = sum(
+                int(self.get_one_msg().content) for _ in window_refs
+            )
+        else:
+            for _ in range(3):
+                window_ref = InputRef.from_str(self.get_one_msg().content)
+                window_sum = sum(ProcessFramework.input.view(window_ref))
+                self.send_msg(0, Msg.build_msg(f"{window_sum}"))
+        self.complete()
+
+
+def test_view_is_window_into_shared_memory():
+    with SharedInput.from_bytes("abcdef") as shared_input:
+        assert len(shared_input) == 6
+        window = shared_input.view(InputRef.from_str(InputRef(2, 3).to_str()))
+        assert window.tobytes() == b"cde"
+        assert shared_input.view(4).tobytes() == b"ef"
+        window.release()
+        with pytest.raises(IndexError):
+            shared_input.view(4, 3)
+
+
+def test_split_covers_input():
+    with SharedInput.from_bytes(bytes(range(10))) as shared_input:
+        window_refs = shared_input.split(3)
+        assert [window_ref.length for window_ref in window_refs] == [4, 3, 3]
+        assert b"".join(
+            shared_input.view(window_ref).tobytes() for window_ref in window_refs
+        ) == bytes(range(10))
+
+
+def test_file_input_is_mapped(tmp_path):
+    file_path = tmp_path / "input.bin"
+    file_path.write_bytes(b"0123456789")
+    shared_input = SharedInput.from_file(str(file_path))
+    assert shared_input.view(3, 2).tobytes() == b"34"
+    reopened_input = pickle.loads(pickle.dumps(shared_input))
+    assert reopened_input.view(8).tobytes() == b"89"
+    shared_input.close()
+    reopened_input.close()
+
+
+def test_pickle_carries_name_not_data():
+    with SharedInput.from_bytes(b"x" * 100_000) as shared_input:
+        pickled_input = pickle.dumps(shared_input)
+        assert len(pickled_input) < 1000
+        attached_input = pickle.loads(pickled_input)
+        assert attached_input.view(99_999, 1).tobytes() == b"x"
+        attached_input.close()
+
+
+def test_as_array_is_zero_copy():
+    np = pytest.importorskip("numpy")
+    with SharedInput.from_bytes(np.arange(8, dtype="int32").tobytes()) as shared_input:
+        array = shared_input.as_array("int32", InputRef(8, 12))
+        assert array.tolist() == [2, 3, 4]
+        assert not array.flags.owndata
+        del array
+
+
+def test_multiprocess_workers_read_shared_input():
+    data = bytes(range(256)) * 40
+    DistributedSystem.reset()
+    DistributedSystem.set_backend(MultiprocessBackend())
+    try:
+        with SharedInput.from_bytes(data) as shared_input:
+            with contextlib.redirect_stdout(io.StringIO()):
+                DistributedSystem.process_input(shared_input, [WindowSummer])
+                output = DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+    assert output == sum(data)
+
+
+if __name__ == "__main__":
+    test_view_is_window_into_shared_memory()
+    test_split_covers_input()
+    test_pickle_carries_name_not_data()
+    test_multiprocess_workers_read_shared_input()
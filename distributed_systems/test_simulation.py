@@ -0,0 +1,122 @@
+from distributed_systems.framework import ProcessFramework, DistributedSystem
+from distributed_systems.async_process import AsyncProcess
+from distributed_systems.simulation import SimulationBackend
+from distributed_systems.base_process import Msg
+from distributed_systems.counting import count_primes
+
+import asyncio
+import contextlib
+import io
+import time
+
+
+class Sleeper(AsyncProcess):
+    async def start(self, msg: str = None):
+        await asyncio.sleep(100)
+        ProcessFramework.output = "AWAKE"
+        self.complete()
+
+
+class ScriptedCounter(count_primes.CounterLogic):
+    """Counter protocol without a runtime, on a clock the test moves"""
+
+    def __init__(self):
+        self.initialize_state()
+        self.clock = 0.0
+        self.prime_count = 3
+        self.get_heartbeats_from = 2
+
+    def get_id(self) -> int:
+        return 1
+
+    def get_time(self) -> float:
+        return self.clock
+
+
+def count_requests(step: count_primes.CounterStep) -> int:
+    return step.sends.count((2, "REQUEST"))
+
+
+def run_simulation(process_defs: list, input=None, seed: int = 0, **faults):
+    DistributedSystem.reset()
+    backend = SimulationBackend(seed=seed, time_limit=600)
+    DistributedSystem.set_backend(backend)
+    DistributedSystem.define_faults(**faults)
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            DistributedSystem.process_input(input, process_defs)
+            output = DistributedSystem.wait_for_completion()
+    finally:
+        DistributedSystem.set_backend(None)
+        DistributedSystem.define_faults()
+    return output, backend, log.getvalue()
+
+
+def run_count_primes(seed: int):
+    bite_size = count_primes.BITE_SIZE
+    count_primes.BITE_SIZE = 1000
+    try:
+        return run_simulation(
+            [count_primes.AsyncFirstCounter],
+            5000,
+            seed,
+            msg_drop_prop=0.1,
+            max_process_kill_count=2,
+            process_kill_wait_time=0.01,
+        )
+    finally:
+        count_primes.BITE_SIZE = bite_size
+
+
+def test_virtual_time_skips_waits():
+    start_time = time.time()
+    output, backend, _ = run_simulation([Sleeper])
+    assert output == "AWAKE"
+    assert backend.time() == 100
+    assert time.time() - start_time < 1
+
+
+def test_same_seed_replays_identically():
+    output, backend, log = run_count_primes(seed=7)
+    replay_output, replay_backend, replay_log = run_count_primes(seed=7)
+    assert output == replay_output
+    assert backend.time() == replay_backend.time()
+    assert backend.get_delivered_count() == replay_backend.get_delivered_count()
+    assert log == replay_log
+
+
+def test_count_primes_survives_faults():
+    correct_count = count_primes.count_primes(0, 5000)
+    for seed in range(20):
+        output, _, log = run_count_primes(seed)
+        assert output == correct_count, f"seed {seed} failed:\n{log}"
+
+
+def test_counter_keeps_one_request_outstanding():
+    # Answering every message with a fresh REQUEST livelocked a ring: each WAIT
+    # reply pauses a second, so they queued faster than they drained
+    counter = ScriptedCounter()
+    assert count_requests(counter.handle_msg(None)) == 1
+    for _ in range(10):
+        parent_request = Msg.build_msg("REQUEST")
+        parent_request.src = 0
+        step = counter.handle_msg(parent_request)
+        assert step.sends == [(0, "WAIT")]
+
+    wait_step = counter.handle_msg(Msg.build_msg("WAIT"))
+    assert wait_step.pause == 1 and count_requests(wait_step) == 1
+    counter.clock += count_primes.REQUEST_TIMEOUT + 1
+    parent_request = Msg.build_msg("REQUEST")
+    parent_request.src = 0
+    assert count_requests(counter.handle_msg(parent_request)) == 1
+
+    assert counter.handle_msg(Msg.build_msg("7")).sends == []
+    assert counter.final_prime_count == 10
+
+
+if __name__ == "__main__":
+    test_virtual_time_skips_waits()
+    test_same_seed_replays_identically()
+    test_count_primes_survives_faults()
+    test_counter_keeps_one_request_outstanding()
@@ -0,0 +1,28 @@
+from distributed_systems.timer_wheel import TimerWheel
+
+from threading import Event
+import time
+
+
+def test_timers_fire_in_order():
+    wheel = TimerWheel(tick=0.005, slot_count=8)
+    fired = []
+    done = Event()
+    wheel.schedule(0.06, lambda: (fired.append("late"), done.set()))
+    wheel.schedule(0.01, lambda: fired.append("early"))
+    assert done.wait(2)
+    assert fired == ["early", "late"]
+
+
+def test_cancelled_timer_does_not_fire():
+    wheel = TimerWheel(tick=0.005, slot_count=8)
+    fired = []
+    timer = wheel.schedule(0.02, lambda: fired.append("cancelled"))
+    timer.cancel()
+    time.sleep(0.1)
+    assert fired == []
+
+
+if __name__ == "__main__":
+    test_timers_fire_in_order()
+    test_cancelled_timer_does_not_fire()
@@ -0,0 +1,211 @@
+"""
+Goal: Store tfidf job output as flat arrays and rank docs against a query
+
+Layout (CSR, one row per term):
+    terms -> term strings, sorted, a term's id is its position
+    term_offsets -> postings of term id t are [term_offsets[t], term_offsets[t + 1])
+    doc_ids -> doc ids of every posting, sorted within a term
+    counts -> occurrences of the term in the doc, per posting
+    doc_lengths -> words per doc, indexed by doc id
+
+Notes:
+    - A posting costs 8 bytes (int32 doc id + int32 count) plus 4 per weight
+      array, against 100+ bytes as an entry of a nested dict
+    - Weights are computed for every posting at once and cached
+    - save writes one .npy per array, load maps them read only, so an index
+      larger than memory is paged in as queries touch it
+"""
+
+from utils.string_cleaning import sentence_to_list
+
+from typing import List, Tuple
+import json
+import os
+
+import numpy as np
+
+BM25 = "bm25"
+TFIDF = "tfidf"
+
+_ARRAY_NAMES = ["term_offsets", "doc_ids", "counts", "doc_lengths"]
+_WEIGHT_NAMES = {TFIDF: "tfidf_weights", BM25: "bm25_weights"}
+
+
+class InvertedIndex:
+    def __init__(
+        self,
+        terms: List[str],
+        term_offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        counts: np.ndarray,
+        doc_lengths: np.ndarray,
+        bm25_k1: float = 1.2,
+        bm25_b: float = 0.75,
+    ):
+        self.terms: List[str] = terms
+        self.term_offsets: np.ndarray = term_offsets
+        self.doc_ids: np.ndarray = doc_ids
+        self.counts: np.ndarray = counts
+        self.doc_lengths: np.ndarray = doc_lengths
+        self.bm25_k1: float = bm25_k1
+        self.bm25_b: float = bm25_b
+        self._term_ids: dict = {term: term_id for term_id, term in enumerate(terms)}
+        # Scoring scheme -> weight per posting
+        self._weights: dict = {}
+
+    @staticmethod
+    def from_postings(term_postings: dict, doc_count: int = None):
+        """term_postings -> {term: (doc ids, counts)} sorted by doc id, as the tfidf job outputs"""
+        terms = sorted(term_postings)
+        term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        term_offsets[1:] = [len(term_postings[term][0]) for term in terms]
+        np.cumsum(term_offsets, out=term_offsets)
+        if terms:
+            doc_ids = np.concatenate([term_postings[term][0] for term in terms])
+            counts = np.concatenate([term_postings[term][1] for term in terms])
+        else:
+            doc_ids = np.empty(0, dtype=np.int32)
+            counts = np.empty(0, dtype=np.int32)
+        doc_ids = doc_ids.astype(np.int32, copy=False)
+        counts = counts.astype(np.int32, copy=False)
+
+        if doc_count is None:
+            doc_count = int(doc_ids.max()) + 1 if len(doc_ids) else 0
+        doc_lengths = np.bincount(doc_ids, weights=counts, minlength=doc_count).astype(
+            np.int32
+        )
+        return InvertedIndex(terms, term_offsets, doc_ids, counts, doc_lengths)
+
+    @staticmethod
+    def from_term_doc_freq(term_doc_freq: dict, doc_count: int = None):
+        """term_doc_freq -> {term: {doc id: count}}"""
+        term_postings = {}
+        for term, freq_in_docs in term_doc_freq.items():
+            doc_ids = np.fromiter(
+                freq_in_docs.keys(), dtype=np.int32, count=len(freq_in_docs)
+            )
+            counts = np.fromiter(
+                freq_in_docs.values(), dtype=np.int32, count=len(freq_in_docs)
+            )
+            order = np.argsort(doc_ids, kind="stable")
+            term_postings[term] = (doc_ids[order], counts[order])
+        return InvertedIndex.from_postings(term_postings, doc_count)
+
+    def to_term_doc_freq(self) -> dict:
+        """{term: {doc id: count}}, for small indexes and comparisons"""
+        return {
+            term: dict(
+                zip(*(postings.tolist() for postings in self.get_postings(term)))
+            )
+            for term in self.terms
+        }
+
+    def get_doc_count(self) -> int:
+        return len(self.doc_lengths)
+
+    def get_doc_freqs(self) -> np.ndarray:
+        """Docs containing each term, by term id"""
+        return np.diff(self.term_offsets)
+
+    def get_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc ids, counts) of term, views into the index, empty if unknown"""
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            return self.doc_ids[:0], self.counts[:0]
+        term_slice = slice(self.term_offsets[term_id], self.term_offsets[term_id + 1])
+        return self.doc_ids[term_slice], self.counts[term_slice]
+
+    def _get_posting_doc_freqs(self) -> np.ndarray:
+        """Doc frequency of each posting's term"""
+        return np.repeat(self.get_doc_freqs(), self.get_doc_freqs())
+
+    def _compute_tfidf_weights(self) -> np.ndarray:
+        # Length normalized term frequency times smoothed idf
+        doc_count = self.get_doc_count()
+        idfs = np.log((1 + doc_count) / (1 + self._get_posting_doc_freqs())) + 1
+        term_freqs = self.counts / np.maximum(self.doc_lengths[self.doc_ids], 1)
+        return (term_freqs * idfs).astype(np.float32)
+
+    def _compute_bm25_weights(self) -> np.ndarray:
+        doc_count = self.get_doc_count()
+        doc_freqs = self._get_posting_doc_freqs()
+        idfs = np.log(1 + (doc_count - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        avg_doc_length = max(self.doc_lengths.mean(), 1) if doc_count else 1
+        length_norms = (
+            1
+            - self.bm25_b
+            + self.bm25_b * (self.doc_lengths[self.doc_ids] / avg_doc_length)
+        )
+        counts = self.counts.astype(np.float64)
+        term_freqs = (
+            counts * (self.bm25_k1 + 1) / (counts + self.bm25_k1 * length_norms)
+        )
+        return (idfs * term_freqs).astype(np.float32)
+
+    def get_weights(self, scoring: str = BM25) -> np.ndarray:
+        """Weight of every posting under scoring, aligned with doc_ids"""
+        weights = self._weights.get(scoring)
+        if weights is None:
+            if scoring == TFIDF:
+                weights = self._compute_tfidf_weights()
+            elif scoring == BM25:
+                weights = self._compute_bm25_weights()
+            else:
+                raise ValueError(f"Invalid scoring: {scoring}")
+            self._weights[scoring] = weights
+        return weights
+
+    def query(self, query: str, k: int = 10, scoring: str = BM25) -> List[tuple]:
+        """Top k (doc id, score) pairs for the words of query, best first"""
+        weights = self.get_weights(scoring)
+        scores = np.zeros(self.get_doc_count(), dtype=np.float32)
+        for term in sentence_to_list(query):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            term_slice = slice(
+                self.term_offsets[term_id], self.term_offsets[term_id + 1]
+            )
+            # Doc ids are unique within a term, so fancy indexing adds correctly
+            scores[self.doc_ids[term_slice]] += weights[term_slice]
+        matched_doc_ids = np.flatnonzero(scores)
+        if len(matched_doc_ids) > k:
+            top_idxs = np.argpartition(-scores[matched_doc_ids], k - 1)[:k]
+            matched_doc_ids = matched_doc_ids[top_idxs]
+        # Ties go to the lower doc id
+        order = np.lexsort((matched_doc_ids, -scores[matched_doc_ids]))
+        return [
+            (int(doc_id), float(scores[doc_id])) for doc_id in matched_doc_ids[order]
+        ]
+
+    def save(self, dir_path: str):
+        """Writes the index and every weight array computed so far to dir_path"""
+        os.makedirs(dir_path, exist_ok=True)
+        with open(os.path.join(dir_path, "terms.json"), "w") as fh:
+            json.dump(
+                {"terms": self.terms, "bm25_k1": self.bm25_k1, "bm25_b": self.bm25_b},
+                fh,
+            )
+        for array_name in _ARRAY_NAMES:
+            np.save(
+                os.path.join(dir_path, f"{array_name}.npy"), getattr(self, array_name)
+            )
+        for scoring, weights in self._weights.items():
+            np.save(os.path.join(dir_path, f"{_WEIGHT_NAMES[scoring]}.npy"), weights)
+
+    @staticmethod
+    def load(dir_path: str):
+        with open(os.path.join(dir_path, "terms.json"), "r") as fh:
+            metadata = json.load(fh)
+        arrays = [
+            np.load(os.path.join(dir_path, f"{array_name}.npy"), mmap_mode="r")
+            for array_name in _ARRAY_NAMES
+        ]
+        index = InvertedIndex(
+            metadata["terms"], *arrays, metadata["bm25_k1"], metadata["bm25_b"]
+        )
+        for scoring, weight_name in _WEIGHT_NAMES.items():
+            weight_path = os.path.join(dir_path, f"{weight_name}.npy")
+            if os.path.exists(weight_path):
+                index._weights[scoring] = np.load(weight_path, mmap_mode="r")
+        return index
@@ -1,112 +1,152 @@
-from distributed_systems.base_process import Process, Msg
-from distributed_systems.framework import DistributedSystem, ProcessFramework
+from distributed_systems.framework import DistributedSystem
+from distributed_systems.mapreduce import MapReduceCoordinator, MapReduceJob
+from distributed_systems.tfidf.inverted_index import InvertedIndex
 from utils.string_cleaning import sentence_to_list
 
-from typing import List
-import json
+from typing import Iterable
 import os
+import tempfile
+
+import numpy as np
+
+# Bytes read at a time while planning splits
+READ_CHUNK_SIZE = 1 << 20
+
+
+def _count_lines(fh, range_start: int, range_end: int) -> int:
+    """Lines starting in [range_start, range_end), range_end on a line boundary"""
+    fh.seek(range_start)
+    line_count = 0
+    last_byte = b"\n"
+    remaining = range_end - range_start
+    while remaining > 0:
+        chunk = fh.read(min(READ_CHUNK_SIZE, remaining))
+        line_count += chunk.count(b"\n")
+        last_byte = chunk[-1:]
+        remaining -= len(chunk)
+    # The last line of a file may have no newline
+    if last_byte != b"\n":
+        line_count += 1
+    return line_count
+
+
+def _find_line_end(fh, offset: int, file_size: int) -> int:
+    """Offset just past the first newline at or after offset, file_size if none"""
+    fh.seek(offset)
+    while offset < file_size:
+        chunk = fh.read(READ_CHUNK_SIZE)
+        newline_idx = chunk.find(b"\n")
+        if newline_idx != -1:
+            return offset + newline_idx + 1
+        offset += len(chunk)
+    return file_size
+
+
+def read_docs(task) -> Iterable:
+    """(doc id, doc) for every line of a split"""
+    file_path, range_start, range_end, first_doc_id = task
+    doc_id = first_doc_id
+    with open(file_path, "rb") as fh:
+        fh.seek(range_start)
+        offset = range_start
+        while offset < range_end:
+            line = fh.readline()
+            offset += len(line)
+            yield doc_id, line.decode("utf-8")
+            doc_id += 1
 
 
-class Initializer(Process):
-    def get_next_process_id(self):
-        output_process_id = self.next_process_id
-        self.next_process_id += 1
-        return output_process_id
-
-    def start(self, msg: str = None):
-        self.next_process_id = 1
-
-        file_count: int = len(ProcessFramework.input)
-        reducer_id: int = file_count + 1
-
-        next_doc_id: int = 0
-        for file_path in ProcessFramework.input:
-            with open(file_path, "r") as fh:
-                docs_list = fh.readlines()
-            docs_list_json = json.dumps(docs_list)
-            mapper_msg = {
-                "NEXT_DOC_ID": next_doc_id,
-                "DOCS_LIST": docs_list_json,
-                "REDUCER_ID": reducer_id,
-            }
-            self.new_process(
-                self.get_next_process_id(),
-                Mapper,
-                json.dumps(mapper_msg),
-            )
-            next_doc_id += len(docs_list)
-        self.new_process(reducer_id, Reducer, f"{file_count}")
-        self.complete()
-
-
-class Mapper(Process):
-    def start(self, msg: str = None):
-        msg_dict = json.loads(msg)
-        doc_id = msg_dict["NEXT_DOC_ID"]
-        docs_list_json = msg_dict["DOCS_LIST"]
-        reducer_id = msg_dict["REDUCER_ID"]
-
-        docs_list = json.loads(docs_list_json)
-        term_doc_freq = {}
-
-        for doc in docs_list:
-            doc_words_list = sentence_to_list(doc)
-            for word in doc_words_list:
-                if word in term_doc_freq:
-                    if doc_id in term_doc_freq[word]:
-                        term_doc_freq[word][doc_id] += 1
-                    else:
-                        term_doc_freq[word][doc_id] = 1
+class TermDocFreq(MapReduceJob):
+    """
+    Word -> (doc ids, occurrences) as int32 arrays sorted by doc id, every line
+    of every input file is a doc
+    """
+
+    # Target bytes per map task, splits end on the first line boundary after it.
+    # At about 5 MB/s a split maps for over 10 s, longer than heartbeat_timeout,
+    # which only bounds the silence between a mapper's heartbeats
+    split_size = 64 << 20
+
+    def split(self, file_paths: list) -> list:
+        """
+        Byte ranges of at most about split_size, aligned to lines, so a file is
+        read by several mappers and a mapper never holds more than its range.
+        Doc ids are global, so each split also carries the id of its first line
+        """
+        tasks = []
+        next_doc_id = 0
+        for file_path in file_paths:
+            file_size = os.path.getsize(file_path)
+            with open(file_path, "rb") as fh:
+                range_start = 0
+                while range_start < file_size:
+                    range_end = _find_line_end(
+                        fh, range_start + self.split_size - 1, file_size
+                    )
+                    tasks.append([file_path, range_start, range_end, next_doc_id])
+                    next_doc_id += _count_lines(fh, range_start, range_end)
+                    range_start = range_end
+        return tasks
+
+    def read_split(self, task) -> Iterable:
+        # The whole split is one record, so map sees every doc of a term at once
+        return [read_docs(task)]
+
+    def map(self, docs: Iterable):
+        """Yields (term, (doc ids, counts)) per term, doc ids ascending"""
+        term_postings = {}
+        for doc_id, doc in docs:
+            doc_word_counts = {}
+            for word in sentence_to_list(doc):
+                if word in doc_word_counts:
+                    doc_word_counts[word] += 1
                 else:
-                    term_doc_freq[word] = {doc_id: 1}
-            doc_id += 1
-
-        word_counts_json = json.dumps(term_doc_freq)
-        self.send_msg(reducer_id, Msg.build_msg(word_counts_json))
-        self.complete()
-
-
-class Reducer(Process):
-    @staticmethod
-    def convert_keys_to_int(d: dict):
-        int_keys_d = {}
-        for key in d:
-            int_keys_d[int(key)] = d[key]
-        return int_keys_d
-
-    def start(self, msg: str = None):
-        mapper_count = int(msg)
-
-        term_doc_freqs: List[dict] = []
-        for _ in range(mapper_count):
-            mapper_msg = self.get_one_msg()
-            mapper_result_dict = json.loads(mapper_msg.content)
-            term_doc_freqs.append(mapper_result_dict)
-
-        combined_term_doc_freq = {}
-        for term_doc_freq in term_doc_freqs:
-            for word, freq_in_docs in term_doc_freq.items():
-                freq_in_docs: dict = self.convert_keys_to_int(freq_in_docs)
-                if word in combined_term_doc_freq:
-                    for doc, freq in freq_in_docs.items():
-                        if doc in combined_term_doc_freq[word]:
-                            combined_term_doc_freq[word][doc] += freq
-                        else:
-                            combined_term_doc_freq[word][doc] = freq
+                    doc_word_counts[word] = 1
+            for word, count in doc_word_counts.items():
+                if word in term_postings:
+                    doc_ids, counts = term_postings[word]
+                    doc_ids.append(doc_id)
+                    counts.append(count)
                 else:
-                    combined_term_doc_freq[word] = freq_in_docs
+                    term_postings[word] = ([doc_id], [count])
+        for word, (doc_ids, counts) in term_postings.items():
+            yield word, (
+                np.array(doc_ids, dtype=np.int32),
+                np.array(counts, dtype=np.int32),
+            )
+
+    # Merging on every arriving partition copies the term's whole postings again
+    fold_partitions = False
+
+    def combine(self, word: str, postings_runs: list) -> tuple:
+        """
+        k-way merge of sorted runs. Splits cover disjoint doc id ranges, so the
+        runs of a term never interleave and ordering them by first doc id merges
+        them in one concatenation
+        """
+        if len(postings_runs) == 1:
+            return postings_runs[0]
+        postings_runs = sorted(postings_runs, key=lambda postings: postings[0][0])
+        doc_ids = np.concatenate([doc_ids for doc_ids, _ in postings_runs])
+        counts = np.concatenate([counts for _, counts in postings_runs])
+        return doc_ids, counts
 
-        ProcessFramework.output = combined_term_doc_freq
-        self.complete()
+    def reduce(self, word: str, postings_runs: list) -> tuple:
+        # One run per map task that saw the word, merged once
+        return self.combine(word, postings_runs)
+
+
+class Initializer(MapReduceCoordinator):
+    job_def = TermDocFreq
 
 
 if __name__ == "__main__":
     term_freq = {}
 
     word_file_paths = [
-        f"{os.getenv('PYTHONPATH')}/distributed_systems/search_engine/raw_data/sentences0.txt",
-        f"{os.getenv('PYTHONPATH')}/distributed_systems/search_engine/raw_data/sentences1.txt",
-        f"{os.getenv('PYTHONPATH')}/distributed_systems/search_engine/raw_data/sentences2.txt",
+        f"{os.getenv('PYTHONPATH')}/distributed_systems/tfidf/raw_data/sentences0.txt",
+        f"{os.getenv('PYTHONPATH')}/distributed_systems/tfidf/raw_data/sentences1.txt",
+        f"{os.getenv('PYTHONPATH')}/distributed_systems/tfidf/raw_data/sentences2.txt",
     ]
 
     sentence_idx = 0
@@ -126,7 +166,9 @@ if __name__ == "__main__":
 
     DistributedSystem.define_faults(msg_drop_prop=0.1)
     DistributedSystem.process_input(word_file_paths, [Initializer])
-    attempted_term_freq = DistributedSystem.wait_for_completion()
+    term_postings = DistributedSystem.wait_for_completion()
+    index = InvertedIndex.from_postings(term_postings, sentence_idx)
+    attempted_term_freq = index.to_term_doc_freq()
 
     if attempted_term_freq == term_freq:
         print("SUCCESS")
@@ -137,3 +179,11 @@ if __name__ == "__main__":
                 print(f"Expected:\n{term_freq[word]}")
                 print(f"Got:\n{attempted_term_freq[word]}")
                 break
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        index.get_weights()
+        index.save(index_dir)
+        index = InvertedIndex.load(index_dir)
+        print(f"[RESULT] Indexed {len(index.doc_ids)} postings")
+        for doc_id, score in index.query("the quiet park", k=3):
+            print(f"[RESULT] Doc {doc_id}: {score:.3f}")
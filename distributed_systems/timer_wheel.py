@@ -0,0 +1,85 @@
+from threading import Lock, Thread
+from typing import Callable, List
+import math
+import os
+import time
+import traceback
+
+
+class Timer:
+    def __init__(self, callback: Callable, rounds: int):
+        self.callback: Callable = callback
+        self.rounds: int = rounds
+        self.cancelled: bool = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: a single thread fires every timer
+
+    Timers are rounded up to the next tick and callbacks run on the wheel thread,
+    so they must be short and must not block
+    """
+
+    _shared: "TimerWheel" = None
+    _shared_pid: int = None
+    _shared_lock: Lock = Lock()
+
+    def __init__(self, tick: float = 0.01, slot_count: int = 512):
+        self._tick: float = tick
+        self._slots: List[List[Timer]] = [[] for _ in range(slot_count)]
+        self._current_slot: int = 0
+        self._lock: Lock = Lock()
+        Thread(target=self._turn_continuously, daemon=True).start()
+
+    @classmethod
+    def get_shared(cls) -> "TimerWheel":
+        # A forked child inherits the wheel but not its thread
+        pid = os.getpid()
+        if cls._shared is None or cls._shared_pid != pid:
+            with cls._shared_lock:
+                if cls._shared is None or cls._shared_pid != pid:
+                    cls._shared = TimerWheel()
+                    cls._shared_pid = pid
+        return cls._shared
+
+    def schedule(self, delay: float, callback: Callable) -> Timer:
+        ticks = max(1, math.ceil(delay / self._tick))
+        timer = Timer(callback, (ticks - 1) // len(self._slots))
+        with self._lock:
+            slot_idx = (self._current_slot + ticks) % len(self._slots)
+            self._slots[slot_idx].append(timer)
+        return timer
+
+    def _turn_continuously(self):
+        next_tick_time = time.monotonic()
+        while True:
+            next_tick_time += self._tick
+            sleep_time = next_tick_time - time.monotonic()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+            due_timers: List[Timer] = []
+            with self._lock:
+                self._current_slot = (self._current_slot + 1) % len(self._slots)
+                waiting_timers: List[Timer] = []
+                for timer in self._slots[self._current_slot]:
+                    if timer.cancelled:
+                        continue
+                    if timer.rounds == 0:
+                        due_timers.append(timer)
+                    else:
+                        timer.rounds -= 1
+                        waiting_timers.append(timer)
+                self._slots[self._current_slot] = waiting_timers
+            for timer in due_timers:
+                if timer.cancelled:
+                    continue
+                try:
+                    timer.callback()
+                except SystemExit:
+                    pass
+                except Exception:
+                    traceback.print_exc()